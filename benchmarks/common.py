@@ -0,0 +1,39 @@
+"""
+Общие функции для нагрузочных сценариев из каталога benchmarks/.
+"""
+import math
+import time
+from typing import Iterable, List
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """
+    Перцентиль p (0-100) по методу ближайшего ранга.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms: Iterable[float], elapsed_s: float = 0.0) -> dict:
+    samples = list(samples_ms)
+    return {
+        "count": len(samples),
+        "rps": round(len(samples) / elapsed_s, 2) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2) if samples else 0.0,
+    }
+
+
+async def timed_request(client, method: str, url: str, **kwargs) -> float:
+    """
+    Выполняет запрос и возвращает его длительность в миллисекундах.
+    """
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    await response.aread()
+    return (time.perf_counter() - started) * 1000
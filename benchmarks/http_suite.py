@@ -0,0 +1,329 @@
+"""
+Нагрузочный прогон всех разделов приложения по HTTP с замером задержки каждого маршрута.
+
+Виртуальные пользователи (--concurrency) в течение --duration секунд выполняют запросы
+по смешанному сценарию: сотрудники (списки, поиск, карточки, заявки, отчеты, выгрузки, PDF)
+и абоненты (личный кабинет, платежи, уведомления, заявки). Доля абонентских запросов -
+--subscriber-share, маршруты внутри роли выбираются по весам ROUTES. Перед замером
+каждый маршрут вызывается один раз: так проверяется, что все маршруты отвечают успешно.
+
+ID для запросов берутся из базы из настроек приложения (.env), поэтому сервер должен работать
+с той же базой. Для замеров на разных объемах база заполняется командой src.cli.generate_data;
+пароли сгенерированных абонентов - "load-<ID % --password-pool>". Без сгенерированных
+абонентов используется абонент из seed.sql.
+
+Результат (число запросов, запросов в секунду, p50/p95/p99 по каждому маршруту) выводится в JSON
+и с --save-baseline записывается в файл эталона под меткой объема (--scale). С --baseline результат
+сравнивается с эталоном той же метки: если метрика маршрута (--metric) выросла больше чем на
+--max-regression (доля) и больше чем на --min-delta-ms, или маршрут отвечал ошибками,
+команда завершается с кодом 1.
+
+Пример (сервер запущен командой `uvicorn src.main:app`):
+    python -m src.cli.generate_data --subscribers 100000 --truncate
+    python -m benchmarks.http_suite --scale 100k --duration 60 --save-baseline benchmarks/baselines/http_suite.json
+    python -m benchmarks.http_suite --scale 100k --duration 60 --baseline benchmarks/baselines/http_suite.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import httpx
+
+from benchmarks.common import summarize
+from src.db.connection import get_db_connection, close_db_pool
+
+STAFF = "staff"
+SUBSCRIBER = "subscriber"
+
+SEARCH_TERMS = ["Иванов", "Петрова", "Смирнов", "Козлов", "Анна", "Минск", "+37533", "Ков"]
+HTMX_HEADERS = {"HX-Request": "true"}
+
+
+class Route(NamedTuple):
+    name: str       # метка маршрута в результатах
+    role: str
+    weight: int
+    # Параметры запроса httpx (method, url, ...) по образцам данных; None - запрос невозможен
+    build: Callable[[dict, random.Random], Optional[dict]]
+
+
+def _get(url: str, **kwargs) -> dict:
+    return {"method": "GET", "url": url, **kwargs}
+
+
+def _period(days: int) -> dict:
+    end_date = date.today()
+    return {"start_date": str(end_date - timedelta(days=days - 1)), "end_date": str(end_date)}
+
+
+def _own_ticket(samples: dict, rng: random.Random):
+    tickets = samples["account"]["ticket_ids"]
+    return _get(f"/subscriber/tickets/{rng.choice(tickets)}") if tickets else None
+
+
+ROUTES = [
+    # Сотрудники: списки и поиск
+    Route("GET /subscribers", STAFF, 10, lambda s, r: _get("/subscribers")),
+    Route("GET /subscribers?balance_filter=debtors", STAFF, 3,
+          lambda s, r: _get("/subscribers", params={"balance_filter": "debtors", "sort_by": "balance"})),
+    Route("POST /subscribers/search", STAFF, 6,
+          lambda s, r: {"method": "POST", "url": "/subscribers/search", "headers": HTMX_HEADERS,
+                        "data": {"search_query": r.choice(SEARCH_TERMS)}}),
+    Route("GET /subscribers/typeahead", STAFF, 6,
+          lambda s, r: _get("/subscribers/typeahead", params={"q": r.choice(SEARCH_TERMS)}, headers=HTMX_HEADERS)),
+    Route("GET /subscribers/{id}", STAFF, 10, lambda s, r: _get(f"/subscribers/{r.choice(s['subscriber_ids'])}")),
+    Route("GET /subscribers/{id}/edit", STAFF, 2, lambda s, r: _get(f"/subscribers/{r.choice(s['subscriber_ids'])}/edit")),
+    Route("GET /contracts", STAFF, 6, lambda s, r: _get("/contracts")),
+    Route("GET /contracts?status", STAFF, 2, lambda s, r: _get("/contracts", params={"status": "Приостановлен"})),
+    Route("GET /contracts/{id}/pdf", STAFF, 2, lambda s, r: _get(f"/contracts/{r.choice(s['contract_ids'])}/pdf")),
+    Route("GET /equipment", STAFF, 4, lambda s, r: _get("/equipment")),
+    Route("GET /equipment/linkable-contracts", STAFF, 3,
+          lambda s, r: _get("/equipment/linkable-contracts", params={"q": r.choice(SEARCH_TERMS)}, headers=HTMX_HEADERS)),
+    Route("GET /equipment/{id}/edit", STAFF, 2, lambda s, r: _get(f"/equipment/{r.choice(s['equipment_ids'])}/edit")),
+    Route("GET /services", STAFF, 2, lambda s, r: _get("/services")),
+    Route("GET /employees", STAFF, 1, lambda s, r: _get("/employees")),
+    Route("GET /tickets", STAFF, 6, lambda s, r: _get("/tickets")),
+    Route("GET /tickets?status", STAFF, 2, lambda s, r: _get("/tickets", params={"status": "В работе"})),
+    Route("GET /tickets/{id}", STAFF, 5, lambda s, r: _get(f"/tickets/{r.choice(s['ticket_ids'])}")),
+    # Сотрудники: отчеты, журнал и выгрузки
+    Route("GET /reports", STAFF, 2, lambda s, r: _get("/reports")),
+    Route("GET /reports?365_days", STAFF, 1, lambda s, r: _get("/reports", params=_period(365))),
+    Route("GET /reports/export/json", STAFF, 1, lambda s, r: _get("/reports/export/json", params=_period(7))),
+    Route("GET /reports/export/excel", STAFF, 1, lambda s, r: _get("/reports/export/excel", params=_period(7))),
+    Route("GET /logs", STAFF, 2, lambda s, r: _get("/logs")),
+    Route("GET /export/payments", STAFF, 1,
+          lambda s, r: _get("/export/payments", params={"format": "ndjson", **_period(1)})),
+    Route("GET /export/tickets", STAFF, 1,
+          lambda s, r: _get("/export/tickets", params={"format": "csv", **_period(7)})),
+    Route("GET /system/stats", STAFF, 1, lambda s, r: _get("/system/stats")),
+    # Абоненты: личный кабинет
+    Route("GET /subscriber/cabinet", SUBSCRIBER, 10, lambda s, r: _get("/subscriber/cabinet")),
+    Route("GET /subscriber/payments", SUBSCRIBER, 6, lambda s, r: _get("/subscriber/payments")),
+    Route("GET /subscriber/payments?year", SUBSCRIBER, 2,
+          lambda s, r: _get("/subscriber/payments", params={"year": date.today().year - 1})),
+    Route("GET /subscriber/notifications", SUBSCRIBER, 3, lambda s, r: _get("/subscriber/notifications")),
+    Route("GET /subscriber/tickets", SUBSCRIBER, 4, lambda s, r: _get("/subscriber/tickets")),
+    Route("GET /subscriber/tickets/{id}", SUBSCRIBER, 3, _own_ticket),
+]
+
+
+async def _sample_ids(conn, table: str, column: str, limit: int) -> list:
+    # TABLESAMPLE не читает всю таблицу; на маленькой базе выборка может быть пустой
+    rows = await conn.fetch(f"SELECT {column} FROM {table} TABLESAMPLE SYSTEM (1) LIMIT $1", limit)
+    if not rows:
+        rows = await conn.fetch(f"SELECT {column} FROM {table} ORDER BY random() LIMIT $1", limit)
+    return [row[column] for row in rows]
+
+
+async def load_samples(args) -> dict:
+    """
+    Образцы ID из базы и учетные записи абонентов, от имени которых идут запросы кабинета.
+    """
+    try:
+        async with get_db_connection() as conn:
+            samples = {
+                "subscriber_ids": await _sample_ids(conn, "subscribers", "subscriber_id", args.sample_size),
+                "contract_ids": await _sample_ids(conn, "contracts", "contract_id", args.sample_size),
+                "equipment_ids": await _sample_ids(conn, "equipment", "equipment_id", args.sample_size),
+                "ticket_ids": await _sample_ids(conn, "tickets", "ticket_id", args.sample_size),
+                "data": {
+                    "subscribers": await conn.fetchval("SELECT COUNT(*) FROM subscribers"),
+                    "payments": await conn.fetchval("SELECT COUNT(*) FROM payments"),
+                },
+            }
+            rows = await conn.fetch(
+                """
+                SELECT subscriber_id, email FROM subscribers
+                WHERE is_confirmed AND email LIKE 'subscriber%@example.com'
+                ORDER BY random() LIMIT $1
+                """,
+                args.subscriber_accounts
+            )
+            accounts = [
+                {"email": row["email"], "password": f"load-{row['subscriber_id'] % args.password_pool}",
+                 "subscriber_id": row["subscriber_id"]}
+                for row in rows
+            ] or [{"email": "ivan@ivanov.com", "password": "1112233", "subscriber_id": None}]
+            for account in accounts:
+                account["ticket_ids"] = [
+                    row["ticket_id"] for row in await conn.fetch(
+                        "SELECT ticket_id FROM tickets WHERE subscriber_id = (SELECT subscriber_id FROM subscribers WHERE email = $1)",
+                        account["email"]
+                    )
+                ]
+            samples["accounts"] = accounts
+    finally:
+        await close_db_pool()
+    return samples
+
+
+async def login(base_url: str, username: str, password: str, limits: httpx.Limits) -> httpx.AsyncClient:
+    """
+    Клиент с cookie сессии пользователя.
+    """
+    client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120)
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    if response.status_code != 303 or "access_token" not in client.cookies:
+        await client.aclose()
+        raise RuntimeError(f"Не удалось войти как {username}: HTTP {response.status_code}")
+    return client
+
+
+async def timed_route(client: httpx.AsyncClient, request: dict) -> tuple:
+    """
+    Выполняет запрос, дочитывая тело ответа (выгрузки и PDF отдаются потоком).
+    Возвращает (длительность в мс, успешен ли ответ).
+    """
+    started = time.perf_counter()
+    async with client.stream(**request) as response:
+        async for _ in response.aiter_raw():
+            pass
+    return (time.perf_counter() - started) * 1000, response.status_code < 400
+
+
+async def run_suite(args, samples: dict) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    staff_client = await login(args.base_url, args.staff_login, args.staff_password, limits)
+    subscriber_clients = []
+    try:
+        for account in samples["accounts"]:
+            client = await login(args.base_url, account["email"], account["password"], limits)
+            subscriber_clients.append((client, account))
+
+        routes = {STAFF: [route for route in ROUTES if route.role == STAFF],
+                  SUBSCRIBER: [route for route in ROUTES if route.role == SUBSCRIBER]}
+        latencies = {route.name: [] for route in ROUTES}
+        errors = {route.name: 0 for route in ROUTES}
+
+        async def call(route: Route, rng: random.Random, record: bool):
+            if route.role == STAFF:
+                client, request = staff_client, route.build(samples, rng)
+            else:
+                client, account = rng.choice(subscriber_clients)
+                request = route.build({**samples, "account": account}, rng)
+            if request is None:
+                return
+            try:
+                elapsed_ms, ok = await timed_route(client, request)
+            except httpx.HTTPError:
+                elapsed_ms, ok = 0.0, False
+            if not record:
+                if not ok:
+                    print(f"Проверочный запрос {route.name} завершился ошибкой", file=sys.stderr)
+                return
+            if ok:
+                latencies[route.name].append(elapsed_ms)
+            else:
+                errors[route.name] += 1
+
+        # Проверка и прогрев: каждый маршрут по одному разу
+        rng = random.Random(args.seed)
+        for route in ROUTES:
+            await call(route, rng, record=False)
+
+        deadline = time.perf_counter() + args.duration
+
+        async def virtual_user(index: int):
+            user_rng = random.Random(args.seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                role = SUBSCRIBER if user_rng.random() < args.subscriber_share else STAFF
+                route = user_rng.choices(routes[role], weights=[route.weight for route in routes[role]])[0]
+                await call(route, user_rng, record=True)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(index) for index in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await staff_client.aclose()
+        for client, _ in subscriber_clients:
+            await client.aclose()
+
+    total = sum(len(samples_ms) for samples_ms in latencies.values())
+    return {
+        "scale": args.scale or str(samples["data"]["subscribers"]),
+        "data": samples["data"],
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 1),
+        "total_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "routes": {
+            name: {**summarize(samples_ms, elapsed), "errors": errors[name]}
+            for name, samples_ms in latencies.items()
+        },
+    }
+
+
+def find_regressions(result: dict, baseline: dict, metric: str, max_regression: float, min_delta_ms: float) -> list:
+    """
+    Маршруты, которые отвечали ошибками или стали медленнее эталона больше допустимого.
+    """
+    problems = []
+    for name, current in result["routes"].items():
+        if current["errors"]:
+            problems.append(f"{name}: ошибок {current['errors']}")
+        reference = baseline["routes"].get(name)
+        if not reference or not current["count"] or not reference["count"]:
+            continue
+        delta = current[metric] - reference[metric]
+        if current[metric] > reference[metric] * (1 + max_regression) and delta > min_delta_ms:
+            problems.append(f"{name}: {metric} {reference[metric]} -> {current[metric]} мс")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон всех маршрутов приложения")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--staff-login", default="admin")
+    parser.add_argument("--staff-password", default="admin_pass")
+    parser.add_argument("--password-pool", type=int, default=64,
+                        help="размер пула паролей, с которым запускался src.cli.generate_data")
+    parser.add_argument("--subscriber-accounts", type=int, default=20, help="сколько абонентов входит в кабинет")
+    parser.add_argument("--subscriber-share", type=float, default=0.4, help="доля запросов абонентов")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="длительность замера в секундах")
+    parser.add_argument("--sample-size", type=int, default=500, help="сколько ID каждой сущности берется из базы")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scale", default=None, help="метка объема данных (по умолчанию - число абонентов)")
+    parser.add_argument("--output", default=None, help="файл для результата в JSON")
+    parser.add_argument("--baseline", default=None, help="файл эталона для сравнения")
+    parser.add_argument("--save-baseline", default=None, help="записать результат в файл эталона")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p95_ms")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="допустимый рост метрики (доля)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="рост меньше этого значения не учитывается")
+    args = parser.parse_args()
+
+    samples = asyncio.run(load_samples(args))
+    result = asyncio.run(run_suite(args, samples))
+    report = json.dumps(result, indent=2, ensure_ascii=False)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+
+    if args.save_baseline:
+        path = Path(args.save_baseline)
+        baselines = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        baselines[result["scale"]] = result
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(baselines, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Эталон для объема {result['scale']} записан в {path}")
+
+    if args.baseline:
+        baselines = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if result["scale"] not in baselines:
+            print(f"В эталоне нет результатов для объема {result['scale']}", file=sys.stderr)
+            sys.exit(1)
+        problems = find_regressions(
+            result, baselines[result["scale"]], args.metric, args.max_regression, args.min_delta_ms
+        )
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Проверяет, что массовые попытки входа не задерживают остальные запросы.
+
+Сценарий:
+1. Замеряет задержку «пробного» маршрута (по умолчанию /auth/login) без нагрузки.
+2. Запускает шторм входов (POST /auth/login с проверкой bcrypt) и параллельно
+   снова замеряет пробный маршрут.
+3. Сравнивает p99 пробного маршрута; при росте больше чем в --max-ratio раз
+   завершается с кодом 1.
+
+Пример (сервер запущен командой `uvicorn src.main:app`):
+    python -m benchmarks.login_storm --base-url http://127.0.0.1:8000 \
+        --username admin --password admin_pass --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import summarize, timed_request
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float) -> list:
+    samples = []
+    while not stop.is_set():
+        samples.append(await timed_request(client, "GET", path))
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def login_storm(client: httpx.AsyncClient, args) -> list:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    form = {"username": args.username, "password": args.password}
+
+    async def one_login():
+        async with semaphore:
+            return await timed_request(client, "POST", "/auth/login", data=form)
+
+    return list(await asyncio.gather(*(one_login() for _ in range(args.logins))))
+
+
+async def run(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as storm_client, \
+            httpx.AsyncClient(base_url=args.base_url, timeout=60) as probe_client:
+        # 1. Без нагрузки
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(probe_client, args.probe_path, stop, args.probe_interval))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        baseline = await probe_task
+
+        # 2. Во время шторма входов
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(probe_client, args.probe_path, stop, args.probe_interval))
+        started = time.perf_counter()
+        logins = await login_storm(storm_client, args)
+        storm_elapsed = time.perf_counter() - started
+        stop.set()
+        under_load = await probe_task
+
+    result = {
+        "probe_path": args.probe_path,
+        "baseline": summarize(baseline),
+        "under_login_storm": summarize(under_load),
+        "logins": summarize(logins, storm_elapsed),
+    }
+    baseline_p99 = result["baseline"]["p99_ms"] or 1.0
+    ratio = result["under_login_storm"]["p99_ms"] / baseline_p99
+    result["p99_ratio"] = round(ratio, 2)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if ratio > args.max_ratio:
+        print(f"p99 пробного маршрута вырос в {ratio:.2f} раз (допустимо {args.max_ratio})", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Шторм входов и задержка остальных маршрутов")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin_pass")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-path", default="/auth/login")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Проверяет, сколько запросов к БД выполняет каждый маршрут из benchmarks.http_suite.
+
+Сервер должен быть запущен с DB_QUERY_STATS=true: тогда ответы содержат заголовки
+X-DB-Queries, X-DB-Connections и X-DB-Max-Repeats (см. src/db/instrumentation.py).
+Каждый маршрут вызывается --repeat раз, учитывается последний вызов (с прогретыми кэшами).
+
+С --save текущие числа записываются в файл бюджета. С --budget маршрут считается
+ошибочным, если выполнил больше запросов, чем записано в бюджете, или повторил один и тот же
+запрос не меньше --repeat-threshold раз (N+1); тогда команда завершается с кодом 1.
+
+Пример:
+    DB_QUERY_STATS=true uvicorn src.main:app
+    python -m benchmarks.query_budget --save benchmarks/baselines/query_budget.json
+    python -m benchmarks.query_budget --budget benchmarks/baselines/query_budget.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from pathlib import Path
+
+import httpx
+
+from benchmarks.http_suite import ROUTES, STAFF, load_samples, login
+from src.db.instrumentation import QUERIES_HEADER, CONNECTIONS_HEADER, MAX_REPEATS_HEADER
+
+
+async def measure_routes(args, samples: dict) -> dict:
+    limits = httpx.Limits(max_connections=5)
+    account = samples["accounts"][0]
+    staff_client = await login(args.base_url, args.staff_login, args.staff_password, limits)
+    subscriber_client = await login(args.base_url, account["email"], account["password"], limits)
+    rng = random.Random(args.seed)
+    result = {}
+    try:
+        for route in ROUTES:
+            client = staff_client if route.role == STAFF else subscriber_client
+            request = route.build({**samples, "account": account}, rng)
+            if request is None:
+                continue
+            for _ in range(args.repeat):
+                response = await client.request(**request)
+            if QUERIES_HEADER not in response.headers:
+                raise RuntimeError(f"{route.name}: в ответе нет {QUERIES_HEADER}, запустите сервер с DB_QUERY_STATS=true")
+            result[route.name] = {
+                "status": response.status_code,
+                "queries": int(response.headers[QUERIES_HEADER]),
+                "connections": int(response.headers[CONNECTIONS_HEADER]),
+                "max_repeats": int(response.headers[MAX_REPEATS_HEADER]),
+            }
+    finally:
+        await staff_client.aclose()
+        await subscriber_client.aclose()
+    return result
+
+
+def find_violations(result: dict, budget: dict, repeat_threshold: int) -> list:
+    problems = []
+    for name, current in result.items():
+        if current["max_repeats"] >= repeat_threshold:
+            problems.append(f"{name}: один запрос выполнен {current['max_repeats']} раз (возможный N+1)")
+        allowed = budget.get(name)
+        if allowed and current["queries"] > allowed["queries"]:
+            problems.append(f"{name}: запросов {current['queries']}, по бюджету {allowed['queries']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Число запросов к БД по маршрутам и проверка бюджета")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--staff-login", default="admin")
+    parser.add_argument("--staff-password", default="admin_pass")
+    parser.add_argument("--password-pool", type=int, default=64)
+    parser.add_argument("--subscriber-accounts", type=int, default=1)
+    parser.add_argument("--sample-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--repeat-threshold", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", default=None, help="записать результат как бюджет")
+    parser.add_argument("--budget", default=None, help="файл бюджета для проверки")
+    args = parser.parse_args()
+
+    samples = asyncio.run(load_samples(args))
+    result = asyncio.run(measure_routes(args, samples))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.budget:
+        budget = json.loads(Path(args.budget).read_text(encoding="utf-8"))
+        problems = find_violations(result, budget, args.repeat_threshold)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
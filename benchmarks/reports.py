@@ -0,0 +1,113 @@
+"""
+Сравнивает задержку построения страницы отчетов до и после перехода на дневные итоги.
+
+Варианты:
+    before - прежняя схема: три последовательных запроса по таблице payments
+             (сводка, суммы по дням с заполнением пропусков в Python, способы оплаты);
+    after  - report_service.get_payments_report: один запрос GROUPING SETS по payment_daily_rollups.
+
+Периоды заканчиваются сегодняшним днем. Работает напрямую с базой из настроек приложения (.env);
+для осмысленных цифр на длинных периодах база должна содержать платежи за несколько лет.
+
+Пример:
+    python -m benchmarks.reports --ranges 30 365 1825 --iterations 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import summarize
+from src.db.connection import get_db_connection, close_db_pool
+from src.services import report_service
+
+BEFORE_SUMMARY_QUERY = """
+    SELECT COUNT(payment_id) as total_payments, SUM(amount) as total_amount
+    FROM payments
+    WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
+"""
+BEFORE_DAILY_QUERY = """
+    SELECT date_trunc('day', payment_date)::date as day, SUM(amount) as daily_total
+    FROM payments
+    WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
+    GROUP BY day
+    ORDER BY day
+"""
+BEFORE_METHODS_QUERY = """
+    SELECT payment_method, COUNT(payment_id) as count
+    FROM payments
+    WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
+    GROUP BY payment_method
+    ORDER BY count DESC
+"""
+
+
+async def report_before(start_date: date, end_date: date):
+    async with get_db_connection() as conn:
+        summary = await conn.fetchrow(BEFORE_SUMMARY_QUERY, start_date, end_date)
+    async with get_db_connection() as conn:
+        daily_rows = await conn.fetch(BEFORE_DAILY_QUERY, start_date, end_date)
+    async with get_db_connection() as conn:
+        method_rows = await conn.fetch(BEFORE_METHODS_QUERY, start_date, end_date)
+
+    date_map = {row['day']: float(row['daily_total']) for row in daily_rows}
+    labels, data = [], []
+    current_date = start_date
+    while current_date <= end_date:
+        labels.append(current_date.strftime('%d.%m.%Y'))
+        data.append(date_map.get(current_date, 0))
+        current_date += timedelta(days=1)
+    return summary, (labels, data), method_rows
+
+
+async def report_after(start_date: date, end_date: date):
+    return await report_service.get_payments_report(start_date, end_date)
+
+
+VARIANTS = {
+    "before": report_before,
+    "after": report_after,
+}
+
+
+async def measure(variant, start_date: date, end_date: date, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await variant(start_date, end_date)
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await variant(start_date, end_date)
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+async def run(args):
+    end_date = date.today()
+    result = {}
+    try:
+        for days in args.ranges:
+            start_date = end_date - timedelta(days=days - 1)
+            by_variant = {
+                name: await measure(variant, start_date, end_date, args.iterations, args.warmup)
+                for name, variant in VARIANTS.items()
+            }
+            after_p50 = by_variant["after"]["p50_ms"] or 0.01
+            by_variant["p50_speedup"] = round(by_variant["before"]["p50_ms"] / after_p50, 1)
+            result[f"{days}_days"] = by_variant
+    finally:
+        await close_db_pool()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка страницы отчетов до и после перехода на дневные итоги")
+    parser.add_argument("--ranges", type=int, nargs="+", default=[30, 365, 1825],
+                        help="длины периодов в днях")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+-- Версия токенов пользователя для режима SESSION_MODE=stateless.
+-- Увеличение версии отзывает все ранее выданные пользователю JWT.
+ALTER TABLE employees ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
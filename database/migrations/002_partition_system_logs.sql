@@ -0,0 +1,51 @@
+-- Перевод system_logs на помесячные секции с индексами для фильтров и постраничного просмотра.
+-- Выполняется один раз на существующей базе; дальнейшие секции создает
+-- команда `python -m src.cli.partitions create`.
+ALTER TABLE system_logs RENAME TO system_logs_unpartitioned;
+ALTER TABLE system_logs_unpartitioned RENAME CONSTRAINT system_logs_pkey TO system_logs_unpartitioned_pkey;
+-- Последовательность переходит к новой таблице, чтобы нумерация записей продолжилась
+ALTER SEQUENCE system_logs_log_id_seq OWNED BY NONE;
+
+CREATE TABLE system_logs (
+    log_id INTEGER NOT NULL DEFAULT nextval('system_logs_log_id_seq'),
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    level VARCHAR(20) NOT NULL,
+    message TEXT NOT NULL,
+    user_login VARCHAR(255),
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER SEQUENCE system_logs_log_id_seq OWNED BY system_logs.log_id;
+
+CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT;
+
+CREATE INDEX idx_system_logs_timestamp ON system_logs (timestamp DESC, log_id DESC);
+CREATE INDEX idx_system_logs_level ON system_logs (level, timestamp DESC, log_id DESC);
+CREATE INDEX idx_system_logs_user_login ON system_logs (user_login, timestamp DESC, log_id DESC);
+
+-- Секции за все месяцы, в которых есть записи, и на три месяца вперед
+DO $$
+DECLARE
+    month_start DATE;
+    last_month DATE := date_trunc('month', CURRENT_DATE)::date + interval '3 months';
+BEGIN
+    SELECT COALESCE(date_trunc('month', MIN(timestamp))::date, date_trunc('month', CURRENT_DATE)::date)
+    INTO month_start
+    FROM system_logs_unpartitioned;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF system_logs FOR VALUES FROM (%L) TO (%L)',
+            'system_logs_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO system_logs (log_id, timestamp, level, message, user_login)
+SELECT log_id, COALESCE(timestamp, NOW()), level, message, user_login
+FROM system_logs_unpartitioned;
+
+DROP TABLE system_logs_unpartitioned;
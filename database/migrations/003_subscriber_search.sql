@@ -0,0 +1,9 @@
+-- Индексы для поиска абонентов (subscriber_service.search_subscribers).
+-- Расширение pg_trgm должно быть доступно в PostgreSQL (входит в стандартный пакет contrib).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_full_name_trgm ON subscribers USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_address_trgm ON subscribers USING gin (address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_phone_digits_trgm ON subscribers
+    USING gin ((regexp_replace(phone_number, '[^0-9]', '', 'g')) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_full_name_prefix ON subscribers (lower(full_name) text_pattern_ops);
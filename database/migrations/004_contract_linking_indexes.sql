@@ -0,0 +1,4 @@
+-- Индексы для подбора договоров в формах (equipment_service.search_contracts_for_linking):
+-- соединение договоров с абонентами и поиск договоров без оборудования.
+CREATE INDEX IF NOT EXISTS idx_contracts_subscriber_id ON contracts(subscriber_id);
+CREATE INDEX IF NOT EXISTS idx_equipment_contract_id ON equipment(contract_id);
@@ -0,0 +1,48 @@
+-- Дневные итоги платежей (payment_daily_rollups), триггер их обновления и индекс по дате платежа.
+-- Итоги заполняются по уже существующим платежам; таблица платежей на это время блокируется от записи.
+CREATE INDEX IF NOT EXISTS idx_payments_payment_date ON payments(payment_date);
+
+-- Дневные итоги платежей по способам оплаты для страницы отчетов.
+-- Поддерживаются триггером на payments; день платежа берется в часовом поясе сервера (настройка TimeZone),
+-- как и в фильтрах отчетов. Пересчет и сверка: python -m src.cli.payment_rollups
+CREATE TABLE IF NOT EXISTS payment_daily_rollups (
+    day            DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    payments_count BIGINT NOT NULL,
+    total_amount   NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (day, payment_method)
+);
+
+CREATE OR REPLACE FUNCTION payments_apply_to_rollups() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE payment_daily_rollups
+        SET payments_count = payments_count - 1,
+            total_amount = total_amount - OLD.amount
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method;
+        DELETE FROM payment_daily_rollups
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method AND payments_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO payment_daily_rollups (day, payment_method, payments_count, total_amount)
+        VALUES (NEW.payment_date::date, NEW.payment_method, 1, NEW.amount)
+        ON CONFLICT (day, payment_method) DO UPDATE
+        SET payments_count = payment_daily_rollups.payments_count + 1,
+            total_amount = payment_daily_rollups.total_amount + EXCLUDED.total_amount;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS payments_rollup ON payments;
+CREATE TRIGGER payments_rollup
+AFTER INSERT OR DELETE OR UPDATE OF amount, payment_date, payment_method ON payments
+FOR EACH ROW EXECUTE FUNCTION payments_apply_to_rollups();
+
+LOCK TABLE payments IN SHARE MODE;
+
+DELETE FROM payment_daily_rollups;
+INSERT INTO payment_daily_rollups (day, payment_method, payments_count, total_amount)
+SELECT payment_date::date, payment_method, COUNT(*), SUM(amount)
+FROM payments
+GROUP BY payment_date::date, payment_method;
@@ -0,0 +1,82 @@
+-- Перевод payments на помесячные секции. Номера платежей (payment_id) и внешний ключ на абонентов сохраняются,
+-- дневные итоги (payment_daily_rollups) не пересчитываются: триггер создается после переноса строк.
+-- Выполняется один раз на существующей базе; дальнейшие секции создаются при старте приложения
+-- и командой `python -m src.cli.partitions create --table payments`.
+ALTER TABLE payments RENAME TO payments_unpartitioned;
+ALTER TABLE payments_unpartitioned RENAME CONSTRAINT payments_pkey TO payments_unpartitioned_pkey;
+ALTER INDEX IF EXISTS idx_payments_payment_date RENAME TO idx_payments_unpartitioned_payment_date;
+DROP TRIGGER IF EXISTS payments_rollup ON payments_unpartitioned;
+-- Последовательность переходит к новой таблице, чтобы нумерация платежей продолжилась
+ALTER SEQUENCE payments_payment_id_seq OWNED BY NONE;
+
+CREATE TABLE payments (
+    payment_id     INTEGER NOT NULL DEFAULT nextval('payments_payment_id_seq'),
+    subscriber_id  INTEGER NOT NULL REFERENCES subscribers(subscriber_id),
+    amount         NUMERIC(10, 2) NOT NULL CHECK (amount > 0),
+    payment_date   TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    payment_method VARCHAR(50) NOT NULL,
+    PRIMARY KEY (payment_id, payment_date)
+) PARTITION BY RANGE (payment_date);
+
+ALTER SEQUENCE payments_payment_id_seq OWNED BY payments.payment_id;
+
+CREATE TABLE payments_default PARTITION OF payments DEFAULT;
+
+CREATE INDEX idx_payments_payment_date ON payments (payment_date);
+CREATE INDEX idx_payments_subscriber_id ON payments (subscriber_id, payment_date DESC);
+
+-- Секции за все месяцы, в которых есть платежи, и на три месяца вперед
+DO $$
+DECLARE
+    month_start DATE;
+    last_month DATE := date_trunc('month', CURRENT_DATE)::date + interval '3 months';
+BEGIN
+    SELECT COALESCE(date_trunc('month', MIN(payment_date))::date, date_trunc('month', CURRENT_DATE)::date)
+    INTO month_start
+    FROM payments_unpartitioned;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF payments FOR VALUES FROM (%L) TO (%L)',
+            'payments_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO payments (payment_id, subscriber_id, amount, payment_date, payment_method)
+SELECT payment_id, subscriber_id, amount, payment_date, payment_method
+FROM payments_unpartitioned;
+
+DROP TABLE payments_unpartitioned;
+
+CREATE OR REPLACE FUNCTION payments_apply_to_rollups() RETURNS trigger AS $$
+BEGIN
+    -- Перенос платежей из секции по умолчанию в новую секцию (src/db/partitions.py) итогов не меняет
+    IF current_setting('app.partition_move', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE payment_daily_rollups
+        SET payments_count = payments_count - 1,
+            total_amount = total_amount - OLD.amount
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method;
+        DELETE FROM payment_daily_rollups
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method AND payments_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO payment_daily_rollups (day, payment_method, payments_count, total_amount)
+        VALUES (NEW.payment_date::date, NEW.payment_method, 1, NEW.amount)
+        ON CONFLICT (day, payment_method) DO UPDATE
+        SET payments_count = payment_daily_rollups.payments_count + 1,
+            total_amount = payment_daily_rollups.total_amount + EXCLUDED.total_amount;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payments_rollup
+AFTER INSERT OR DELETE OR UPDATE OF amount, payment_date, payment_method ON payments
+FOR EACH ROW EXECUTE FUNCTION payments_apply_to_rollups();
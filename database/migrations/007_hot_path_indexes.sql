@@ -0,0 +1,23 @@
+-- migrate: no-transaction
+-- Индексы для фильтров и сортировок, которые выполняют сервисы. Создаются CONCURRENTLY,
+-- не блокируя запись в таблицы, поэтому файл выполняется без общей транзакции
+-- (python -m src.cli.migrate up). Индексы по contracts.subscriber_id, equipment.contract_id,
+-- payments и system_logs созданы миграциями 002, 004 и 006.
+
+-- Заявки абонента в личном кабинете (ticket_service.fetch_tickets_by_subscriber_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_subscriber_id ON tickets (subscriber_id, created_at DESC);
+
+-- Список заявок по умолчанию: новые сверху, постранично по курсору
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_created_at ON tickets (created_at DESC, ticket_id DESC);
+
+-- Удаление сотрудника снимает назначение с его заявок (ON DELETE SET NULL)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_assigned_to_id ON tickets (assigned_to_id);
+
+-- Список договоров по умолчанию (новые сверху) и фильтр по услуге
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contracts_start_date ON contracts (start_date DESC, contract_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contracts_service_id ON contracts (service_id);
+
+-- Уведомления абонента от новых к старым и счетчик непрочитанных на каждой странице кабинета
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notifications_subscriber_sent ON notifications (subscriber_id, sent_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notifications_unread ON notifications (subscriber_id) WHERE NOT is_read;
+DROP INDEX CONCURRENTLY IF EXISTS idx_notifications_subscriber_id;
@@ -0,0 +1,14 @@
+-- migrate: no-transaction
+-- Поиск абонентов (subscriber_service.search_subscribers) без сортировки всех совпадений.
+-- GiST-индексы по триграммам выдают строки сразу в порядке близости к запросу
+-- (оператор <<->), поэтому LIMIT останавливает чтение индекса после нужного числа кандидатов.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscribers_full_name_trgm_gist ON subscribers
+    USING gist (full_name gist_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscribers_address_trgm_gist ON subscribers
+    USING gist (address gist_trgm_ops);
+
+-- Короткие запросы: поиск по началу ФИО и сортировка по нему же одним проходом индекса.
+-- Правило сортировки "C" позволяет использовать индекс и для LIKE 'префикс%', и для ORDER BY.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscribers_full_name_sort ON subscribers
+    ((lower(full_name) COLLATE "C"), subscriber_id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_subscribers_full_name_prefix;
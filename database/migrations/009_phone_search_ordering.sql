@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Поиск абонентов по части номера телефона (subscriber_service.search_subscribers):
+-- GiST-индекс выдает номера в порядке близости к запросу, поэтому для частых сочетаний цифр
+-- читается не больше SEARCH_CANDIDATES_LIMIT строк вместо сортировки всех совпадений.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscribers_phone_digits_trgm_gist ON subscribers
+    USING gist ((regexp_replace(phone_number, '[^0-9]', '', 'g')) gist_trgm_ops);
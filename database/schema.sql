@@ -1,5 +1,9 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 DROP TABLE IF EXISTS notifications CASCADE;
 DROP TABLE IF EXISTS payments CASCADE;
+DROP TABLE IF EXISTS payment_daily_rollups CASCADE;
+DROP FUNCTION IF EXISTS payments_apply_to_rollups() CASCADE;
 DROP TABLE IF EXISTS equipment CASCADE;
 DROP TABLE IF EXISTS contracts CASCADE;
 DROP TABLE IF EXISTS services CASCADE;
@@ -15,7 +19,8 @@ CREATE TABLE employees (
     role          VARCHAR(50) NOT NULL,
     email         VARCHAR(255) NOT NULL UNIQUE,
     login         VARCHAR(50) NOT NULL UNIQUE,
-    password_hash VARCHAR(255) NOT NULL
+    password_hash VARCHAR(255) NOT NULL,
+    token_version INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE subscribers (
@@ -28,9 +33,22 @@ CREATE TABLE subscribers (
     email VARCHAR(255) UNIQUE,
     is_confirmed BOOLEAN DEFAULT FALSE,
     confirmation_token VARCHAR(255) UNIQUE,
-    avatar_url VARCHAR(255)
+    avatar_url VARCHAR(255),
+    token_version INTEGER NOT NULL DEFAULT 0
 );
 
+-- Поиск абонентов (subscriber_service.search_subscribers): подстроки и похожие ФИО,
+-- номер телефона без оформления, поиск по началу ФИО для коротких запросов
+CREATE INDEX idx_subscribers_full_name_trgm ON subscribers USING gin (full_name gin_trgm_ops);
+CREATE INDEX idx_subscribers_address_trgm ON subscribers USING gin (address gin_trgm_ops);
+CREATE INDEX idx_subscribers_phone_digits_trgm ON subscribers
+    USING gin ((regexp_replace(phone_number, '[^0-9]', '', 'g')) gin_trgm_ops);
+CREATE INDEX idx_subscribers_full_name_trgm_gist ON subscribers USING gist (full_name gist_trgm_ops);
+CREATE INDEX idx_subscribers_address_trgm_gist ON subscribers USING gist (address gist_trgm_ops);
+CREATE INDEX idx_subscribers_phone_digits_trgm_gist ON subscribers
+    USING gist ((regexp_replace(phone_number, '[^0-9]', '', 'g')) gist_trgm_ops);
+CREATE INDEX idx_subscribers_full_name_sort ON subscribers ((lower(full_name) COLLATE "C"), subscriber_id);
+
 CREATE TABLE services (
     service_id  SERIAL PRIMARY KEY,
     name        VARCHAR(255) NOT NULL UNIQUE,
@@ -47,6 +65,10 @@ CREATE TABLE contracts (
     status        VARCHAR(50) NOT NULL
 );
 
+CREATE INDEX idx_contracts_subscriber_id ON contracts(subscriber_id);
+CREATE INDEX idx_contracts_start_date ON contracts (start_date DESC, contract_id DESC);
+CREATE INDEX idx_contracts_service_id ON contracts (service_id);
+
 CREATE TABLE equipment (
     equipment_id  SERIAL PRIMARY KEY,
     contract_id   INTEGER REFERENCES contracts(contract_id),
@@ -56,14 +78,80 @@ CREATE TABLE equipment (
     status        VARCHAR(50) NOT NULL
 );
 
+-- Поиск свободных договоров для привязки оборудования (анти-соединение NOT EXISTS)
+CREATE INDEX idx_equipment_contract_id ON equipment(contract_id);
+
 CREATE TABLE payments (
-    payment_id     SERIAL PRIMARY KEY,
+    payment_id     SERIAL,
     subscriber_id  INTEGER NOT NULL REFERENCES subscribers(subscriber_id),
     amount         NUMERIC(10, 2) NOT NULL CHECK (amount > 0),
     payment_date   TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    payment_method VARCHAR(50) NOT NULL
+    payment_method VARCHAR(50) NOT NULL,
+    PRIMARY KEY (payment_id, payment_date)
+) PARTITION BY RANGE (payment_date);
+
+CREATE TABLE payments_default PARTITION OF payments DEFAULT;
+
+-- Индексы создаются в каждой секции: отчеты за период и история платежей абонента
+CREATE INDEX idx_payments_payment_date ON payments (payment_date);
+CREATE INDEX idx_payments_subscriber_id ON payments (subscriber_id, payment_date DESC);
+
+-- Секции на прошлый, текущий и три следующих месяца
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR offset_months IN -1..3 LOOP
+        month_start := date_trunc('month', CURRENT_DATE)::date + make_interval(months => offset_months);
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF payments FOR VALUES FROM (%L) TO (%L)',
+            'payments_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+    END LOOP;
+END $$;
+
+-- Дневные итоги платежей по способам оплаты для страницы отчетов.
+-- Поддерживаются триггером на payments; день платежа берется в часовом поясе сервера (настройка TimeZone),
+-- как и в фильтрах отчетов. Пересчет и сверка: python -m src.cli.payment_rollups
+CREATE TABLE payment_daily_rollups (
+    day            DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    payments_count BIGINT NOT NULL,
+    total_amount   NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (day, payment_method)
 );
 
+CREATE FUNCTION payments_apply_to_rollups() RETURNS trigger AS $$
+BEGIN
+    -- Перенос платежей из секции по умолчанию в новую секцию (src/db/partitions.py) итогов не меняет
+    IF current_setting('app.partition_move', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE payment_daily_rollups
+        SET payments_count = payments_count - 1,
+            total_amount = total_amount - OLD.amount
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method;
+        DELETE FROM payment_daily_rollups
+        WHERE day = OLD.payment_date::date AND payment_method = OLD.payment_method AND payments_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO payment_daily_rollups (day, payment_method, payments_count, total_amount)
+        VALUES (NEW.payment_date::date, NEW.payment_method, 1, NEW.amount)
+        ON CONFLICT (day, payment_method) DO UPDATE
+        SET payments_count = payment_daily_rollups.payments_count + 1,
+            total_amount = payment_daily_rollups.total_amount + EXCLUDED.total_amount;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payments_rollup
+AFTER INSERT OR DELETE OR UPDATE OF amount, payment_date, payment_method ON payments
+FOR EACH ROW EXECUTE FUNCTION payments_apply_to_rollups();
+
 CREATE TABLE notifications (
     notification_id SERIAL PRIMARY KEY,
     subscriber_id   INTEGER NOT NULL REFERENCES subscribers(subscriber_id) ON DELETE CASCADE,
@@ -74,15 +162,43 @@ CREATE TABLE notifications (
     sent_date TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
-CREATE INDEX idx_notifications_subscriber_id ON notifications(subscriber_id);
+-- Уведомления абонента от новых к старым и счетчик непрочитанных
+CREATE INDEX idx_notifications_subscriber_sent ON notifications (subscriber_id, sent_date DESC);
+CREATE INDEX idx_notifications_unread ON notifications (subscriber_id) WHERE NOT is_read;
 
+-- Журнал секционирован по месяцам (см. src/cli/partitions.py).
+-- Строки вне созданных секций попадают в system_logs_default.
 CREATE TABLE system_logs (
-    log_id SERIAL PRIMARY KEY,
-    timestamp TIMESTAMPTZ DEFAULT NOW(),
+    log_id SERIAL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     level VARCHAR(20) NOT NULL,
     message TEXT NOT NULL,
-    user_login VARCHAR(255)
-);
+    user_login VARCHAR(255),
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT;
+
+-- Постраничный просмотр журнала от новых записей к старым, в том числе с фильтрами
+CREATE INDEX idx_system_logs_timestamp ON system_logs (timestamp DESC, log_id DESC);
+CREATE INDEX idx_system_logs_level ON system_logs (level, timestamp DESC, log_id DESC);
+CREATE INDEX idx_system_logs_user_login ON system_logs (user_login, timestamp DESC, log_id DESC);
+
+-- Секции на прошлый, текущий и три следующих месяца
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR offset_months IN -1..3 LOOP
+        month_start := date_trunc('month', CURRENT_DATE)::date + make_interval(months => offset_months);
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF system_logs FOR VALUES FROM (%L) TO (%L)',
+            'system_logs_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+    END LOOP;
+END $$;
 
 CREATE TABLE tickets (
     ticket_id SERIAL PRIMARY KEY,
@@ -96,6 +212,9 @@ CREATE TABLE tickets (
 );
 
 CREATE INDEX idx_tickets_status ON tickets(status);
+CREATE INDEX idx_tickets_subscriber_id ON tickets (subscriber_id, created_at DESC);
+CREATE INDEX idx_tickets_created_at ON tickets (created_at DESC, ticket_id DESC);
+CREATE INDEX idx_tickets_assigned_to_id ON tickets (assigned_to_id);
 
 CREATE OR REPLACE FUNCTION trigger_set_timestamp()
 RETURNS TRIGGER AS $$
@@ -1,4 +1,4 @@
-TRUNCATE TABLE notifications, payments, equipment, contracts, services, subscribers, employees RESTART IDENTITY CASCADE;
+TRUNCATE TABLE notifications, payments, payment_daily_rollups, equipment, contracts, services, subscribers, employees RESTART IDENTITY CASCADE;
 
 
 INSERT INTO employees (name, role, email, login, password_hash) VALUES
@@ -3,9 +3,51 @@ from fastapi import Request, Depends, HTTPException, status
 from jose import JWTError, jwt
 
 from src.config import settings
-from src.services.auth_service import get_employee_by_login
+from src.auth import principal_cache
+from src.services.auth_service import get_employee_by_login, get_token_version
 from src.services.subscriber_service import fetch_subscriber_by_id
 
+
+async def resolve_user(token: str) -> Optional[dict]:
+    """
+    Определяет пользователя по JWT.
+    - В режиме SESSION_MODE="stateless" данные пользователя берутся из самого токена,
+      а из БД (с кэшированием) проверяется только версия токена.
+    - Иначе пользователь загружается из БД; результат кэшируется на PRINCIPAL_CACHE_TTL_SECONDS,
+      кэш сбрасывается при изменении данных сотрудника или абонента.
+    """
+    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    login_or_id: str = payload.get("sub")
+    role: str = payload.get("role")
+
+    if settings.SESSION_MODE == "stateless" and "usr" in payload:
+        user = dict(payload["usr"])
+        user['role'] = role
+        principal_id = user['subscriber_id'] if role == "subscriber" else user['employee_id']
+        current_version = await get_token_version(role, principal_id)
+        if current_version is None or current_version != payload.get("ver"):
+            # Токен отозван: выход из системы, смена пароля или роли, удаление учетной записи
+            return None
+        return user
+
+    user = principal_cache.get_principal(role, login_or_id)
+    if user is not None:
+        return user
+
+    if role == "subscriber":
+        user = await fetch_subscriber_by_id(int(login_or_id))
+        if user:
+            user = dict(user)
+            user['role'] = 'subscriber'
+    else:
+        user = await get_employee_by_login(login_or_id)
+        if user:
+            user = dict(user)
+
+    if user:
+        principal_cache.store_principal(role, login_or_id, user)
+    return user
+
 # Эта зависимость теперь очень простая: она просто читает данные из request.state
 
 async def get_current_user(request: Request) -> Optional[dict]:
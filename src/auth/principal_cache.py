@@ -0,0 +1,70 @@
+from typing import Optional
+
+from src.cache import TTLCache
+from src.config import settings
+
+# Поля, которые не нужны ни шаблонам, ни проверкам доступа и не должны храниться в кэше
+_PRIVATE_FIELDS = ("password_hash", "confirmation_token")
+
+_principals = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+# Актуальные версии токенов (для режима SESSION_MODE="stateless")
+_token_versions = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS
+)
+
+
+def get_principal(role: str, login_or_id: str) -> Optional[dict]:
+    """
+    Возвращает копию закэшированного пользователя или None.
+    """
+    principal = _principals.get((role == "subscriber", login_or_id))
+    return dict(principal) if principal is not None else None
+
+
+def store_principal(role: str, login_or_id: str, principal: dict):
+    cached = {key: value for key, value in principal.items() if key not in _PRIVATE_FIELDS}
+    _principals.set((role == "subscriber", login_or_id), cached)
+
+
+def get_cached_token_version(role: str, principal_id: int) -> Optional[int]:
+    return _token_versions.get((role == "subscriber", principal_id))
+
+
+def store_token_version(role: str, principal_id: int, version: int):
+    _token_versions.set((role == "subscriber", principal_id), version)
+
+
+def invalidate_employee(employee_id: int):
+    """
+    Сбрасывает кэш сотрудника (после изменения данных, роли или удаления).
+    """
+    _principals.invalidate(lambda key, value: not key[0] and value.get("employee_id") == employee_id)
+    _token_versions.pop((False, employee_id))
+
+
+def invalidate_subscriber(subscriber_id: int):
+    """
+    Сбрасывает кэш абонента (после изменения профиля, баланса или удаления).
+    """
+    _principals.invalidate(lambda key, value: key[0] and value.get("subscriber_id") == subscriber_id)
+    _token_versions.pop((True, subscriber_id))
+
+
+def invalidate_all_subscribers():
+    """
+    Сбрасывает кэш всех абонентов (после массового импорта).
+    """
+    _principals.invalidate(lambda key, value: key[0])
+
+
+def get_principal_cache_stats() -> dict:
+    return {
+        "principals": _principals.stats(),
+        "token_versions": _token_versions.stats()
+    }
@@ -0,0 +1,452 @@
+"""
+Генерация синтетических данных заданного объема для нагрузочных проверок.
+
+Создает N абонентов с договорами, оборудованием, платежами за несколько лет, заявками
+с перепиской, уведомлениями и записями системного журнала. Услуги и сотрудники берутся
+из базы (database/seed.sql). Данные загружаются через COPY частями по --chunk-size абонентов,
+части загружаются параллельно в отдельных процессах, каждая - в своей транзакции.
+
+Пароли абонентов выбираются из пула: хеши bcrypt для --password-pool паролей вычисляются
+заранее параллельно в нескольких процессах. Пароль абонента с ID n - "load-<n % размер пула>".
+
+После загрузки пересчитываются дневные итоги платежей и обновляется статистика планировщика.
+
+Примеры:
+    python -m src.cli.generate_data --subscribers 10000
+    python -m src.cli.generate_data --subscribers 1000000 --years 5 --truncate
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import accumulate
+from typing import List
+
+from src.db.connection import get_db_connection, db_transaction, close_db_pool
+from src.db.partitions import PARTITIONED_TABLES, add_months, month_start, ensure_month_partitions
+from src.services.report_service import rebuild_payment_rollups
+
+# Таблицы, которые очищает --truncate (услуги и сотрудники остаются)
+GENERATED_TABLES = [
+    "ticket_messages", "tickets", "notifications", "payments", "payment_daily_rollups",
+    "equipment", "contracts", "subscribers", "system_logs",
+]
+
+MALE_NAMES = ["Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Артем", "Илья", "Кирилл", "Михаил",
+              "Никита", "Иван", "Егор", "Павел", "Владимир", "Роман", "Денис", "Евгений", "Игорь", "Олег"]
+FEMALE_NAMES = ["Анна", "Мария", "Елена", "Ольга", "Татьяна", "Наталья", "Екатерина", "Ирина", "Светлана", "Юлия",
+                "Анастасия", "Дарья", "Алина", "Виктория", "Ксения", "Полина", "Людмила", "Марина", "Валерия", "Вера"]
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Козлов", "Новиков", "Васильев", "Зайцев", "Павлов", "Романов", "Волков",
+            "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Морозов", "Орлов", "Андреев", "Макаров", "Никитин",
+            "Захаров", "Борисов", "Королев", "Гусев", "Киселев", "Ковалев", "Ильин", "Фомин", "Белов", "Медведев"]
+PATRONYMIC_ROOTS = ["Александров", "Дмитриев", "Сергеев", "Андреев", "Алексеев", "Иванов", "Петров", "Михайлов",
+                    "Викторов", "Николаев", "Владимиров", "Павлов", "Игорев", "Олегов", "Романов"]
+
+# Города с долей абонентов
+CITIES = {"Минск": 45, "Гомель": 12, "Могилев": 10, "Витебск": 11, "Гродно": 11, "Брест": 11}
+STREETS = ["ул. Центральная", "пр. Независимости", "ул. Якуба Коласа", "ул. Советская", "ул. Машерова",
+           "ул. Сурганова", "ул. Богдановича", "ул. Ожешко", "пр. Московский", "ул. Казинца", "ул. Ленина",
+           "ул. Гагарина", "ул. Победителей", "ул. Калиновского", "ул. Притыцкого", "ул. Кирова"]
+MOBILE_CODES = ["33", "44", "25", "29"]
+
+PAYMENT_METHODS = {"Банковская карта": 50, "Онлайн-банк": 35, "Терминал": 15}
+CONTRACT_STATUSES = {"Активен": 80, "Приостановлен": 8, "Расторгнут": 10, "Ожидает активации": 2}
+ROUTER_BRANDS = ["TP-LINK", "ZTE", "HUAWEI", "KEENETIC", "MIKROTIK"]
+TV_BOX_BRANDS = ["ZALA", "ANDROIDTV"]
+
+TICKET_TITLES = ["Нет доступа в интернет", "Низкая скорость соединения", "Не работает телевидение",
+                 "Смена тарифного плана", "Вопрос по оплате", "Замена оборудования", "Перенос подключения"]
+SUBSCRIBER_REPLIES = ["Здравствуйте! Проблема повторяется каждый вечер.", "Перезагрузка роутера не помогла.",
+                      "Спасибо, сейчас все работает.", "Когда приедет мастер?", "Прошу перезвонить мне."]
+EMPLOYEE_REPLIES = ["Здравствуйте! Проверяем линию, ожидайте.", "Мастер приедет завтра с 10:00 до 14:00.",
+                    "Проблема на линии устранена.", "Перезагрузите роутер, пожалуйста.", "Заявка передана специалисту."]
+NOTIFICATIONS = [
+    ("Информационное", "Уважаемый абонент! Напоминаем о необходимости внести абонентскую плату до 1 числа."),
+    ("Информационное", "Уважаемый абонент! Ваш баланс пополнен."),
+    ("Предупреждение о задолженности", "Уважаемый абонент! Ваш баланс отрицательный. Пожалуйста, пополните счет."),
+    ("Акция", "Специальное предложение! Подключите вторую услугу со скидкой 50%."),
+]
+LOG_LEVELS = {"INFO": 90, "WARNING": 8, "ERROR": 2}
+LOG_MESSAGES = ["Пользователь вошел в систему", "Изменены данные абонента ID {id}", "Создан договор ID {id}",
+                "Обновлен статус заявки ID {id}", "Выгрузка данных", "Ошибка отправки письма абоненту ID {id}"]
+
+
+def _cumulative(weights: dict):
+    return list(weights), list(accumulate(weights.values()))
+
+
+_CITY_CHOICES = _cumulative(CITIES)
+_PAYMENT_METHOD_CHOICES = _cumulative(PAYMENT_METHODS)
+_CONTRACT_STATUS_CHOICES = _cumulative(CONTRACT_STATUSES)
+_LOG_LEVEL_CHOICES = _cumulative(LOG_LEVELS)
+
+
+def _pick(rng: random.Random, choices) -> str:
+    values, cum_weights = choices
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def _hash_pool_password(password: str) -> str:
+    # Импорт здесь, чтобы процессы пула не подключали лишнего при запуске
+    from src.services.auth_service import pwd_context
+    return pwd_context.hash(password)
+
+
+def build_password_hashes(pool_size: int, executor: ProcessPoolExecutor) -> List[str]:
+    """
+    Хеши паролей пула, вычисленные параллельно в процессах executor.
+    """
+    passwords = [f"load-{index}" for index in range(pool_size)]
+    return list(executor.map(_hash_pool_password, passwords, chunksize=max(1, pool_size // (os.cpu_count() or 1))))
+
+
+def _random_moment(rng: random.Random, day: date) -> datetime:
+    # Днем событий больше, чем ночью
+    hour = min(23, max(0, int(rng.gauss(14, 4))))
+    return datetime(day.year, day.month, day.day, hour, rng.randrange(60), rng.randrange(60), tzinfo=timezone.utc)
+
+
+def _random_day(rng: random.Random, first_day: date, last_day: date) -> date:
+    return first_day + timedelta(days=rng.randint(0, max(0, (last_day - first_day).days)))
+
+
+def _recent_day(rng: random.Random, first_day: date, last_day: date) -> date:
+    # Число абонентов растет, поэтому недавних договоров больше, чем старых
+    span = max(0, (last_day - first_day).days)
+    return last_day - timedelta(days=int(span * rng.random() ** 1.5))
+
+
+def _full_name(rng: random.Random) -> str:
+    surname = rng.choice(SURNAMES)
+    root = rng.choice(PATRONYMIC_ROOTS)
+    if rng.random() < 0.5:
+        return f"{surname} {rng.choice(MALE_NAMES)} {root}ич"
+    return f"{surname}а {rng.choice(FEMALE_NAMES)} {root}на"
+
+
+def _money(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+async def _reserve_ids(conn, table: str, column: str, count: int) -> List[int]:
+    """
+    Берет count значений последовательности столбца: так связи между строками
+    известны до загрузки, а параллельные части не пересекаются по ID.
+    """
+    if count == 0:
+        return []
+    rows = await conn.fetch(
+        "SELECT nextval(pg_get_serial_sequence($1, $2)) AS id FROM generate_series(1, $3)",
+        table, column, count
+    )
+    return [row["id"] for row in rows]
+
+
+async def _load_chunk(options: dict) -> dict:
+    rng = random.Random(options["seed"])
+    first_day, last_day = options["first_day"], options["last_day"]
+    services = options["services"]
+    active_services = [service for service in services if service["status"] == "Активна"] or services
+    technicians = options["technician_ids"]
+    password_hashes = options["password_hashes"]
+    count = options["subscribers"]
+
+    subscribers, contracts, equipment, payments = [], [], [], []
+    tickets, messages, notifications, logs = [], [], [], []
+
+    async with db_transaction() as conn:
+        subscriber_ids = await _reserve_ids(conn, "subscribers", "subscriber_id", count)
+
+        # Договоры: у большинства абонентов один, у части - два или три
+        subscriber_contracts = []
+        for subscriber_id in subscriber_ids:
+            contracts_count = rng.choices((1, 2, 3), weights=(70, 22, 8))[0]
+            subscriber_contracts.append((subscriber_id, contracts_count))
+        contract_ids = iter(await _reserve_ids(
+            conn, "contracts", "contract_id", sum(number for _, number in subscriber_contracts)
+        ))
+
+        for subscriber_id, contracts_count in subscriber_contracts:
+            has_email = rng.random() < 0.6
+            is_debtor = rng.random() < 0.12
+            balance = -rng.randint(1, 15000) if is_debtor else int(rng.expovariate(1 / 3000))
+            city = _pick(rng, _CITY_CHOICES)
+            subscribers.append((
+                subscriber_id,
+                _full_name(rng),
+                f"г. {city}, {rng.choice(STREETS)}, д. {rng.randint(1, 150)}, кв. {rng.randint(1, 300)}",
+                f"+375{MOBILE_CODES[subscriber_id // 10_000_000 % len(MOBILE_CODES)]}{subscriber_id % 10_000_000:07d}",
+                password_hashes[subscriber_id % len(password_hashes)],
+                _money(min(balance, 500_000)),
+                f"subscriber{subscriber_id}@example.com" if has_email else None,
+                has_email and rng.random() < 0.8,
+            ))
+
+            for _ in range(contracts_count):
+                contract_id = next(contract_ids)
+                status = _pick(rng, _CONTRACT_STATUS_CHOICES)
+                start_date = last_day - timedelta(days=rng.randint(0, 30)) if status == "Ожидает активации" \
+                    else _recent_day(rng, first_day, last_day)
+                service = rng.choice(active_services if status != "Расторгнут" else services)
+                contracts.append((contract_id, subscriber_id, service["service_id"], start_date, status))
+
+                if status != "Расторгнут" and rng.random() < 0.85:
+                    equipment.append([contract_id, "Wi-Fi Роутер", rng.choice(ROUTER_BRANDS), "У абонента"])
+                if "ТВ" in service["name"] and status != "Расторгнут":
+                    equipment.append([contract_id, "ТВ-приставка", rng.choice(TV_BOX_BRANDS), "У абонента"])
+
+                if status == "Ожидает активации":
+                    continue
+                # Ежемесячная оплата; по расторгнутому договору платежи прекращаются
+                paid_until = last_day
+                if status == "Расторгнут":
+                    paid_until = _random_day(rng, start_date, last_day)
+                month = month_start(max(start_date, first_day))
+                while month <= paid_until:
+                    if rng.random() < 0.9:
+                        day = month + timedelta(days=rng.randint(0, 27))
+                        if first_day <= day <= paid_until:
+                            amount = service["price"] * rng.choice((2, 3)) if rng.random() < 0.1 else service["price"]
+                            if amount > 0:
+                                payments.append((
+                                    subscriber_id, amount, _random_moment(rng, day), _pick(rng, _PAYMENT_METHOD_CHOICES)
+                                ))
+                    month = add_months(month, 1)
+
+            # Уведомления: в среднем около трех на абонента
+            for _ in range(min(20, int(rng.expovariate(1 / 3)))):
+                notification_type, message = rng.choice(NOTIFICATIONS)
+                sent_day = _random_day(rng, first_day, last_day)
+                notifications.append((
+                    subscriber_id, message, notification_type,
+                    (last_day - sent_day).days > 14 or rng.random() < 0.3,
+                    _random_moment(rng, sent_day)
+                ))
+
+        # Оборудование на складе - около 5% от выданного
+        for _ in range(len(equipment) // 20):
+            equipment.append([None, "Wi-Fi Роутер", rng.choice(ROUTER_BRANDS), "На складе"])
+        equipment_ids = await _reserve_ids(conn, "equipment", "equipment_id", len(equipment))
+        equipment_rows = []
+        for equipment_id, (contract_id, equipment_type, brand, status) in zip(equipment_ids, equipment):
+            mac = equipment_id.to_bytes(5, "big").hex().upper()
+            equipment_rows.append((
+                equipment_id, contract_id, equipment_type, f"{brand}_G{equipment_id:09d}",
+                "02:" + ":".join(mac[i:i + 2] for i in range(0, 10, 2)), status
+            ))
+
+        # Заявки: примерно у трети абонентов, у некоторых по несколько
+        ticket_owners = [
+            subscriber_id for subscriber_id in subscriber_ids
+            for _ in range(int(rng.expovariate(1 / 0.5)))
+        ]
+        ticket_ids = await _reserve_ids(conn, "tickets", "ticket_id", len(ticket_owners))
+        for ticket_id, subscriber_id in zip(ticket_ids, ticket_owners):
+            created_day = _recent_day(rng, first_day, last_day)
+            created_at = _random_moment(rng, created_day)
+            age_days = (last_day - created_day).days
+            if age_days > 14:
+                status = "Закрыта"
+            else:
+                status = rng.choices(("Новая", "В работе", "Закрыта"), weights=(30, 40, 30))[0]
+            assigned_to = rng.choice(technicians) if technicians and status != "Новая" else None
+
+            moment = created_at
+            for index in range(rng.randint(1, 6) if status != "Новая" else 1):
+                moment += timedelta(minutes=rng.randint(5, 60 * 24))
+                from_subscriber = index % 2 == 0 or assigned_to is None
+                messages.append((
+                    ticket_id,
+                    subscriber_id if from_subscriber else None,
+                    None if from_subscriber else assigned_to,
+                    rng.choice(SUBSCRIBER_REPLIES if from_subscriber else EMPLOYEE_REPLIES),
+                    moment
+                ))
+            tickets.append((
+                ticket_id, subscriber_id, assigned_to, rng.choice(TICKET_TITLES),
+                "Заявка абонента из личного кабинета", status, created_at, moment
+            ))
+
+        # Системный журнал: около --logs-per-subscriber записей на абонента
+        employee_logins = options["employee_logins"] or [None]
+        for _ in range(count * options["logs_per_subscriber"]):
+            level = _pick(rng, _LOG_LEVEL_CHOICES)
+            template = rng.choice(LOG_MESSAGES)
+            logs.append((
+                _random_moment(rng, _recent_day(rng, first_day, last_day)),
+                level,
+                template.format(id=rng.choice(subscriber_ids)),
+                rng.choice(employee_logins)
+            ))
+
+        await conn.copy_records_to_table(
+            "subscribers", records=subscribers,
+            columns=["subscriber_id", "full_name", "address", "phone_number", "password_hash",
+                     "balance", "email", "is_confirmed"]
+        )
+        await conn.copy_records_to_table(
+            "contracts", records=contracts,
+            columns=["contract_id", "subscriber_id", "service_id", "start_date", "status"]
+        )
+        await conn.copy_records_to_table(
+            "equipment", records=equipment_rows,
+            columns=["equipment_id", "contract_id", "type", "serial_number", "mac_address", "status"]
+        )
+        # Итоги платежей пересчитываются одним проходом после загрузки, поэтому триггер
+        # итогов их пропускает, как строки, переносимые между секциями
+        await conn.execute("SET LOCAL app.partition_move = 'on'")
+        await conn.copy_records_to_table(
+            "payments", records=payments,
+            columns=["subscriber_id", "amount", "payment_date", "payment_method"]
+        )
+        await conn.copy_records_to_table(
+            "notifications", records=notifications,
+            columns=["subscriber_id", "message", "type", "is_read", "sent_date"]
+        )
+        await conn.copy_records_to_table(
+            "tickets", records=tickets,
+            columns=["ticket_id", "subscriber_id", "assigned_to_id", "title", "description",
+                     "status", "created_at", "updated_at"]
+        )
+        await conn.copy_records_to_table(
+            "ticket_messages", records=messages,
+            columns=["ticket_id", "subscriber_id", "employee_id", "message_text", "created_at"]
+        )
+        await conn.copy_records_to_table(
+            "system_logs", records=logs,
+            columns=["timestamp", "level", "message", "user_login"]
+        )
+
+    return {
+        "subscribers": len(subscribers),
+        "contracts": len(contracts),
+        "equipment": len(equipment_rows),
+        "payments": len(payments),
+        "tickets": len(tickets),
+        "ticket_messages": len(messages),
+        "notifications": len(notifications),
+        "system_logs": len(logs),
+    }
+
+
+async def _run_chunk(options: dict) -> dict:
+    try:
+        return await _load_chunk(options)
+    finally:
+        await close_db_pool()
+
+
+def load_chunk(options: dict) -> dict:
+    """
+    Загружает одну часть данных. Выполняется в отдельном процессе со своим пулом соединений.
+    """
+    return asyncio.run(_run_chunk(options))
+
+
+async def prepare(args, first_day: date, last_day: date) -> dict:
+    """
+    Очищает таблицы (с --truncate), создает секции на весь период и читает справочники.
+    """
+    async with get_db_connection() as conn:
+        if args.truncate:
+            await conn.execute(f"TRUNCATE TABLE {', '.join(GENERATED_TABLES)} RESTART IDENTITY CASCADE")
+        for table, column in PARTITIONED_TABLES.items():
+            await ensure_month_partitions(conn, table, column, month_start(first_day), add_months(month_start(last_day), 1))
+        services = await conn.fetch("SELECT service_id, name, price, status FROM services ORDER BY service_id")
+        employees = await conn.fetch("SELECT employee_id, login, role FROM employees ORDER BY employee_id")
+    return {
+        "services": [dict(service) for service in services],
+        "technician_ids": [
+            employee["employee_id"] for employee in employees if employee["role"] == "Технический специалист"
+        ],
+        "employee_logins": [employee["login"] for employee in employees],
+    }
+
+
+async def finish(first_day: date, last_day: date):
+    """
+    Пересчитывает дневные итоги платежей по месяцам и обновляет статистику планировщика.
+    """
+    month = month_start(first_day)
+    while month <= last_day:
+        await rebuild_payment_rollups(month, add_months(month, 1) - timedelta(days=1))
+        month = add_months(month, 1)
+    async with get_db_connection() as conn:
+        await conn.execute(f"ANALYZE {', '.join(GENERATED_TABLES)}")
+
+
+async def _run_setup(args, first_day: date, last_day: date) -> dict:
+    try:
+        return await prepare(args, first_day, last_day)
+    finally:
+        await close_db_pool()
+
+
+async def _run_finish(first_day: date, last_day: date):
+    try:
+        await finish(first_day, last_day)
+    finally:
+        await close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных для нагрузочных проверок")
+    parser.add_argument("--subscribers", type=int, default=10000, help="число абонентов")
+    parser.add_argument("--years", type=int, default=3, help="за сколько лет генерируются платежи и события")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="абонентов в одной части загрузки")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов загрузки")
+    parser.add_argument("--password-pool", type=int, default=64, help="число различных паролей абонентов")
+    parser.add_argument("--logs-per-subscriber", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1, help="начальное значение генератора случайных чисел")
+    parser.add_argument("--truncate", action="store_true",
+                        help="очистить абонентов и связанные с ними таблицы перед загрузкой")
+    args = parser.parse_args()
+
+    last_day = date.today()
+    first_day = add_months(month_start(last_day), -12 * args.years)
+    started = time.perf_counter()
+
+    reference = asyncio.run(_run_setup(args, first_day, last_day))
+    if not reference["services"]:
+        print("В базе нет услуг: сначала выполните database/seed.sql.")
+        return
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        password_hashes = build_password_hashes(max(1, min(args.password_pool, args.subscribers)), executor)
+        print(f"Хеши паролей ({len(password_hashes)}) готовы за {time.perf_counter() - started:.1f} с")
+
+        chunks = []
+        for index, offset in enumerate(range(0, args.subscribers, args.chunk_size)):
+            chunks.append({
+                **reference,
+                "seed": args.seed * 1_000_003 + index,
+                "subscribers": min(args.chunk_size, args.subscribers - offset),
+                "first_day": first_day,
+                "last_day": last_day,
+                "password_hashes": password_hashes,
+                "logs_per_subscriber": args.logs_per_subscriber,
+            })
+
+        totals = {}
+        for counts in executor.map(load_chunk, chunks):
+            for table, rows in counts.items():
+                totals[table] = totals.get(table, 0) + rows
+            print(f"Загружено абонентов: {totals['subscribers']} из {args.subscribers} "
+                  f"({time.perf_counter() - started:.1f} с)")
+    finally:
+        executor.shutdown()
+
+    asyncio.run(_run_finish(first_day, last_day))
+    for table, rows in totals.items():
+        print(f"{table}: {rows}")
+    print(f"Готово за {time.perf_counter() - started:.1f} с. Пароль абонента с ID n: load-<n % {len(password_hashes)}>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Проверка планов выполнения запросов сервисов на заполненной базе (например, после database/seed.sql).
+
+Команда вызывает функции чтения из src/services с реальными ID из базы, перехватывает
+выполненные ими запросы и для каждого запроса:
+    1) выполняет EXPLAIN (ANALYZE, BUFFERS) и отмечает последовательные чтения таблиц,
+       прочитавшие не меньше --min-rows строк;
+    2) повторно строит план с запретом последовательного чтения (enable_seqscan = off):
+       если таблица с условием отбора все равно читается целиком, подходящего индекса нет.
+Запросы выгрузок, которые выполняются через курсор, проверяются по тексту из export_service.
+Функции изменения данных не вызываются. Код возврата 1 означает, что найдены замечания.
+
+Примеры:
+    python -m src.cli.index_advisor
+    python -m src.cli.index_advisor --min-rows 500 --json
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date
+
+from src.db.connection import get_db_connection, request_scope, close_db_pool
+from src.db.explain import is_read_query, explain_query, find_seq_scans, shared_blocks_read
+from src.services import (
+    contract_service, employee_service, equipment_service, export_service, log_service,
+    report_service, service_service, subscriber_auth_service, subscriber_service, ticket_service
+)
+
+
+async def load_samples(conn) -> dict:
+    """
+    ID и значения из базы, с которыми вызываются функции сервисов.
+    Берутся последние записи: они ближе всего к тому, что открывают пользователи.
+    """
+    first_day, last_day = await report_service.get_payments_date_range()
+    last_day = last_day or date.today()
+    return {
+        "subscriber_id": await conn.fetchval("SELECT subscriber_id FROM contracts ORDER BY contract_id DESC LIMIT 1"),
+        "phone": await conn.fetchval("SELECT phone_number FROM subscribers ORDER BY subscriber_id DESC LIMIT 1"),
+        "contract_id": await conn.fetchval("SELECT MAX(contract_id) FROM contracts"),
+        "equipment_id": await conn.fetchval("SELECT MAX(equipment_id) FROM equipment"),
+        "ticket_id": await conn.fetchval("SELECT MAX(ticket_id) FROM tickets"),
+        "employee_id": await conn.fetchval("SELECT MAX(employee_id) FROM employees"),
+        "service_id": await conn.fetchval("SELECT MAX(service_id) FROM services"),
+        "first_day": first_day or last_day,
+        "last_day": last_day,
+    }
+
+
+def service_calls(samples: dict) -> list:
+    """
+    Функции чтения сервисов: пары (название, функция без аргументов, возвращающая корутину).
+    """
+    s = samples
+    month_ago = date.fromordinal(s["last_day"].toordinal() - 30)
+    return [
+        ("subscriber_service.fetch_all_subscribers", lambda: subscriber_service.fetch_all_subscribers()),
+        ("subscriber_service.fetch_all_subscribers(debtors, balance)",
+         lambda: subscriber_service.fetch_all_subscribers(sort_by="balance", balance_filter="debtors")),
+        ("subscriber_service.fetch_subscriber_by_id", lambda: subscriber_service.fetch_subscriber_by_id(s["subscriber_id"])),
+        ("subscriber_service.search_subscribers(name)", lambda: subscriber_service.search_subscribers("Иван")),
+        ("subscriber_service.search_subscribers(phone)", lambda: subscriber_service.search_subscribers(s["phone"] or "900")),
+        ("contract_service.fetch_contracts_by_subscriber_id",
+         lambda: contract_service.fetch_contracts_by_subscriber_id(s["subscriber_id"])),
+        ("contract_service.fetch_all_contracts", lambda: contract_service.fetch_all_contracts()),
+        ("contract_service.fetch_all_contracts(filters)",
+         lambda: contract_service.fetch_all_contracts(
+             status_filter="Активен", service_id_filter=s["service_id"], date_from=month_ago, date_to=s["last_day"]
+         )),
+        ("contract_service.fetch_all_services_for_selection", lambda: contract_service.fetch_all_services_for_selection()),
+        ("contract_service.fetch_contract_details_for_pdf",
+         lambda: contract_service.fetch_contract_details_for_pdf(s["contract_id"])),
+        ("equipment_service.fetch_all_equipment", lambda: equipment_service.fetch_all_equipment()),
+        ("equipment_service.fetch_all_equipment(in stock)", lambda: equipment_service.fetch_all_equipment(status_filter="На складе")),
+        ("equipment_service.fetch_equipment_by_id", lambda: equipment_service.fetch_equipment_by_id(s["equipment_id"])),
+        ("equipment_service.search_contracts_for_linking",
+         lambda: equipment_service.search_contracts_for_linking("Иван", current_contract_id=s["contract_id"])),
+        ("equipment_service.fetch_contract_for_linking", lambda: equipment_service.fetch_contract_for_linking(s["contract_id"])),
+        ("equipment_service.fetch_unique_equipment_types", lambda: equipment_service.fetch_unique_equipment_types()),
+        ("ticket_service.fetch_tickets_by_subscriber_id", lambda: ticket_service.fetch_tickets_by_subscriber_id(s["subscriber_id"])),
+        ("ticket_service.fetch_all_tickets", lambda: ticket_service.fetch_all_tickets()),
+        ("ticket_service.fetch_all_tickets(in progress)", lambda: ticket_service.fetch_all_tickets(status_filter="В работе")),
+        ("ticket_service.fetch_ticket_by_id", lambda: ticket_service.fetch_ticket_by_id(s["ticket_id"])),
+        ("ticket_service.fetch_messages_for_ticket", lambda: ticket_service.fetch_messages_for_ticket(s["ticket_id"])),
+        ("employee_service.fetch_all_employees", lambda: employee_service.fetch_all_employees()),
+        ("employee_service.fetch_all_employees_for_selection", lambda: employee_service.fetch_all_employees_for_selection()),
+        ("employee_service.fetch_employee_by_id", lambda: employee_service.fetch_employee_by_id(s["employee_id"])),
+        ("service_service.fetch_all_services", lambda: service_service.fetch_all_services()),
+        ("service_service.fetch_service_by_id", lambda: service_service.fetch_service_by_id(s["service_id"])),
+        ("subscriber_auth_service.get_subscriber_by_phone",
+         lambda: subscriber_auth_service.get_subscriber_by_phone(s["phone"] or "")),
+        ("subscriber_auth_service.get_subscriber_payments",
+         lambda: subscriber_auth_service.get_subscriber_payments(s["subscriber_id"], s["last_day"].year)),
+        ("subscriber_auth_service.get_subscriber_notifications",
+         lambda: subscriber_auth_service.get_subscriber_notifications(s["subscriber_id"])),
+        ("report_service.get_payment_summary", lambda: report_service.get_payment_summary(month_ago, s["last_day"])),
+        ("report_service.get_payments_report", lambda: report_service.get_payments_report(month_ago, s["last_day"])),
+        ("report_service.get_payments_date_range", lambda: report_service.get_payments_date_range()),
+        ("log_service.fetch_logs", lambda: log_service.fetch_logs()),
+        ("log_service.fetch_logs(period, level)",
+         lambda: log_service.fetch_logs(level="WARNING", date_from=month_ago, date_to=s["last_day"])),
+    ]
+
+
+def cursor_queries(samples: dict) -> list:
+    """
+    Запросы, выполняемые через курсор: тройки (название, текст запроса, параметры).
+    """
+    queries = [
+        ("report_service.iter_payments_for_period",
+         report_service.PAYMENTS_FOR_PERIOD_QUERY, [samples["first_day"], samples["last_day"]]),
+    ]
+    for entity, spec in export_service.EXPORT_ENTITIES.items():
+        query, params = export_service.build_export_query(entity)
+        queries.append((f"export_service.{entity}", query, params))
+        if spec["date_column"]:
+            query, params = export_service.build_export_query(entity, samples["first_day"], samples["last_day"])
+            queries.append((f"export_service.{entity}(period)", query, params))
+    return queries
+
+
+async def capture_service_queries(calls: list) -> list:
+    """
+    Вызывает функции сервисов в единице работы и собирает выполненные ими запросы чтения:
+    тройки (название функции, текст запроса, параметры) без повторов.
+    """
+    captured = []
+    seen = set()
+    current = {"name": None}
+
+    def on_query(record):
+        if record.exception is None and is_read_query(record.query) and record.query not in seen:
+            seen.add(record.query)
+            captured.append((current["name"], record.query, list(record.args)))
+
+    async with request_scope() as scope:
+        conn = await scope.get_connection()
+        conn.add_query_logger(on_query)
+        try:
+            for name, call in calls:
+                current["name"] = name
+                try:
+                    await call()
+                except Exception as e:
+                    print(f"{name}: ошибка вызова: {e}", file=sys.stderr)
+                # Журнал запросов asyncpg вызывается через цикл событий
+                await asyncio.sleep(0)
+        finally:
+            conn.remove_query_logger(on_query)
+    return captured
+
+
+async def analyze_query(conn, name: str, sql: str, args: list, min_rows: int) -> dict:
+    plan = await explain_query(conn, sql, args)
+    issues = []
+    for scan in find_seq_scans(plan):
+        if scan.rows_scanned >= min_rows:
+            issues.append({
+                "kind": "seq_scan",
+                "relation": scan.relation,
+                "filter": scan.filter,
+                "rows_scanned": scan.rows_scanned,
+                "rows_returned": scan.rows_returned,
+            })
+
+    forced_plan = await explain_query(conn, sql, args, analyze=False, disable_seqscan=True)
+    for scan in find_seq_scans(forced_plan):
+        if scan.filter:
+            issues.append({"kind": "missing_index", "relation": scan.relation, "filter": scan.filter})
+
+    return {
+        "name": name,
+        "query": " ".join(sql.split()),
+        "execution_ms": round(plan.get("Actual Total Time", 0.0), 3),
+        "blocks": shared_blocks_read(plan),
+        "issues": issues,
+    }
+
+
+def print_report(results: list):
+    for result in results:
+        if not result["issues"]:
+            continue
+        print(f"{result['name']} ({result['execution_ms']} мс, блоков: {result['blocks']})")
+        print(f"    {result['query'][:200]}")
+        for issue in result["issues"]:
+            if issue["kind"] == "seq_scan":
+                print(
+                    f"    последовательное чтение {issue['relation']}: прочитано {issue['rows_scanned']}, "
+                    f"возвращено {issue['rows_returned']}, фильтр: {issue['filter'] or '-'}"
+                )
+            else:
+                print(f"    нет индекса для {issue['relation']}: {issue['filter']}")
+    flagged = sum(1 for result in results if result["issues"])
+    print(f"Проверено запросов: {len(results)}, с замечаниями: {flagged}")
+
+
+async def run(args) -> int:
+    try:
+        async with get_db_connection() as conn:
+            samples = await load_samples(conn)
+        if samples["subscriber_id"] is None:
+            print("В базе нет данных: заполните ее (например, database/seed.sql) перед проверкой.", file=sys.stderr)
+            return 2
+
+        queries = await capture_service_queries(service_calls(samples)) + cursor_queries(samples)
+        results = []
+        async with get_db_connection() as conn:
+            for name, sql, query_args in queries:
+                try:
+                    results.append(await analyze_query(conn, name, sql, query_args, args.min_rows))
+                except Exception as e:
+                    print(f"{name}: не удалось построить план: {e}", file=sys.stderr)
+    finally:
+        await close_db_pool()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+    return 1 if any(result["issues"] for result in results) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск последовательных чтений и недостающих индексов в запросах сервисов")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="с какого числа прочитанных строк последовательное чтение считается замечанием")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
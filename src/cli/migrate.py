@@ -0,0 +1,115 @@
+"""
+Применение версионированных миграций схемы из database/migrations/.
+
+Команды:
+    status   - показывает примененные и ожидающие миграции;
+    up       - применяет ожидающие миграции по порядку (с --to - только до указанной версии);
+    baseline - отмечает миграции примененными без выполнения: для базы, созданной из schema.sql
+               (в ней уже есть все изменения) или обновленной вручную через psql.
+
+Примеры:
+    python -m src.cli.migrate status
+    python -m src.cli.migrate up
+    python -m src.cli.migrate baseline --to 6
+"""
+import argparse
+import asyncio
+import sys
+
+from src.db.connection import get_db_connection, close_db_pool
+from src.db.migrations import (
+    discover_migrations, ensure_migrations_table, fetch_applied_migrations,
+    find_changed_migrations, find_invalid_indexes, migrate, baseline
+)
+
+
+def warn_about_changed(migrations, applied):
+    for migration in find_changed_migrations(migrations, applied):
+        print(f"Внимание: файл миграции {migration.path.name} изменен после применения", file=sys.stderr)
+
+
+async def show_status(args):
+    migrations = discover_migrations()
+    async with get_db_connection() as conn:
+        await ensure_migrations_table(conn)
+        applied = await fetch_applied_migrations(conn)
+
+    for migration in migrations:
+        record = applied.get(migration.version)
+        state = f"применена {record['applied_at']:%Y-%m-%d %H:%M}" if record else "ожидает"
+        mode = "" if migration.transactional else " [без транзакции]"
+        print(f"{migration.version:03d} {migration.name}{mode}: {state}")
+    warn_about_changed(migrations, applied)
+
+
+async def warn_about_invalid_indexes(conn):
+    try:
+        invalid = await find_invalid_indexes(conn)
+    except Exception as e:
+        # Не заслоняем исходную ошибку миграции
+        print(f"Не удалось проверить индексы: {e}", file=sys.stderr)
+        return
+    for name in invalid:
+        print(
+            f"Внимание: индекс {name} недействителен (прерванное CREATE INDEX CONCURRENTLY). "
+            f"Удалите его командой DROP INDEX CONCURRENTLY {name} и повторите миграцию.",
+            file=sys.stderr
+        )
+
+
+async def apply_migrations(args):
+    migrations = discover_migrations()
+
+    def report(migration):
+        print(f"Применена миграция {migration.version:03d} {migration.name}")
+
+    async with get_db_connection() as conn:
+        try:
+            done = await migrate(conn, migrations, target=args.to, on_applied=report)
+        finally:
+            # Недействительный индекс остается именно после неудачной миграции
+            await warn_about_invalid_indexes(conn)
+        applied = await fetch_applied_migrations(conn)
+
+    if not done:
+        print("Новых миграций нет.")
+    warn_about_changed(migrations, applied)
+
+
+async def mark_applied(args):
+    migrations = discover_migrations()
+    async with get_db_connection() as conn:
+        marked = await baseline(conn, migrations, target=args.to)
+    for migration in marked:
+        print(f"Отмечена примененной миграция {migration.version:03d} {migration.name}")
+    if not marked:
+        print("Все миграции уже отмечены.")
+
+
+async def run(args):
+    try:
+        await args.handler(args)
+    finally:
+        await close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    status_parser = subparsers.add_parser("status", help="показать состояние миграций")
+    status_parser.set_defaults(handler=show_status)
+
+    up_parser = subparsers.add_parser("up", help="применить ожидающие миграции")
+    up_parser.add_argument("--to", type=int, default=None, help="последняя применяемая версия")
+    up_parser.set_defaults(handler=apply_migrations)
+
+    baseline_parser = subparsers.add_parser("baseline", help="отметить миграции примененными без выполнения")
+    baseline_parser.add_argument("--to", type=int, default=None, help="последняя отмечаемая версия")
+    baseline_parser.set_defaults(handler=mark_applied)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
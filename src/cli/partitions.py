@@ -0,0 +1,91 @@
+"""
+Обслуживание помесячных секций таблиц.
+
+Команды:
+    create  - создает секции на текущий и ближайшие месяцы (запускать по расписанию, например раз в сутки);
+    archive - отсоединяет секции старше срока хранения, выгружает их в сжатые CSV-файлы и удаляет;
+    list    - выводит существующие секции.
+
+Примеры:
+    python -m src.cli.partitions create --table payments --months-ahead 3
+    python -m src.cli.partitions archive --table system_logs --keep-months 12 --archive-dir archive
+"""
+import argparse
+import asyncio
+from datetime import date
+from pathlib import Path
+
+from src.db.connection import get_db_connection, close_db_pool
+from src.db.partitions import (
+    PARTITIONED_TABLES, add_months, month_start, partition_name, list_partitions,
+    ensure_month_partitions, archive_partition
+)
+
+
+async def create_partitions(args):
+    column = PARTITIONED_TABLES[args.table]
+    current_month = month_start(date.today())
+    async with get_db_connection() as conn:
+        created = await ensure_month_partitions(
+            conn, args.table, column, current_month, add_months(current_month, args.months_ahead)
+        )
+    for name in created:
+        print(f"Создана секция {name}")
+    if not created:
+        print("Все секции уже существуют.")
+
+
+async def archive_partitions(args):
+    # Секции месяцев раньше этой даты отправляются в архив
+    oldest_kept = add_months(month_start(date.today()), -args.keep_months)
+    oldest_kept_name = partition_name(args.table, oldest_kept)
+    archive_dir = Path(args.archive_dir) / args.table
+
+    async with get_db_connection() as conn:
+        partitions = await list_partitions(conn, args.table)
+        for name, _ in partitions:
+            if name == f"{args.table}_default" or name >= oldest_kept_name:
+                continue
+            archive_path = await archive_partition(conn, args.table, name, archive_dir)
+            print(f"Секция {name} выгружена в {archive_path} и удалена")
+
+
+async def show_partitions(args):
+    async with get_db_connection() as conn:
+        partitions = await list_partitions(conn, args.table)
+    for name, bounds in partitions:
+        print(f"{name}: {bounds}")
+
+
+async def run(args):
+    try:
+        await args.handler(args)
+    finally:
+        await close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание помесячных секций таблиц")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="создать секции на будущие месяцы")
+    create_parser.add_argument("--table", choices=PARTITIONED_TABLES, default="system_logs")
+    create_parser.add_argument("--months-ahead", type=int, default=3)
+    create_parser.set_defaults(handler=create_partitions)
+
+    archive_parser = subparsers.add_parser("archive", help="выгрузить и удалить старые секции")
+    archive_parser.add_argument("--table", choices=PARTITIONED_TABLES, default="system_logs")
+    archive_parser.add_argument("--keep-months", type=int, default=12,
+                                help="сколько последних месяцев (кроме текущего) оставить в БД")
+    archive_parser.add_argument("--archive-dir", default="archive")
+    archive_parser.set_defaults(handler=archive_partitions)
+
+    list_parser = subparsers.add_parser("list", help="показать секции")
+    list_parser.add_argument("--table", choices=PARTITIONED_TABLES, default="system_logs")
+    list_parser.set_defaults(handler=show_partitions)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
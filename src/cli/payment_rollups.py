@@ -0,0 +1,98 @@
+"""
+Обслуживание дневных итогов платежей (payment_daily_rollups).
+
+Команды:
+    backfill  - пересчитывает итоги за период по самим платежам (по месяцу за транзакцию);
+    reconcile - сверяет итоги с платежами и выводит расхождения, с --fix пересчитывает дни с расхождениями.
+
+Без --from/--to берется весь период, за который есть платежи.
+
+Примеры:
+    python -m src.cli.payment_rollups backfill
+    python -m src.cli.payment_rollups reconcile --from 2025-01-01 --to 2025-01-31 --fix
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from src.db.connection import close_db_pool
+from src.db.partitions import add_months
+from src.services.report_service import (
+    get_payments_date_range, rebuild_payment_rollups, find_payment_rollup_mismatches
+)
+
+
+async def resolve_period(args):
+    if args.date_from and args.date_to:
+        return args.date_from, args.date_to
+    first_day, last_day = await get_payments_date_range()
+    return args.date_from or first_day, args.date_to or last_day or date.today()
+
+
+async def backfill_rollups(args):
+    start_date, end_date = await resolve_period(args)
+    if start_date is None:
+        print("Платежей нет, пересчитывать нечего.")
+        return
+
+    # Пересчет по месяцам, чтобы блокировка записи платежей была короткой
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(add_months(chunk_start.replace(day=1), 1) - timedelta(days=1), end_date)
+        rows = await rebuild_payment_rollups(chunk_start, chunk_end)
+        print(f"{chunk_start} - {chunk_end}: записано строк итогов: {rows}")
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+async def reconcile_rollups(args):
+    start_date, end_date = await resolve_period(args)
+    if start_date is None:
+        print("Платежей нет, сверять нечего.")
+        return
+
+    mismatches = await find_payment_rollup_mismatches(start_date, end_date)
+    for row in mismatches:
+        print(
+            f"{row['day']} {row['payment_method']}: "
+            f"платежей {row['actual_count']} на сумму {row['actual_amount']}, "
+            f"в итогах {row['rollup_count']} на сумму {row['rollup_amount']}"
+        )
+    if not mismatches:
+        print(f"Итоги за {start_date} - {end_date} совпадают с платежами.")
+        return
+
+    if args.fix:
+        for day in sorted({row["day"] for row in mismatches}):
+            await rebuild_payment_rollups(day, day)
+            print(f"Итоги за {day} пересчитаны")
+
+
+async def run(args):
+    try:
+        await args.handler(args)
+    finally:
+        await close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание дневных итогов платежей")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_period_arguments(command_parser):
+        command_parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+        command_parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+
+    backfill_parser = subparsers.add_parser("backfill", help="пересчитать итоги за период")
+    add_period_arguments(backfill_parser)
+    backfill_parser.set_defaults(handler=backfill_rollups)
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="сверить итоги с платежами")
+    add_period_arguments(reconcile_parser)
+    reconcile_parser.add_argument("--fix", action="store_true", help="пересчитать дни с расхождениями")
+    reconcile_parser.set_defaults(handler=reconcile_rollups)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
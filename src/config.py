@@ -7,10 +7,57 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
 
+    # Пул соединений с базой данных
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_ACQUIRE_TIMEOUT: float = 5.0
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = 300.0
+    DB_COMMAND_TIMEOUT: float = 30.0
+
+    # Учет запросов к БД по каждому HTTP-запросу (для разработки и тестов, см. src/db/instrumentation.py)
+    DB_QUERY_STATS: bool = False
+    # Сколько повторов одного запроса за HTTP-запрос считаются признаком N+1
+    DB_QUERY_REPEAT_THRESHOLD: int = 5
+
+    # Заголовок Server-Timing с этапами каждого запроса и журнал медленных запросов (см. src/timing.py)
+    SERVER_TIMING: bool = True
+    SLOW_REQUEST_THRESHOLD_MS: float = 1000.0
+    SLOW_REQUEST_LOG_PATH: str = "logs/slow_requests.log"
+
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
     JWT_EXPIRATION_MINUTES: int
 
+    # "stateful" - пользователь загружается из БД по JWT,
+    # "stateless" - данные пользователя хранятся в самом JWT, проверяется только версия токена
+    SESSION_MODE: str = "stateful"
+    TOKEN_VERSION_CACHE_TTL_SECONDS: float = 30.0
+
+    # Число потоков для bcrypt (одновременно вычисляемых хешей паролей)
+    PASSWORD_HASH_WORKERS: int = 2
+
+    # Рендеринг PDF-договоров: число процессов (0 - по числу ядер) и каталог кэша готовых файлов
+    PDF_RENDER_WORKERS: int = 0
+    PDF_CACHE_DIR: str = "cache/pdf"
+
+    # Журнал действий пишется пачками фоновой задачей (см. src/services/log_service.py).
+    # AUDIT_LOG_SYNC=true - каждая запись сразу выполняется INSERT-ом (удобно для тестов и отладки)
+    AUDIT_LOG_SYNC: bool = False
+    AUDIT_LOG_BATCH_SIZE: int = 500
+    AUDIT_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_LOG_BUFFER_SIZE: int = 10000
+
+    # Кэш пользователей, определенных по JWT (см. src/auth/principal_cache.py)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_SIZE: int = 1024
+
+    # Кэш отчетов по платежам (0 - не кэшировать)
+    REPORT_CACHE_TTL_SECONDS: float = 300.0
+    REPORT_CACHE_MAX_SIZE: int = 256
+
+    # На сколько месяцев вперед создаются секции журнала и платежей при старте приложения
+    PARTITIONS_MONTHS_AHEAD: int = 3
+
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
     MAIL_FROM: str
@@ -1,16 +1,270 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
 import asyncpg
 from src.config import settings
+from src.db.instrumentation import QueryStats, get_query_stats
+from src.timing import measure
 
-async def get_db_connection():
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Счетчики для мониторинга работы пула
+_pool_stats = {
+    "acquired_total": 0,
+    "acquire_timeouts": 0,
+    "acquire_wait_total_ms": 0.0,
+    "acquire_wait_max_ms": 0.0,
+}
+
+
+async def init_db_pool() -> asyncpg.Pool:
+    """
+    Создает общий пул соединений. Вызывается при старте приложения.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = await asyncpg.create_pool(
+                    host=settings.DB_HOST,
+                    port=settings.DB_PORT,
+                    user=settings.DB_USER,
+                    password=settings.DB_PASS,
+                    database=settings.DB_NAME,
+                    min_size=settings.DB_POOL_MIN_SIZE,
+                    max_size=settings.DB_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+                    command_timeout=settings.DB_COMMAND_TIMEOUT
+                )
+            except Exception as e:
+                print(f"Ошибка подключения к базе данных: {e}")
+                raise
+    return _pool
+
+
+async def close_db_pool():
+    """
+    Закрывает пул соединений. Вызывается при остановке приложения.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+async def get_pool() -> asyncpg.Pool:
+    """
+    Возвращает общий пул. Если пул еще не создан (например, в консольных командах),
+    создает его.
+    """
+    if _pool is None:
+        return await init_db_pool()
+    return _pool
+
+
+async def _acquire(pool: asyncpg.Pool):
+    started = time.perf_counter()
     try:
-        conn = await asyncpg.connect(
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            user=settings.DB_USER,
-            password=settings.DB_PASS,
-            database=settings.DB_NAME
-        )
-        return conn
-    except Exception as e:
-        print(f"Ошибка подключения к базе данных: {e}")
-        return None
\ No newline at end of file
+        conn = await pool.acquire(timeout=settings.DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _pool_stats["acquire_timeouts"] += 1
+        print(f"Не удалось получить соединение из пула за {settings.DB_POOL_ACQUIRE_TIMEOUT} с.")
+        raise
+
+    wait_ms = (time.perf_counter() - started) * 1000
+    _pool_stats["acquired_total"] += 1
+    _pool_stats["acquire_wait_total_ms"] += wait_ms
+    _pool_stats["acquire_wait_max_ms"] = max(_pool_stats["acquire_wait_max_ms"], wait_ms)
+    return conn
+
+
+def _start_tracking(conn) -> Optional[QueryStats]:
+    # При включенном учете (см. src/db/instrumentation.py) запросы соединения попадают в счетчики
+    stats = get_query_stats()
+    if stats is not None:
+        stats.connections += 1
+        conn.add_query_logger(stats.on_query)
+    return stats
+
+
+def _stop_tracking(conn, stats: Optional[QueryStats]):
+    if stats is not None:
+        conn.remove_query_logger(stats.on_query)
+
+
+class RequestScope:
+    """
+    Единица работы одного HTTP-запроса: соединение берется из пула при первом
+    обращении к БД и удерживается до конца запроса.
+    Соединение asyncpg не допускает параллельных запросов, поэтому внутри
+    одного запроса обращения к БД должны выполняться последовательно.
+    """
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+        self._conn = None
+        self._stats: Optional[QueryStats] = None
+        # Соединение могут запросить одновременно несколько задач запроса (например,
+        # пачка DataLoader и код обработчика): из пула берется только одно
+        self._lock = asyncio.Lock()
+        # Загрузчики по ID, живущие в рамках запроса (см. src/db/loaders.py)
+        self.loaders: dict = {}
+        # Действия, отложенные до фиксации транзакции: по списку на каждый уровень вложенности
+        self.after_commit: list = []
+
+    async def get_connection(self):
+        if self._conn is not None:
+            return self._conn
+        async with self._lock:
+            if self._conn is None:
+                self._pool = await get_pool()
+                self._conn = await _acquire(self._pool)
+                self._stats = _start_tracking(self._conn)
+        return self._conn
+
+    async def close(self):
+        async with self._lock:
+            if self._conn is not None:
+                conn, self._conn = self._conn, None
+                _stop_tracking(conn, self._stats)
+                await self._pool.release(conn)
+
+
+_request_scope: ContextVar[Optional[RequestScope]] = ContextVar("db_request_scope", default=None)
+
+
+def get_request_scope() -> Optional[RequestScope]:
+    """
+    Возвращает текущую единицу работы или None вне HTTP-запроса.
+    """
+    return _request_scope.get()
+
+
+@asynccontextmanager
+async def request_scope():
+    """
+    Открывает единицу работы: все вызовы get_db_connection() внутри блока
+    используют одно и то же соединение.
+    """
+    scope = RequestScope()
+    token = _request_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _request_scope.reset(token)
+        await scope.close()
+
+
+@asynccontextmanager
+async def get_db_connection():
+    """
+    Выдает соединение на время блока `async with`.
+    Внутри единицы работы (HTTP-запроса) возвращается соединение запроса,
+    иначе соединение берется из пула и возвращается в него по завершении.
+    """
+    stats = get_query_stats()
+    if stats is not None:
+        stats.checkouts += 1
+
+    # Время работы с соединением - этап db в заголовке Server-Timing
+    with measure("db"):
+        scope = _request_scope.get()
+        if scope is not None:
+            yield await scope.get_connection()
+            return
+
+        pool = await get_pool()
+        conn = await _acquire(pool)
+        stats = _start_tracking(conn)
+        try:
+            yield conn
+        finally:
+            _stop_tracking(conn, stats)
+            await pool.release(conn)
+
+
+@asynccontextmanager
+async def db_transaction():
+    """
+    Выполняет блок в транзакции. Все обращения к БД внутри блока
+    (в том числе запись в журнал через log_action) идут через одно соединение
+    и фиксируются или откатываются вместе. Вложенные блоки становятся точками сохранения.
+    """
+    if _request_scope.get() is None:
+        async with request_scope():
+            async with db_transaction() as conn:
+                yield conn
+        return
+
+    scope = _request_scope.get()
+    async with get_db_connection() as conn:
+        scope.after_commit.append([])
+        try:
+            async with conn.transaction():
+                yield conn
+        except BaseException:
+            # Откат: отложенные действия этого уровня отменяются
+            scope.after_commit.pop()
+            raise
+
+        callbacks = scope.after_commit.pop()
+        if scope.after_commit:
+            # Точка сохранения зафиксирована, но внешняя транзакция еще может откатиться
+            scope.after_commit[-1].extend(callbacks)
+        else:
+            for callback in callbacks:
+                await callback()
+
+
+def call_after_commit(callback: Callable[[], Awaitable]) -> bool:
+    """
+    Откладывает вызов callback до фиксации текущей транзакции db_transaction().
+    Возвращает False, если транзакции нет (тогда вызывающий выполняет действие сам).
+    """
+    scope = _request_scope.get()
+    if scope is None or not scope.after_commit:
+        return False
+    scope.after_commit[-1].append(callback)
+    return True
+
+
+async def release_request_connection():
+    """
+    Досрочно возвращает соединение запроса в пул, например перед долгой
+    потоковой отдачей ответа. При следующем обращении к БД соединение будет взято снова.
+    """
+    scope = _request_scope.get()
+    if scope is not None:
+        await scope.close()
+
+
+def get_pool_stats() -> dict:
+    """
+    Возвращает текущее состояние пула и накопленные счетчики.
+    """
+    stats = dict(_pool_stats)
+    acquired = stats["acquired_total"]
+    stats["acquire_wait_avg_ms"] = round(stats["acquire_wait_total_ms"] / acquired, 3) if acquired else 0.0
+    stats["acquire_wait_total_ms"] = round(stats["acquire_wait_total_ms"], 3)
+    stats["acquire_wait_max_ms"] = round(stats["acquire_wait_max_ms"], 3)
+
+    if _pool is None:
+        stats.update({"initialized": False})
+        return stats
+
+    size = _pool.get_size()
+    idle = _pool.get_idle_size()
+    stats.update({
+        "initialized": True,
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+    })
+    return stats
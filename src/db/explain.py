@@ -0,0 +1,77 @@
+import json
+from typing import Iterator, List, NamedTuple, Optional
+
+# Разбор планов выполнения запросов (EXPLAIN ... FORMAT JSON) для поиска
+# последовательных чтений таблиц, которые стоило бы заменить чтением по индексу.
+
+# Команды, которые можно безопасно выполнить через EXPLAIN ANALYZE
+READ_QUERY_PREFIXES = ("select", "with")
+
+
+class SeqScan(NamedTuple):
+    relation: str
+    filter: Optional[str]
+    rows_scanned: int       # прочитано строк таблицы (с учетом отброшенных фильтром и повторов узла)
+    rows_returned: int
+
+
+def is_read_query(sql: str) -> bool:
+    return sql.lstrip().lower().startswith(READ_QUERY_PREFIXES)
+
+
+async def explain_query(conn, sql: str, args=(), analyze: bool = True, disable_seqscan: bool = False) -> dict:
+    """
+    Возвращает корневой узел плана запроса. Запрос выполняется (при analyze)
+    в транзакции, которая всегда откатывается.
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    tr = conn.transaction()
+    await tr.start()
+    try:
+        if disable_seqscan:
+            # Планировщик выбирает последовательное чтение, только если другого пути нет
+            await conn.execute("SET LOCAL enable_seqscan = off")
+        result = await conn.fetchval(f"EXPLAIN ({options}) {sql}", *args)
+    finally:
+        await tr.rollback()
+
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def iter_plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def find_seq_scans(plan: dict) -> List[SeqScan]:
+    """
+    Последовательные чтения таблиц в плане. Для плана без ANALYZE
+    число строк берется из оценки планировщика.
+    """
+    scans = []
+    for node in iter_plan_nodes(plan):
+        if node.get("Node Type") != "Seq Scan":
+            continue
+        if "Actual Rows" in node:
+            loops = node.get("Actual Loops", 1)
+            returned = node["Actual Rows"] * loops
+            scanned = (node["Actual Rows"] + node.get("Rows Removed by Filter", 0)) * loops
+        else:
+            returned = scanned = node.get("Plan Rows", 0)
+        scans.append(SeqScan(
+            relation=node.get("Relation Name", "?"),
+            filter=node.get("Filter"),
+            rows_scanned=int(scanned),
+            rows_returned=int(returned)
+        ))
+    return scans
+
+
+def shared_blocks_read(plan: dict) -> int:
+    """
+    Сколько блоков запрос прочитал (из кэша и с диска) по данным BUFFERS.
+    """
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
@@ -0,0 +1,177 @@
+import re
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Учет обращений к БД: сколько соединений взято из пула, сколько раз вызывался
+# get_db_connection, какие запросы выполнены и сколько времени они заняли.
+# Запросы перехватываются журналом запросов asyncpg (add_query_logger) на соединениях,
+# взятых, пока учет включен. Запросы через курсор (conn.cursor) и COPY журнал не видит.
+
+# Заголовки ответа со сводкой по запросу (при DB_QUERY_STATS=true)
+QUERIES_HEADER = "X-DB-Queries"
+CONNECTIONS_HEADER = "X-DB-Connections"
+TIME_HEADER = "X-DB-Time-Ms"
+MAX_REPEATS_HEADER = "X-DB-Max-Repeats"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|\$\d+)(?:\s*,\s*(?:\?|\$\d+))*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Приводит запрос к шаблону: литералы заменяются на ?, списки IN (...) сворачиваются,
+    пробелы схлопываются. Одинаковые по смыслу запросы с разными значениями совпадают.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """
+    Счетчики обращений к БД в рамках одного HTTP-запроса или блока capture_queries().
+    """
+
+    def __init__(self):
+        self.connections = 0        # соединений взято из пула
+        self.checkouts = 0          # вызовов get_db_connection()
+        self.query_count = 0
+        self.db_time_ms = 0.0
+        # Текст запроса -> сколько раз выполнен; шаблоны вычисляются только при выводе
+        self._raw_queries: Counter = Counter()
+
+    def on_query(self, record):
+        """
+        Обработчик журнала запросов asyncpg (LoggedQuery).
+        """
+        self.query_count += 1
+        self.db_time_ms += (record.elapsed or 0.0) * 1000
+        self._raw_queries[record.query] += 1
+
+    @property
+    def queries(self) -> Counter:
+        """
+        Шаблон запроса -> сколько раз выполнен.
+        """
+        normalized = Counter()
+        for sql, count in self._raw_queries.items():
+            normalized[normalize_sql(sql)] += count
+        return normalized
+
+    def repeated_queries(self, threshold: int):
+        """
+        Шаблоны запросов, выполненные не меньше threshold раз: признак N+1.
+        """
+        return [(sql, count) for sql, count in self.queries.most_common() if count >= threshold]
+
+    def max_repeats(self) -> int:
+        return max(self.queries.values(), default=0)
+
+    def as_dict(self) -> dict:
+        return {
+            "connections": self.connections,
+            "checkouts": self.checkouts,
+            "queries": self.query_count,
+            "db_time_ms": round(self.db_time_ms, 3),
+            "by_query": dict(self.queries.most_common()),
+        }
+
+    def as_headers(self) -> list:
+        return [
+            (QUERIES_HEADER.encode("latin-1"), str(self.query_count).encode("latin-1")),
+            (CONNECTIONS_HEADER.encode("latin-1"), str(self.connections).encode("latin-1")),
+            (TIME_HEADER.encode("latin-1"), f"{self.db_time_ms:.1f}".encode("latin-1")),
+            (MAX_REPEATS_HEADER.encode("latin-1"), str(self.max_repeats()).encode("latin-1")),
+        ]
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """
+    Возвращает счетчики текущего запроса или None, если учет не включен.
+    """
+    return _query_stats.get()
+
+
+def start_query_stats() -> tuple:
+    """
+    Включает учет для текущего контекста. Возвращает (счетчики, токен для stop_query_stats).
+    """
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def stop_query_stats(token):
+    _query_stats.reset(token)
+
+
+@asynccontextmanager
+async def capture_queries():
+    """
+    Считает обращения к БД внутри блока, например в тестах:
+
+        async with capture_queries() as stats:
+            await subscriber_service.fetch_subscriber_by_id(1)
+        assert_query_budget(stats, max_queries=1)
+    """
+    stats, token = start_query_stats()
+    try:
+        yield stats
+    finally:
+        stop_query_stats(token)
+
+
+def assert_query_budget(
+    stats: QueryStats,
+    max_queries: int,
+    max_connections: Optional[int] = None,
+    max_repeats: Optional[int] = None
+):
+    """
+    Проверяет, что число запросов (и соединений, и повторов одного шаблона) не превышает лимитов.
+    В сообщении об ошибке перечисляются выполненные шаблоны запросов.
+    """
+    problems = []
+    if stats.query_count > max_queries:
+        problems.append(f"запросов {stats.query_count}, допустимо {max_queries}")
+    if max_connections is not None and stats.connections > max_connections:
+        problems.append(f"соединений {stats.connections}, допустимо {max_connections}")
+    if max_repeats is not None and stats.max_repeats() > max_repeats:
+        problems.append(f"один запрос повторяется {stats.max_repeats()} раз, допустимо {max_repeats}")
+    if problems:
+        listing = "\n".join(f"  {count} x {sql}" for sql, count in stats.queries.most_common())
+        raise AssertionError("; ".join(problems) + "\n" + listing)
+
+
+def assert_response_query_budget(
+    response,
+    max_queries: int,
+    max_connections: Optional[int] = None,
+    max_repeats: Optional[int] = None
+):
+    """
+    То же по заголовкам ответа приложения, запущенного с DB_QUERY_STATS=true
+    (подходит для TestClient и любых HTTP-клиентов).
+    """
+    if QUERIES_HEADER not in response.headers:
+        raise AssertionError(f"В ответе нет заголовка {QUERIES_HEADER}: включите DB_QUERY_STATS")
+    queries = int(response.headers[QUERIES_HEADER])
+    connections = int(response.headers[CONNECTIONS_HEADER])
+    repeats = int(response.headers[MAX_REPEATS_HEADER])
+
+    problems = []
+    if queries > max_queries:
+        problems.append(f"запросов {queries}, допустимо {max_queries}")
+    if max_connections is not None and connections > max_connections:
+        problems.append(f"соединений {connections}, допустимо {max_connections}")
+    if max_repeats is not None and repeats > max_repeats:
+        problems.append(f"один запрос повторяется {repeats} раз, допустимо {max_repeats}")
+    if problems:
+        raise AssertionError(f"{response.request.method} {response.request.url}: " + "; ".join(problems))
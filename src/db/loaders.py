@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Set, Tuple
+
+from src.db.connection import get_request_scope
+
+BatchFunction = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class DataLoader:
+    """
+    Загрузчик записей по ключу в рамках одного запроса.
+    - Запоминает уже полученные записи: повторная загрузка не обращается к БД.
+    - Объединяет ключи, запрошенные в одной итерации цикла событий,
+      в один вызов batch_fn (обычно запрос вида `WHERE id = ANY($1)`).
+    """
+
+    def __init__(self, batch_fn: BatchFunction):
+        self._batch_fn = batch_fn
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Tuple[Hashable, asyncio.Future]] = []
+        # Цикл событий хранит задачи только по слабой ссылке: держим их до завершения
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append((key, future))
+        if len(self._queue) == 1:
+            # Первый ключ в пачке: откладываем запрос до конца текущей итерации,
+            # чтобы успели накопиться ключи из параллельных вызовов.
+            loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Hashable, value: Any):
+        """
+        Кладет уже известную запись в кэш (например, из результата списочного запроса).
+        """
+        if key in self._cache and not self._cache[key].done():
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._cache[key] = future
+
+    def clear(self, key: Hashable):
+        """
+        Сбрасывает запись из кэша после ее изменения.
+        """
+        self._cache.pop(key, None)
+
+    def _dispatch(self):
+        batch, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._run_batch(dict(batch)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, futures: Dict[Hashable, asyncio.Future]):
+        try:
+            rows = await self._batch_fn(list(futures))
+        except BaseException as e:
+            # В том числе отмена задачи (разрыв соединения клиента, закрытие запроса):
+            # ожидающие не должны зависнуть
+            for key, future in futures.items():
+                # Неудачные ключи не кэшируем, чтобы следующая попытка снова пошла в БД
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(rows.get(key))
+
+
+def get_loader(name: str, batch_fn: BatchFunction) -> DataLoader:
+    """
+    Возвращает загрузчик с именем name для текущего запроса.
+    Вне запроса создается одноразовый загрузчик без общего кэша.
+    """
+    scope = get_request_scope()
+    if scope is None:
+        return DataLoader(batch_fn)
+
+    loader = scope.loaders.get(name)
+    if loader is None:
+        loader = scope.loaders[name] = DataLoader(batch_fn)
+    return loader
+
+
+def forget(name: str, key: Hashable):
+    """
+    Сбрасывает закэшированную в рамках запроса запись после ее изменения.
+    """
+    scope = get_request_scope()
+    if scope is not None and name in scope.loaders:
+        scope.loaders[name].clear(key)
@@ -0,0 +1,223 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Версионированные миграции схемы: файлы database/migrations/<номер>_<название>.sql
+# применяются по возрастанию номера, только вперед. Примененные версии хранятся в schema_migrations.
+#
+# Файл выполняется целиком в одной транзакции. Файл с отметкой NO_TRANSACTION_MARKER
+# выполняется по одной команде без общей транзакции - так можно создавать индексы
+# CONCURRENTLY на работающей базе. Команды такого файла должны быть повторяемыми
+# (IF NOT EXISTS / IF EXISTS): при ошибке миграция не отмечается примененной и повторяется целиком.
+
+MIGRATIONS_DIR = Path("database/migrations")
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Ключ advisory-блокировки, чтобы миграции не выполнялись одновременно из двух процессов
+MIGRATIONS_LOCK_KEY = 7310521
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    INTEGER PRIMARY KEY,
+        name       TEXT NOT NULL,
+        checksum   TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Читает файлы миграций каталога, упорядоченные по номеру версии.
+    """
+    migrations = []
+    seen_versions = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            raise ValueError(f"Имя файла миграции не соответствует шаблону <номер>_<название>.sql: {path.name}")
+        version = int(match.group(1))
+        if version in seen_versions:
+            raise ValueError(f"Номер версии {version} повторяется: {seen_versions[version]} и {path.name}")
+        seen_versions[version] = path.name
+
+        sql = path.read_text(encoding="utf-8")
+        migrations.append(Migration(
+            version=version,
+            name=match.group(2),
+            path=path,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transactional=NO_TRANSACTION_MARKER not in sql
+        ))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def split_sql_statements(sql: str) -> List[str]:
+    """
+    Делит текст SQL на отдельные команды по ';' с учетом строк, идентификаторов
+    в кавычках, строк в долларовых кавычках ($$ ... $$) и комментариев.
+    """
+    statements = []
+    current = []
+    i, length = 0, len(sql)
+
+    while i < length:
+        char = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = length if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = length if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+        elif char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    # Удвоенная кавычка внутри строки - экранирование
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == "$":
+            tag_match = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if tag_match:
+                tag = tag_match.group(0)
+                end = sql.find(tag, i + len(tag))
+                end = length if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+            else:
+                current.append(char)
+                i += 1
+        elif char == ";":
+            statements.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append("".join(current))
+
+    return [statement.strip() for statement in statements if _has_code(statement)]
+
+
+def _has_code(statement: str) -> bool:
+    without_comments = re.sub(r"--[^\n]*|/\*.*?\*/", "", statement, flags=re.S)
+    return bool(without_comments.strip())
+
+
+async def ensure_migrations_table(conn):
+    await conn.execute(CREATE_MIGRATIONS_TABLE)
+
+
+async def fetch_applied_migrations(conn) -> Dict[int, dict]:
+    rows = await conn.fetch("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row["version"]: dict(row) for row in rows}
+
+
+def find_changed_migrations(migrations: List[Migration], applied: Dict[int, dict]) -> List[Migration]:
+    """
+    Примененные миграции, файлы которых изменились после применения.
+    """
+    return [
+        migration for migration in migrations
+        if migration.version in applied and applied[migration.version]["checksum"] != migration.checksum
+    ]
+
+
+async def _record_migration(conn, migration: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+        migration.version, migration.name, migration.checksum
+    )
+
+
+async def apply_migration(conn, migration: Migration):
+    """
+    Применяет одну миграцию и отмечает ее в schema_migrations.
+    """
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await _record_migration(conn, migration)
+        return
+
+    for statement in split_sql_statements(migration.sql):
+        await conn.execute(statement)
+    await _record_migration(conn, migration)
+
+
+async def migrate(conn, migrations: List[Migration], target: Optional[int] = None, on_applied=None) -> List[Migration]:
+    """
+    Применяет по порядку все еще не примененные миграции (до версии target включительно).
+    Возвращает примененные миграции.
+    """
+    await ensure_migrations_table(conn)
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_KEY)
+    try:
+        applied = await fetch_applied_migrations(conn)
+        done = []
+        for migration in migrations:
+            if migration.version in applied or (target is not None and migration.version > target):
+                continue
+            await apply_migration(conn, migration)
+            done.append(migration)
+            if on_applied is not None:
+                on_applied(migration)
+        return done
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_KEY)
+
+
+async def baseline(conn, migrations: List[Migration], target: Optional[int] = None) -> List[Migration]:
+    """
+    Отмечает миграции примененными, не выполняя их: для базы, созданной из schema.sql
+    или обновленной вручную до появления schema_migrations.
+    """
+    await ensure_migrations_table(conn)
+    applied = await fetch_applied_migrations(conn)
+    marked = []
+    async with conn.transaction():
+        for migration in migrations:
+            if migration.version in applied or (target is not None and migration.version > target):
+                continue
+            await _record_migration(conn, migration)
+            marked.append(migration)
+    return marked
+
+
+async def find_invalid_indexes(conn) -> List[str]:
+    """
+    Индексы, оставшиеся недействительными после прерванного CREATE INDEX CONCURRENTLY.
+    Такой индекс нужно удалить (DROP INDEX CONCURRENTLY) и применить миграцию повторно.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT c.relname AS name
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+        ORDER BY c.relname
+        """
+    )
+    return [row["name"] for row in rows]
@@ -0,0 +1,174 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from src.db.connection import get_db_connection
+
+# Постраничная выборка списков по курсору (keyset/seek): следующая страница
+# начинается сразу после последней строки предыдущей по тому же порядку сортировки,
+# поэтому глубокие страницы выбираются так же быстро, как первая (без OFFSET).
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetSort(NamedTuple):
+    """
+    Порядок сортировки списка: столбец из белого списка и уникальный ID,
+    который делает порядок однозначным.
+    """
+    key: str                # имя поля в строке результата (и параметр sort_by)
+    sql: str                # выражение сортировки в запросе
+    id_key: str
+    id_sql: str
+    descending: bool
+    nullable: bool = False
+
+
+class Page(NamedTuple):
+    rows: List[Any]
+    next_cursor: Optional[str]
+
+
+def resolve_sort(
+    allowed_sort_columns: Dict[str, str],
+    sort_by: Optional[str],
+    order: Optional[str],
+    default_sort: str,
+    default_order: str,
+    id_key: str,
+    id_sql: str,
+    nullable_columns: Iterable[str] = ()
+) -> KeysetSort:
+    """
+    Выбирает сортировку по белому списку столбцов; неизвестный столбец заменяется сортировкой по умолчанию.
+    """
+    if sort_by not in allowed_sort_columns:
+        sort_by, order = default_sort, default_order
+    return KeysetSort(
+        key=sort_by,
+        sql=allowed_sort_columns[sort_by],
+        id_key=id_key,
+        id_sql=id_sql,
+        descending=order == 'desc',
+        nullable=sort_by in nullable_columns
+    )
+
+
+def normalize_page_size(page_size: Optional[int]) -> int:
+    if not page_size or page_size < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+        raise ValueError("Неизвестный тип значения в курсоре")
+    return value
+
+
+def encode_cursor(sort: KeysetSort, row) -> str:
+    payload = [sort.key, _encode_value(row[sort.key]), _encode_value(row[sort.id_key])]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(sort: KeysetSort, cursor: Optional[str]):
+    """
+    Возвращает (значение сортировки, ID) из курсора или None, если курсор пустой,
+    поврежден или выдан для другой сортировки.
+    """
+    if not cursor:
+        return None
+    try:
+        key, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if key != sort.key:
+            return None
+        return _decode_value(value), _decode_value(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def order_by_clause(sort: KeysetSort) -> str:
+    direction = "DESC" if sort.descending else "ASC"
+    if sort.nullable:
+        # Пустые значения всегда в конце по возрастанию и в начале по убыванию
+        return f"ORDER BY ({sort.sql} IS NULL) {direction}, {sort.sql} {direction}, {sort.id_sql} {direction}"
+    return f"ORDER BY {sort.sql} {direction}, {sort.id_sql} {direction}"
+
+
+def seek_clause(sort: KeysetSort, params: list, position) -> str:
+    """
+    Условие «строго после позиции курсора» в порядке сортировки. Добавляет значения в params.
+    """
+    value, row_id = position
+    op = "<" if sort.descending else ">"
+
+    if not sort.nullable:
+        params.extend([value, row_id])
+        return f"({sort.sql}, {sort.id_sql}) {op} (${len(params) - 1}, ${len(params)})"
+
+    params.append(row_id)
+    id_param = f"${len(params)}"
+    if value is None:
+        if sort.descending:
+            return f"(({sort.sql} IS NULL AND {sort.id_sql} < {id_param}) OR {sort.sql} IS NOT NULL)"
+        return f"({sort.sql} IS NULL AND {sort.id_sql} > {id_param})"
+
+    params.append(value)
+    value_param = f"${len(params)}"
+    after_value = f"({sort.sql} {op} {value_param} OR ({sort.sql} = {value_param} AND {sort.id_sql} {op} {id_param}))"
+    if sort.descending:
+        return f"({sort.sql} IS NOT NULL AND {after_value})"
+    return f"({sort.sql} IS NULL OR {after_value})"
+
+
+async def fetch_keyset_page(
+    select_query: str,
+    where_clauses: List[str],
+    params: list,
+    sort: KeysetSort,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
+    """
+    Выполняет запрос списка и возвращает одну страницу и курсор следующей
+    (None, если это последняя страница). select_query - запрос без WHERE и ORDER BY.
+    """
+    page_size = normalize_page_size(page_size)
+    where_clauses = list(where_clauses)
+    params = list(params)
+
+    position = decode_cursor(sort, cursor)
+    if position is not None:
+        where_clauses.append(seek_clause(sort, params, position))
+
+    query_parts = [select_query]
+    if where_clauses:
+        query_parts.append("WHERE " + " AND ".join(where_clauses))
+    query_parts.append(order_by_clause(sort))
+    params.append(page_size + 1)
+    query_parts.append(f"LIMIT ${len(params)}")
+
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(" ".join(query_parts), *params)
+
+    next_cursor = encode_cursor(sort, rows[page_size - 1]) if len(rows) > page_size else None
+    return Page(rows[:page_size], next_cursor)
@@ -0,0 +1,145 @@
+import gzip
+from datetime import date
+from pathlib import Path
+from typing import List, Tuple
+
+# Помесячное секционирование таблиц по столбцу времени.
+# Секция таблицы <table> за май 2025 года называется <table>_2025_05,
+# строки вне существующих секций попадают в секцию <table>_default.
+
+# Секционированные таблицы и столбцы, по которым они секционированы
+PARTITIONED_TABLES = {
+    "system_logs": "timestamp",
+    "payments": "payment_date",
+}
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+async def list_partitions(conn, table: str) -> List[Tuple[str, str]]:
+    """
+    Возвращает секции таблицы: пары (имя, границы секции).
+    """
+    rows = await conn.fetch(
+        """
+        SELECT child.relname AS name, pg_get_expr(child.relpartbound, child.oid) AS bounds
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = $1
+        ORDER BY child.relname
+        """,
+        table
+    )
+    return [(row["name"], row["bounds"]) for row in rows]
+
+
+async def ensure_month_partition(conn, table: str, column: str, month: date) -> bool:
+    """
+    Создает секцию таблицы за месяц, если ее еще нет. Строки этого месяца,
+    успевшие попасть в секцию по умолчанию, переносятся в новую секцию.
+    Возвращает True, если секция была создана.
+    """
+    name = partition_name(table, month)
+    exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+    if exists:
+        return False
+
+    start, end = month_start(month), add_months(month, 1)
+    async with conn.transaction():
+        # Секции могут одновременно создавать несколько процессов приложения
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", table)
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name):
+            return False
+        await conn.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        # Перенос строк между секциями не меняет данные: триггеры таблицы (например, итоги платежей) его пропускают
+        await conn.execute("SET LOCAL app.partition_move = 'on'")
+        await conn.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE {column} >= '{start.isoformat()}' AND {column} < '{end.isoformat()}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        )
+        await conn.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return True
+
+
+async def ensure_month_partitions(conn, table: str, column: str, first_month: date, last_month: date) -> List[str]:
+    """
+    Создает недостающие секции за все месяцы от first_month до last_month включительно.
+    Возвращает имена созданных секций.
+    """
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if await ensure_month_partition(conn, table, column, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+async def ensure_upcoming_partitions(conn, months_ahead: int) -> List[str]:
+    """
+    Создает секции всех секционированных таблиц на текущий и months_ahead следующих месяцев.
+    Возвращает имена созданных секций.
+    """
+    current_month = month_start(date.today())
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        created += await ensure_month_partitions(
+            conn, table, column, current_month, add_months(current_month, months_ahead)
+        )
+    return created
+
+
+async def archive_partition(conn, table: str, name: str, archive_dir: Path) -> Path:
+    """
+    Выгружает секцию в сжатый CSV-файл, затем отсоединяет и удаляет ее.
+    Все выполняется в одной транзакции: при ошибке выгрузки или записи файла
+    секция остается на месте, а недописанный архив удаляется.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = archive_dir / f"{name}.csv.gz"
+    tmp_path = archive_path.with_suffix(".tmp")
+    archive_written = False
+
+    try:
+        async with conn.transaction():
+            # Запись в секцию блокируется до конца транзакции, чтение - нет
+            await conn.execute(f"LOCK TABLE {name} IN SHARE MODE")
+
+            with gzip.open(tmp_path, "wb") as archive_file:
+                async def write_chunk(chunk: bytes):
+                    archive_file.write(chunk)
+
+                await conn.copy_from_table(name, output=write_chunk, format="csv", header=True)
+
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            await conn.execute(f"DROP TABLE {name}")
+            tmp_path.replace(archive_path)
+            archive_written = True
+    except BaseException:
+        # Транзакция откатилась, секция осталась в таблице: архив не нужен
+        tmp_path.unlink(missing_ok=True)
+        if archive_written:
+            archive_path.unlink(missing_ok=True)
+        raise
+    return archive_path
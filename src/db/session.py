@@ -0,0 +1,52 @@
+import asyncio
+
+from src.config import settings
+from src.db.connection import request_scope
+from src.db.instrumentation import get_query_stats, start_query_stats, stop_query_stats
+
+
+class DatabaseSessionMiddleware:
+    """
+    ASGI-middleware, открывающее единицу работы на каждый HTTP-запрос.
+    Соединение берется из пула лениво, поэтому запросы к статике его не занимают,
+    и освобождается только после отправки ответа (включая потоковые ответы).
+
+    При DB_QUERY_STATS=true считает соединения и запросы каждого HTTP-запроса,
+    добавляет сводку в заголовки ответа (X-DB-Queries и др.) и предупреждает
+    о запросах, повторяющихся не меньше DB_QUERY_REPEAT_THRESHOLD раз (N+1).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if not settings.DB_QUERY_STATS:
+            async with request_scope():
+                await self.app(scope, receive, send)
+            return
+
+        # Счетчики могли уже включить снаружи (например, capture_queries() в тестах)
+        stats, token = get_query_stats(), None
+        if stats is None:
+            stats, token = start_query_stats()
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                # Журнал запросов asyncpg вызывается через цикл событий: даем ему отработать
+                await asyncio.sleep(0)
+                message = {**message, "headers": [*message.get("headers", []), *stats.as_headers()]}
+            await send(message)
+
+        try:
+            async with request_scope():
+                await self.app(scope, receive, send_with_stats)
+        finally:
+            if token is not None:
+                stop_query_stats(token)
+
+        for sql, count in stats.repeated_queries(settings.DB_QUERY_REPEAT_THRESHOLD):
+            print(f"Возможный N+1 в {scope['method']} {scope['path']}: запрос выполнен {count} раз: {sql}")
@@ -1,24 +1,49 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from jose import JWTError, jwt
+from jose import JWTError
 
 from src.templating import templates
-from src.services import service_service
+from src.services import service_service, pdf_service, log_service
 
 from src.routers import (
     subscribers_router, auth_router, cabinet_router,
     service_router, equipment_router, contracts_router,
-    employees_router, reports_router, logs_router, tickets_router
+    employees_router, reports_router, logs_router, tickets_router,
+    system_router, export_router
 )
-from src.services.auth_service import get_employee_by_login
-from src.services.subscriber_service import fetch_subscriber_by_id
 from src.services import subscriber_service, employee_service
+from src.auth.dependencies import resolve_user
 from src.config import settings
+from src.db.connection import init_db_pool, close_db_pool, get_db_connection
+from src.db.partitions import ensure_upcoming_partitions
+from src.db.session import DatabaseSessionMiddleware
+from src.timing import ServerTimingMiddleware, TimedJSONResponse, measure
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Создает пул соединений с БД при старте приложения и закрывает его при остановке.
+    """
+    await init_db_pool()
+    try:
+        async with get_db_connection() as conn:
+            await ensure_upcoming_partitions(conn, settings.PARTITIONS_MONTHS_AHEAD)
+    except Exception as e:
+        # Без новых секций строки попадают в секцию по умолчанию - приложение продолжает работу
+        print(f"Не удалось создать секции на будущие месяцы: {e}")
+    log_service.start_audit_log_writer()
+    yield
+    await log_service.stop_audit_log_writer()
+    await close_db_pool()
+    pdf_service.shutdown_pdf_executor()
 
 
-app = FastAPI(title="АИС Интернет-провайдера")
+app = FastAPI(title="АИС Интернет-провайдера", lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 
 @app.exception_handler(RequestValidationError)
@@ -83,24 +108,24 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
     )
 
+# Пути, для которых пользователь не нужен: статика, загрузки и публичные страницы входа.
+# Для них JWT не разбирается и запросы к БД не выполняются.
+SKIP_PRINCIPAL_PREFIXES = ("/static/", "/uploads/", "/favicon.ico", "/auth/login", "/auth/register", "/auth/confirm/")
+
+
 @app.middleware("http")
 async def add_user_to_context(request: Request, call_next):
+    if request.url.path.startswith(SKIP_PRINCIPAL_PREFIXES):
+        request.state.user = None
+        request.state.user_login = "Anonymous"
+        return await call_next(request)
+
     token = request.cookies.get("access_token")
     user = None
     if token:
         try:
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            login_or_id: str = payload.get("sub")
-            role: str = payload.get("role")
-
-            if role == "subscriber":
-                user = await fetch_subscriber_by_id(int(login_or_id))
-                if user:
-                    user = dict(user)
-                    user['role'] = 'subscriber'
-            else:
-                user = await get_employee_by_login(login_or_id)
-
+            with measure("auth"):
+                user = await resolve_user(token)
         except (JWTError, ValueError, KeyError):
             pass
 
@@ -111,6 +136,12 @@ async def add_user_to_context(request: Request, call_next):
     return response
 
 
+# Добавляется после add_user_to_context, чтобы оказаться внешним слоем:
+# определение пользователя и обработчик запроса работают с одним соединением.
+app.add_middleware(DatabaseSessionMiddleware)
+# Самый внешний слой: замер этапов охватывает и получение соединения, и определение пользователя
+app.add_middleware(ServerTimingMiddleware)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -124,6 +155,8 @@ app.include_router(employees_router.router)
 app.include_router(reports_router.router)
 app.include_router(logs_router.router)
 app.include_router(tickets_router.router)
+app.include_router(system_router.router)
+app.include_router(export_router.router)
 
 
 @app.get("/")
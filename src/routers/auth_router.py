@@ -17,21 +17,16 @@ async def login_page(request: Request):
 @router.post("/login")
 async def login_form(request: Request, username: str = Form(...), password: str = Form(...)):
     employee = await auth_service.get_employee_by_login(username)
-    if employee and auth_service.verify_password(password, employee['password_hash']):
-        access_token = auth_service.create_access_token(data={"sub": employee['login'], "role": employee['role']})
+    if employee and await auth_service.verify_password(password, employee['password_hash']):
         response = RedirectResponse(url="/subscribers", status_code=303)
-        response.set_cookie(key="access_token", value=access_token, httponly=True)
-        return response
+        return auth_service.set_session_cookie(response, dict(employee))
 
     result = await subscriber_auth_service.verify_subscriber_credentials(username, password)
 
     if result and not result.get("error"):
         subscriber = result
-        access_token = auth_service.create_access_token(
-            data={"sub": str(subscriber['subscriber_id']), "role": "subscriber"})
         response = RedirectResponse(url="/subscriber/cabinet", status_code=303)
-        response.set_cookie(key="access_token", value=access_token, httponly=True)
-        return response
+        return auth_service.set_session_cookie(response, subscriber)
 
 
     error_message = result.get("error") if result else "Неверный логин или пароль"
@@ -41,7 +36,8 @@ async def login_form(request: Request, username: str = Form(...), password: str
     )
 
 @router.post("/logout")
-async def logout():
+async def logout(request: Request):
+    await auth_service.revoke_current_session(request.state.user)
     response = RedirectResponse(url="/", status_code=303)
     response.delete_cookie("access_token")
     return response
@@ -77,17 +73,15 @@ async def register_form(
 @router.get("/confirm/{token}", response_class=HTMLResponse)
 async def confirm_email(request: Request, token: str):
     """Обрабатывает переход по ссылке из письма."""
-    conn = await get_db_connection()
-    user = await conn.fetchrow("SELECT * FROM subscribers WHERE confirmation_token = $1", token)
+    async with get_db_connection() as conn:
+        user = await conn.fetchrow("SELECT * FROM subscribers WHERE confirmation_token = $1", token)
 
-    if not user:
-        await conn.close()
-        return templates.TemplateResponse("confirmation_feedback.html", {"request": request, "success": False,
-                                                                         "message": "Неверная или устаревшая ссылка подтверждения."})
+        if not user:
+            return templates.TemplateResponse("confirmation_feedback.html", {"request": request, "success": False,
+                                                                             "message": "Неверная или устаревшая ссылка подтверждения."})
 
-    await conn.execute("UPDATE subscribers SET is_confirmed = TRUE, confirmation_token = NULL WHERE subscriber_id = $1",
-                       user['subscriber_id'])
-    await conn.close()
+        await conn.execute("UPDATE subscribers SET is_confirmed = TRUE, confirmation_token = NULL WHERE subscriber_id = $1",
+                           user['subscriber_id'])
 
     return templates.TemplateResponse("confirmation_feedback.html", {"request": request, "success": True,
                                                                      "message": "Ваш email успешно подтвержден! Теперь вы можете войти."})
\ No newline at end of file
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Request, Depends, Form, File, UploadFile, HTTPException, status
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, Form, File, UploadFile, HTTPException, Query, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from pathlib import Path
 
-from src.services import subscriber_auth_service, subscriber_service, contract_service, ticket_service
+from src.services import subscriber_auth_service, subscriber_service, contract_service, ticket_service, auth_service
 from src.services.notification_service import notification_service
 from src.auth.dependencies import require_subscriber_login, get_current_subscriber
 from src.templating import templates
@@ -31,11 +34,20 @@ async def subscriber_cabinet_dashboard(request: Request, current_subscriber: dic
 
 
 @router.get("/payments", response_class=HTMLResponse)
-async def subscriber_payments_page(request: Request, current_subscriber: dict = Depends(add_common_subscriber_context)):
-    payments = await subscriber_auth_service.get_subscriber_payments(current_subscriber['subscriber_id'])
+async def subscriber_payments_page(
+        request: Request,
+        year: Optional[int] = Query(None),
+        current_subscriber: dict = Depends(add_common_subscriber_context)
+):
+    current_year = date.today().year
+    if year is None or year > current_year or year < 2000:
+        year = current_year
+    payments = await subscriber_auth_service.get_subscriber_payments(current_subscriber['subscriber_id'], year)
     return templates.TemplateResponse("subscriber_payments.html", {
         "request": request,
         "payments": payments,
+        "year": year,
+        "current_year": current_year,
         "active_page": "payments"
     })
 
@@ -58,9 +70,10 @@ async def subscriber_notifications_page(request: Request,
 
 @router.get("/edit", response_class=HTMLResponse)
 async def subscriber_edit_page(request: Request, current_subscriber: dict = Depends(add_common_subscriber_context)):
+    subscriber_info = await subscriber_service.fetch_subscriber_by_id(current_subscriber['subscriber_id'])
     return templates.TemplateResponse("subscriber_edit_form.html", {
         "request": request,
-        "subscriber": current_subscriber,
+        "subscriber": subscriber_info,
         "active_page": "edit"
     })
 
@@ -76,14 +89,17 @@ async def subscriber_edit_form(
     result = await subscriber_auth_service.update_subscriber_contact_info(
         current_subscriber['subscriber_id'], full_name, address, phone_number
     )
+    subscriber_info = await subscriber_service.fetch_subscriber_by_id(current_subscriber['subscriber_id'])
     if result.get("error"):
         return templates.TemplateResponse("subscriber_edit_form.html", {
             "request": request,
-            "subscriber": current_subscriber,
+            "subscriber": subscriber_info,
             "active_page": "edit",
             "error": result.get("error")
         })
-    return RedirectResponse(url="/subscriber/cabinet", status_code=303)
+    # ФИО хранится в токене (режим "stateless"), поэтому выпускаем его заново
+    response = RedirectResponse(url="/subscriber/cabinet", status_code=303)
+    return auth_service.set_session_cookie(response, dict(subscriber_info))
 
 
 @router.post("/top-up")
@@ -108,7 +124,8 @@ async def subscriber_top_up(
 
 
 @router.post("/logout")
-async def subscriber_logout():
+async def subscriber_logout(request: Request):
+    await auth_service.revoke_current_session(request.state.user)
     response = RedirectResponse(url="/", status_code=303)
     response.delete_cookie("access_token")
     return response
@@ -211,4 +228,7 @@ async def subscriber_upload_avatar(
     # --- КОНЕЦ БЛОКА ВАЛИДАЦИИ ---
 
     await subscriber_auth_service.update_subscriber_avatar(current_subscriber['subscriber_id'], avatar)
-    return RedirectResponse(url="/subscriber/edit", status_code=303)
\ No newline at end of file
+    # Аватар хранится в токене (режим "stateless"), поэтому выпускаем его заново
+    subscriber_info = await subscriber_service.fetch_subscriber_by_id(current_subscriber['subscriber_id'])
+    response = RedirectResponse(url="/subscriber/edit", status_code=303)
+    return auth_service.set_session_cookie(response, dict(subscriber_info))
\ No newline at end of file
@@ -2,53 +2,117 @@ from datetime import date
 from typing import Optional
 
 from fastapi import APIRouter, Request, Depends, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
 from src.services import contract_service, pdf_service
+from src.db.connection import release_request_connection
 from src.auth.dependencies import require_tech, require_manager
-from src.templating import templates
+from src.templating import templates, next_page_url
+from src.db.pagination import DEFAULT_PAGE_SIZE
 
 router = APIRouter(prefix="/contracts", tags=["Contracts"], dependencies=[Depends(require_tech)])
 
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    # Пустое поле формы фильтра приходит как пустая строка
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @router.get("", response_class=HTMLResponse)
 async def list_contracts_page(
     request: Request,
     sort_by: Optional[str] = Query(None),
     order: Optional[str] = Query('asc'),
     status: Optional[str] = Query(None),
-    service_id: Optional[str] = Query(None)
+    service_id: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    page_size: int = Query(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Query(None)
 ):
     service_id_int: Optional[int] = None
     if service_id and service_id.isdigit():
         service_id_int = int(service_id)
+    date_from_value = _parse_date(date_from)
+    date_to_value = _parse_date(date_to)
 
-    contracts = await contract_service.fetch_all_contracts(
+    page = await contract_service.fetch_all_contracts(
         sort_by=sort_by,
         order=order,
         status_filter=status,
-        service_id_filter=service_id_int
+        service_id_filter=service_id_int,
+        date_from=date_from_value,
+        date_to=date_to_value,
+        page_size=page_size,
+        cursor=cursor
     )
+    next_url = next_page_url(request, page.next_cursor)
+    if cursor and request.headers.get("HX-Request"):
+        # Подгрузка следующей страницы при прокрутке: только строки таблицы
+        return templates.TemplateResponse("partials/contract_rows.html", {
+            "request": request, "contracts": page.rows, "next_url": next_url
+        })
+
     services_for_filter = await contract_service.fetch_all_services_for_selection()
 
     return templates.TemplateResponse("contracts.html", {
         "request": request,
-        "contracts": contracts,
+        "contracts": page.rows,
+        "next_url": next_url,
         "services": services_for_filter,
         "active_page": "contracts",
         "sort_by": sort_by,
         "order": order,
         "current_status": status,
-        "current_service_id": service_id_int
+        "current_service_id": service_id_int,
+        "current_date_from": date_from_value,
+        "current_date_to": date_to_value
     })
 
+@router.get("/pdf-archive", dependencies=[Depends(require_manager)])
+async def download_contracts_pdf_archive(
+    status: Optional[str] = Query(None),
+    service_id: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None)
+):
+    """
+    Отдает ZIP-архив с PDF всех договоров, подходящих под фильтры списка.
+    Архив формируется и передается по частям по мере рендеринга договоров.
+    """
+    service_id_int: Optional[int] = None
+    if service_id and service_id.isdigit():
+        service_id_int = int(service_id)
+
+    contracts = await contract_service.fetch_contract_details_for_export(
+        status_filter=status,
+        service_id_filter=service_id_int,
+        date_from=_parse_date(date_from),
+        date_to=_parse_date(date_to)
+    )
+    if not contracts:
+        return HTMLResponse(content="Договоры не найдены", status_code=404)
+
+    # Данные уже получены - соединение не должно простаивать, пока идет отдача архива
+    await release_request_connection()
+
+    filename = f"contracts_{date.today().isoformat()}.zip"
+    return StreamingResponse(
+        pdf_service.stream_contracts_zip(contracts),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 @router.get("/new", response_class=HTMLResponse, dependencies=[Depends(require_manager)])
 async def new_contract_form(request: Request):
-    subscribers = await contract_service.fetch_all_subscribers_for_selection()
     services = await contract_service.fetch_all_services_for_selection()
     return templates.TemplateResponse("contract_form.html", {
         "request": request,
-        "subscribers": subscribers,
         "services": services,
         "active_page": "contracts"
     })
@@ -78,21 +142,29 @@ async def update_contract_status_action(
 
 
 @router.get("/{contract_id}/pdf")
-async def download_contract_pdf(contract_id: int):
+async def download_contract_pdf(request: Request, contract_id: int):
     """
     Генерирует и отдает для скачивания PDF-версию договора.
+    Готовые PDF кэшируются на диске по хешу данных договора.
     """
     contract_data = await contract_service.fetch_contract_details_for_pdf(contract_id)
 
     if not contract_data:
         return HTMLResponse(content="Договор не найден", status_code=404)
 
-    pdf_bytes = pdf_service.generate_contract_pdf(contract_data)
+    # Ключ не требует рендеринга: если у клиента актуальная версия, PDF не нужен вовсе
+    pdf_key = pdf_service.contract_pdf_key(contract_data)
+    etag = f'"{pdf_key}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
 
-    filename = f"contract_{contract_id}_{contract_data['start_date']}.pdf"
+    pdf_path, _ = await pdf_service.get_contract_pdf(contract_data, pdf_key)
 
-    return StreamingResponse(
-        iter([pdf_bytes]),
+    filename = pdf_service.contract_pdf_filename(contract_data)
+
+    return FileResponse(
+        pdf_path,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        filename=filename,
+        headers={"ETag": etag}
     )
\ No newline at end of file
@@ -5,7 +5,8 @@ from fastapi.templating import Jinja2Templates
 
 from src.services import employee_service
 from src.auth.dependencies import require_admin
-from src.templating import templates
+from src.templating import templates, next_page_url
+from src.db.pagination import DEFAULT_PAGE_SIZE
 
 router = APIRouter(prefix="/employees", tags=["Employees"], dependencies=[Depends(require_admin)])
 
@@ -13,12 +14,23 @@ router = APIRouter(prefix="/employees", tags=["Employees"], dependencies=[Depend
 async def list_employees_page(
     request: Request,
     sort_by: Optional[str] = Query(None),
-    order: Optional[str] = Query('asc')
+    order: Optional[str] = Query('asc'),
+    page_size: int = Query(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Query(None)
 ):
-    employees = await employee_service.fetch_all_employees(sort_by=sort_by, order=order)
+    page = await employee_service.fetch_all_employees(
+        sort_by=sort_by, order=order, page_size=page_size, cursor=cursor
+    )
+    next_url = next_page_url(request, page.next_cursor)
+    if cursor and request.headers.get("HX-Request"):
+        # Подгрузка следующей страницы при прокрутке: только строки таблицы
+        return templates.TemplateResponse("partials/employee_rows.html", {
+            "request": request, "employees": page.rows, "next_url": next_url
+        })
     return templates.TemplateResponse("employees.html", {
         "request": request,
-        "employees": employees,
+        "employees": page.rows,
+        "next_url": next_url,
         "active_page": "employees",
         "sort_by": sort_by,
         "order": order
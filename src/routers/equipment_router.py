@@ -5,7 +5,9 @@ from fastapi.templating import Jinja2Templates
 
 from src.services import equipment_service
 from src.auth.dependencies import require_tech
-from src.templating import templates
+from src.templating import templates, next_page_url
+from src.db.pagination import DEFAULT_PAGE_SIZE
+from src.timing import TimedJSONResponse
 
 router = APIRouter(prefix="/equipment", tags=["Equipment"], dependencies=[Depends(require_tech)])
 
@@ -15,16 +17,27 @@ async def list_equipment_page(
     sort_by: Optional[str] = Query(None),
     order: Optional[str] = Query('asc'),
     status: Optional[str] = Query(None),
-    type: Optional[str] = Query(None)
+    type: Optional[str] = Query(None),
+    page_size: int = Query(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Query(None)
 ):
-    equipment = await equipment_service.fetch_all_equipment(
-        sort_by=sort_by, order=order, status_filter=status, type_filter=type
+    page = await equipment_service.fetch_all_equipment(
+        sort_by=sort_by, order=order, status_filter=status, type_filter=type,
+        page_size=page_size, cursor=cursor
     )
+    next_url = next_page_url(request, page.next_cursor)
+    if cursor and request.headers.get("HX-Request"):
+        # Подгрузка следующей страницы при прокрутке: только строки таблицы
+        return templates.TemplateResponse("partials/equipment_rows.html", {
+            "request": request, "equipment": page.rows, "next_url": next_url
+        })
+
     unique_types = await equipment_service.fetch_unique_equipment_types()
 
     return templates.TemplateResponse("equipment.html", {
         "request": request,
-        "equipment": equipment,
+        "equipment": page.rows,
+        "next_url": next_url,
         "unique_types": unique_types,
         "active_page": "equipment",
         "sort_by": sort_by,
@@ -38,14 +51,40 @@ async def new_equipment_form(request: Request):
     """
     Отображает форму для добавления нового оборудования.
     """
-    contracts = await equipment_service.fetch_available_contracts_for_linking()
     return templates.TemplateResponse("equipment_form.html", {
         "request": request,
         "equipment": None,
-        "contracts": contracts,
+        "current_contract": None,
         "active_page": "equipment"
     })
 
+
+@router.get("/linkable-contracts")
+async def linkable_contracts_typeahead(
+    request: Request,
+    q: str = Query(""),
+    current_contract_id: Optional[int] = Query(None)
+):
+    """
+    Подсказка для привязки оборудования: договоры без оборудования (и текущий договор устройства).
+    Для HTMX возвращает варианты выпадающего списка, иначе - JSON.
+    """
+    contracts = await equipment_service.search_contracts_for_linking(q, current_contract_id)
+
+    if request.headers.get("HX-Request"):
+        return templates.TemplateResponse("partials/linkable_contract_options.html", {
+            "request": request, "contracts": contracts, "current_contract_id": current_contract_id
+        })
+    return TimedJSONResponse([
+        {
+            "contract_id": contract["contract_id"],
+            "status": contract["status"],
+            "full_name": contract["full_name"],
+            "phone_number": contract["phone_number"]
+        }
+        for contract in contracts
+    ])
+
 @router.post("/new")
 async def create_equipment_action(
     type: str = Form(..., max_length=50),
@@ -72,13 +111,13 @@ async def edit_equipment_form(request: Request, eq_id: int):
     if not equipment:
         return RedirectResponse(url="/equipment", status_code=404)
 
-    contracts = await equipment_service.fetch_available_contracts_for_linking(
-        current_contract_id=equipment['contract_id']
-    )
+    current_contract = None
+    if equipment['contract_id']:
+        current_contract = await equipment_service.fetch_contract_for_linking(equipment['contract_id'])
     return templates.TemplateResponse("equipment_form.html", {
         "request": request,
         "equipment": equipment,
-        "contracts": contracts,
+        "current_contract": current_contract,
         "active_page": "equipment"
     })
 
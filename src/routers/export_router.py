@@ -0,0 +1,34 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from src.services import export_service
+from src.auth.dependencies import require_admin
+
+router = APIRouter(prefix="/export", tags=["Export"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: str,
+    format: str = Query("ndjson"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None)
+):
+    """
+    Выгружает сущность (subscribers, contracts, equipment, tickets, payments, logs)
+    в формате ndjson, csv или json. Ответ формируется по мере чтения строк из БД.
+    """
+    if entity not in export_service.EXPORT_ENTITIES:
+        raise HTTPException(status_code=404, detail="Неизвестный тип данных для выгрузки.")
+    if format not in export_service.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Поддерживаются форматы ndjson, csv и json.")
+
+    filename = f"{entity}_{date.today()}.{format}"
+    return StreamingResponse(
+        export_service.build_export_stream(entity, format, start_date, end_date),
+        media_type=export_service.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
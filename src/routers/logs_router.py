@@ -1,7 +1,7 @@
+from datetime import date
 from typing import Optional
 from fastapi import APIRouter, Request, Depends, Query
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
 from src.services import log_service
 from src.auth.dependencies import require_admin
@@ -9,17 +9,46 @@ from src.templating import templates
 
 router = APIRouter(prefix="/logs", tags=["System Logs"], dependencies=[Depends(require_admin)])
 
+LOG_LEVELS = ["INFO", "WARNING", "ERROR"]
+LOGS_PAGE_SIZE = 100
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    # Пустое поле формы фильтра приходит как пустая строка
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @router.get("", response_class=HTMLResponse)
 async def system_logs_page(
     request: Request,
-    sort_by: Optional[str] = Query(None),
-    order: Optional[str] = Query('desc')
+    level: Optional[str] = Query(None),
+    user_login: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None)
 ):
-    logs = await log_service.fetch_logs(sort_by=sort_by, order=order)
+    filters = {
+        "level": level if level in LOG_LEVELS else None,
+        "user_login": user_login.strip() if user_login else None,
+        "date_from": _parse_date(date_from),
+        "date_to": _parse_date(date_to),
+    }
+    logs, next_cursor = await log_service.fetch_logs(limit=LOGS_PAGE_SIZE, cursor=cursor, **filters)
+
+    # Параметры фильтра для ссылки на следующую страницу
+    filter_params = {key: str(value) for key, value in filters.items() if value}
+
     return templates.TemplateResponse("logs.html", {
         "request": request,
         "logs": logs,
         "active_page": "logs",
-        "sort_by": sort_by,
-        "order": order
-    })
\ No newline at end of file
+        "levels": LOG_LEVELS,
+        "filters": filters,
+        "filter_params": filter_params,
+        "next_cursor": next_cursor,
+        "is_first_page": not cursor,
+        "page_size": LOGS_PAGE_SIZE
+    })
@@ -1,12 +1,8 @@
 from datetime import date, timedelta
 from fastapi import APIRouter, Request, Depends, Query
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
-import pandas as pd
-from io import BytesIO
-
-from src.services import report_service
+from src.services import report_service, xlsx_service
 from src.auth.dependencies import require_admin
 from src.templating import templates
 
@@ -19,50 +15,46 @@ async def reports_page(
         start_date: date = Query(date.today() - timedelta(days=30)),
         end_date: date = Query(date.today())
 ):
-    payment_summary = await report_service.get_payment_summary(start_date, end_date)
-
-    daily_dynamics = await report_service.get_daily_payment_dynamics(start_date, end_date)
-    payment_methods = await report_service.get_payment_methods_distribution(start_date, end_date)
+    report = await report_service.get_payments_report(start_date, end_date)
 
     return templates.TemplateResponse("reports.html", {
         "request": request,
         "start_date": start_date,
         "end_date": end_date,
-        "payment_summary": payment_summary,
-        "daily_dynamics": daily_dynamics,
-        "payment_methods": payment_methods,
+        "payment_summary": report["payment_summary"],
+        "daily_dynamics": report["daily_dynamics"],
+        "payment_methods": report["payment_methods"],
         "active_page": "reports"
     })
 
-@router.get("/export/json", response_class=JSONResponse)
+@router.get("/export/json", response_class=StreamingResponse)
 async def export_report_to_json(
     start_date: date = Query(...),
     end_date: date = Query(...)
 ):
     """
     Экспортирует ДЕТАЛЬНЫЙ отчет по всем платежам за период в JSON.
+    Платежи выгружаются потоком, без загрузки всего периода в память.
     """
-    payments_list = await report_service.get_all_payments_for_period(start_date, end_date)
-
-    report_data = {
-        "report_type": "Detailed Payments Report",
-        "period": {
-            "start_date": start_date,
-            "end_date": end_date
-        },
-        "payments": payments_list
-    }
-
     filename = f"detailed_payments_report_{start_date}_to_{end_date}.json"
     headers = {"Content-Disposition": f"attachment; filename={filename}"}
 
-    # ИСПРАВЛЕНИЕ: Используем jsonable_encoder для корректного преобразования
-    # всех типов данных (включая Decimal и datetime) перед отправкой.
-    json_compatible_content = jsonable_encoder(report_data)
+    return StreamingResponse(
+        report_service.stream_payments_report_json(start_date, end_date),
+        media_type="application/json",
+        headers=headers
+    )
+
+PAYMENTS_EXCEL_COLUMNS = [
+    ("payment_id", "ID Платежа"),
+    ("payment_date", "Дата платежа"),
+    ("subscriber_name", "ФИО Абонента"),
+    ("subscriber_id", "ID Абонента"),
+    ("amount", "Сумма"),
+    ("payment_method", "Способ оплаты"),
+]
 
-    return JSONResponse(content=json_compatible_content, headers=headers)
 
-# Добавьте этот новый эндпоинт в конец файла
 @router.get("/export/excel", response_class=StreamingResponse)
 async def export_report_to_excel(
     start_date: date = Query(...),
@@ -70,47 +62,16 @@ async def export_report_to_excel(
 ):
     """
     Экспортирует детальный отчет по платежам за период в формат Excel (.xlsx).
+    Файл формируется по мере чтения платежей из курсора и отдается частями.
     """
-    payments_list = await report_service.get_all_payments_for_period(start_date, end_date)
-
-    # ДОБАВЬТЕ ЭТУ СТРОКУ, чтобы преобразовать записи в словари
-    payments_as_dicts = [dict(p) for p in payments_list]
-
-    # ИЗМЕНИТЕ ЭТУ СТРОКУ, чтобы она использовала список словарей
-    df = pd.DataFrame(payments_as_dicts)
-
-    if not df.empty:
-        df['payment_date'] = pd.to_datetime(df['payment_date']).dt.tz_localize(None)
-
-        if not df.empty:
-            # 1. Сначала задаем правильный порядок колонок с исходными именами
-            ordered_columns = [
-                'payment_id',
-                'payment_date',
-                'subscriber_name',
-                'subscriber_id',
-                'amount',
-                'payment_method'
-            ]
-            df = df[ordered_columns]
-
-            df = df.rename(columns={
-                'payment_id': 'ID Платежа',
-                'payment_date': 'Дата платежа',
-                'subscriber_name': 'ФИО Абонента',
-                'subscriber_id': 'ID Абонента',
-                'amount': 'Сумма',
-                'payment_method': 'Способ оплаты'
-            })
-
-    # Создаем Excel-файл в памяти
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Payments Report')
-    output.seek(0)
+    rows = report_service.iter_payments_for_period(start_date, end_date)
 
     filename = f"payments_report_{start_date}_to_{end_date}.xlsx"
     media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     headers = {"Content-Disposition": f"attachment; filename={filename}"}
 
-    return StreamingResponse(output, media_type=media_type, headers=headers)
\ No newline at end of file
+    return StreamingResponse(
+        xlsx_service.stream_xlsx(PAYMENTS_EXCEL_COLUMNS, rows, sheet_name="Payments Report"),
+        media_type=media_type,
+        headers=headers
+    )
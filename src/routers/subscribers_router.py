@@ -1,13 +1,15 @@
-import json
-from datetime import date, datetime
+from datetime import date
 from typing import Optional
 
 from fastapi import APIRouter, Request, Form, Depends, UploadFile, File, HTTPException, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, Response
 
-from src.services import subscriber_service, contract_service
+from src.services import subscriber_service, contract_service, export_service, import_service
 from src.auth.dependencies import require_manager, require_admin, require_tech
-from src.templating import templates
+from src.templating import templates, next_page_url
+from src.db.pagination import DEFAULT_PAGE_SIZE
+from src.superseding import run_superseding, Superseded
+from src.timing import TimedJSONResponse
 
 router = APIRouter(prefix="/subscribers", tags=["Subscribers"], dependencies=[Depends(require_tech)])
 
@@ -18,14 +20,24 @@ async def list_subscribers_page(
         request: Request,
         sort_by: Optional[str] = Query(None),
         order: Optional[str] = Query('asc'),
-        balance_filter: Optional[str] = Query(None)
+        balance_filter: Optional[str] = Query(None),
+        page_size: int = Query(DEFAULT_PAGE_SIZE),
+        cursor: Optional[str] = Query(None)
 ):
-    subscribers = await subscriber_service.fetch_all_subscribers(
-        sort_by=sort_by, order=order, balance_filter=balance_filter
+    page = await subscriber_service.fetch_all_subscribers(
+        sort_by=sort_by, order=order, balance_filter=balance_filter,
+        page_size=page_size, cursor=cursor
     )
+    next_url = next_page_url(request, page.next_cursor)
+    if cursor and request.headers.get("HX-Request"):
+        # Подгрузка следующей страницы при прокрутке: только строки таблицы
+        return templates.TemplateResponse("partials/subscriber_rows.html", {
+            "request": request, "subscribers": page.rows, "next_url": next_url
+        })
     return templates.TemplateResponse("subscribers.html", {
         "request": request,
-        "subscribers": subscribers,
+        "subscribers": page.rows,
+        "next_url": next_url,
         "active_page": "subscribers",
         "message": request.query_params.get("message"),
         "sort_by": sort_by,
@@ -34,10 +46,62 @@ async def list_subscribers_page(
     })
 
 @router.post("/search", response_class=HTMLResponse)
-async def search_subscribers_htmx(request: Request, search_query: str = Form("")):
-    subscribers = await subscriber_service.search_subscribers(search_query)
+async def search_subscribers_htmx(
+        request: Request,
+        search_query: str = Form(""),
+        sort_by: Optional[str] = Form(None),
+        order: Optional[str] = Form('asc'),
+        balance_filter: Optional[str] = Form(None)
+):
+    if not search_query.strip():
+        # Поиск очищен - возвращаем первую страницу обычного списка с подгрузкой остальных
+        page = await subscriber_service.fetch_all_subscribers(
+            sort_by=sort_by, order=order, balance_filter=balance_filter
+        )
+        next_url = None
+        if page.next_cursor:
+            next_url = str(request.url_for("list_subscribers_page").include_query_params(
+                **{key: value for key, value in
+                   {"sort_by": sort_by, "order": order, "balance_filter": balance_filter}.items() if value},
+                cursor=page.next_cursor
+            ))
+        return templates.TemplateResponse("partials/subscriber_rows.html", {
+            "request": request, "subscribers": page.rows, "next_url": next_url
+        })
+
+    # Новый запрос того же пользователя прерывает его предыдущий, еще не завершившийся поиск
+    try:
+        subscribers = await run_superseding(
+            ("subscribers-search", request.state.user_login),
+            subscriber_service.search_subscribers(search_query)
+        )
+    except Superseded:
+        return Response(status_code=204)
     return templates.TemplateResponse("partials/subscriber_rows.html", {"request": request, "subscribers": subscribers})
 
+@router.get("/typeahead")
+async def subscribers_typeahead(request: Request, q: str = Query("")):
+    """
+    Подсказка для выбора абонента в формах: до TYPEAHEAD_LIMIT вариантов.
+    Для HTMX возвращает варианты выпадающего списка, иначе - JSON.
+    """
+    try:
+        subscribers = await run_superseding(
+            ("subscribers-typeahead", request.state.user_login),
+            subscriber_service.search_subscribers(q, limit=subscriber_service.TYPEAHEAD_LIMIT)
+        )
+    except Superseded:
+        return Response(status_code=204)
+
+    if request.headers.get("HX-Request"):
+        return templates.TemplateResponse("partials/subscriber_options.html", {
+            "request": request, "subscribers": subscribers, "query": q.strip()
+        })
+    return TimedJSONResponse([
+        {"subscriber_id": sub["subscriber_id"], "full_name": sub["full_name"], "phone_number": sub["phone_number"]}
+        for sub in subscribers
+    ])
+
 @router.get("/new", response_class=HTMLResponse, dependencies=[Depends(require_manager)])
 async def new_subscriber_form(request: Request):
     return templates.TemplateResponse("subscriber_form.html", {"request": request, "subscriber": None, "active_page": "subscribers"})
@@ -119,48 +183,51 @@ async def delete_subscriber_htmx(request: Request, sub_id: int):
     return HTMLResponse(content="", status_code=200)
 
 
-def json_converter(o):
-    if isinstance(o, (datetime, date)):
-        return o.isoformat()
-    return str(o)
-
 @router.get("/export/json", dependencies=[Depends(require_admin)])
 async def export_subscribers_to_json():
-    subscribers = await subscriber_service.fetch_all_subscribers()
-    subscribers_list = [dict(sub) for sub in subscribers]
-
-    json_data = json.dumps(subscribers_list, default=json_converter, indent=4, ensure_ascii=False)
-
-    return JSONResponse(
-        content=json.loads(json_data),
+    """
+    Выгружает всех абонентов JSON-массивом, который принимает импорт.
+    """
+    return StreamingResponse(
+        export_service.build_export_stream("subscribers", "json"),
+        media_type=export_service.EXPORT_FORMATS["json"],
         headers={"Content-Disposition": f"attachment; filename=subscribers_{date.today()}.json"}
     )
 
 
-@router.get("/import/json", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
-async def import_json_form(request: Request):
+@router.get("/import", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
+async def import_form(request: Request):
     """
-    Страница с формой для загрузки JSON файла.
+    Страница с формой для загрузки файла абонентов (JSON, NDJSON или CSV).
     """
     return templates.TemplateResponse("import_form.html", {
         "request": request,
         "active_page": "subscribers",
-        "import_url": "/subscribers/import/json"
+        "import_url": "/subscribers/import"
     })
 
-@router.post("/import/json", dependencies=[Depends(require_admin)])
-async def import_subscribers_from_json(request: Request, file: UploadFile = File(...)):
-    if not file.filename.endswith(".json"):
-        raise HTTPException(status_code=400, detail="Неверный формат файла. Требуется JSON.")
+@router.post("/import", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
+async def import_subscribers_from_file(request: Request, file: UploadFile = File(...)):
+    """
+    Импортирует абонентов из файла. Файл разбирается по частям, существующие
+    абоненты (по номеру телефона) обновляются. Возвращает отчет об импорте.
+    """
+    import_format = import_service.detect_import_format(file.filename or "")
+    if import_format is None:
+        raise HTTPException(status_code=400, detail="Неверный формат файла. Поддерживаются JSON, NDJSON и CSV.")
 
-    content = await file.read()
     try:
-        data = json.loads(content)
-        if not isinstance(data, list):
-            raise ValueError()
-    except (json.JSONDecodeError, ValueError):
-        raise HTTPException(status_code=400, detail="Не удалось прочитать JSON или формат данных некорректен (ожидается список абонентов).")
-
-    count = await subscriber_service.import_subscribers_from_list(data, user_login=request.state.user_login)
-    message = f"Успешно импортировано {count} абонентов."
-    return RedirectResponse(url=f"/subscribers?message={message}", status_code=303)
\ No newline at end of file
+        report = await subscriber_service.import_subscribers(
+            import_service.iter_import_batches(file, import_format),
+            user_login=request.state.user_login
+        )
+    except ValueError as e:
+        # Ошибка структуры файла или кодировки: импорт откатывается целиком
+        raise HTTPException(status_code=400, detail=f"Не удалось прочитать файл: {e}")
+
+    return templates.TemplateResponse("import_result.html", {
+        "request": request,
+        "active_page": "subscribers",
+        "filename": file.filename,
+        "report": report
+    })
\ No newline at end of file
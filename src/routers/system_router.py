@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+
+from src.db.connection import get_pool_stats
+from src.auth.principal_cache import get_principal_cache_stats
+from src.services.auth_service import get_password_hasher_stats
+from src.services.log_service import get_audit_log_stats
+from src.services.report_cache import get_report_cache_stats
+from src.auth.dependencies import require_admin
+from src.timing import TimedJSONResponse
+
+router = APIRouter(prefix="/system", tags=["System"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/stats", response_class=TimedJSONResponse)
+async def system_stats():
+    """
+    Возвращает служебную статистику приложения (состояние пула соединений и т.п.).
+    """
+    return {
+        "db_pool": get_pool_stats(),
+        "principal_cache": get_principal_cache_stats(),
+        "password_hashing": get_password_hasher_stats(),
+        "audit_log": get_audit_log_stats(),
+        "report_cache": get_report_cache_stats()
+    }
@@ -4,7 +4,8 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 
 from src.services import ticket_service, employee_service
 from src.auth.dependencies import require_tech
-from src.templating import templates
+from src.templating import templates, next_page_url
+from src.db.pagination import DEFAULT_PAGE_SIZE
 
 router = APIRouter(prefix="/tickets", tags=["Tickets"], dependencies=[Depends(require_tech)])
 
@@ -14,15 +15,26 @@ async def list_tickets_page(
     request: Request,
     status: Optional[str] = Query(None),
     sort_by: Optional[str] = Query('created_at'),
-    order: Optional[str] = Query('desc')
+    order: Optional[str] = Query('desc'),
+    page_size: int = Query(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Query(None)
 ):
     """
     Отображает страницу со списком всех заявок.
     """
-    tickets = await ticket_service.fetch_all_tickets(status_filter=status, sort_by=sort_by, order=order)
+    page = await ticket_service.fetch_all_tickets(
+        status_filter=status, sort_by=sort_by, order=order, page_size=page_size, cursor=cursor
+    )
+    next_url = next_page_url(request, page.next_cursor)
+    if cursor and request.headers.get("HX-Request"):
+        # Подгрузка следующей страницы при прокрутке: только строки таблицы
+        return templates.TemplateResponse("partials/ticket_rows.html", {
+            "request": request, "tickets": page.rows, "next_url": next_url
+        })
     return templates.TemplateResponse("tickets_employee.html", {
         "request": request,
-        "tickets": tickets,
+        "tickets": page.rows,
+        "next_url": next_url,
         "active_page": "tickets",
         "current_status": status,
         "sort_by": sort_by,
@@ -39,7 +51,7 @@ async def ticket_details_page(request: Request, ticket_id: int):
     if not ticket:
         return RedirectResponse(url="/tickets", status_code=404)
 
-    assignees = await employee_service.fetch_all_employees()
+    assignees = await employee_service.fetch_all_employees_for_selection()
     messages = await ticket_service.fetch_messages_for_ticket(ticket_id)
 
     return templates.TemplateResponse("ticket_detail_employee.html", {
@@ -1,17 +1,66 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
 from src.config import settings
+from src.auth import principal_cache
 from src.db.connection import get_db_connection
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# bcrypt занимает процессор на 100-300 мс и освобождает GIL, поэтому хеширование
+# выполняется в отдельных потоках, а не в цикле событий. Семафор ограничивает
+# число одновременных вычислений, остальные вызовы ждут своей очереди.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+_hash_stats = {
+    "queued": 0,
+    "running": 0,
+    "max_queued": 0,
+    "completed": 0,
+    "wait_total_ms": 0.0,
+}
+
+
+async def _run_in_hash_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    _hash_stats["queued"] += 1
+    _hash_stats["max_queued"] = max(_hash_stats["max_queued"], _hash_stats["queued"])
+    started = time.perf_counter()
+    try:
+        await _hash_slots.acquire()
+    finally:
+        _hash_stats["queued"] -= 1
+    _hash_stats["wait_total_ms"] += (time.perf_counter() - started) * 1000
+
+    _hash_stats["running"] += 1
+    try:
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_stats["running"] -= 1
+        _hash_stats["completed"] += 1
+        _hash_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run_in_hash_pool(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(pwd_context.verify, plain_password, hashed_password)
+
+
+def get_password_hasher_stats() -> dict:
+    stats = dict(_hash_stats)
+    completed = stats["completed"]
+    stats["workers"] = settings.PASSWORD_HASH_WORKERS
+    stats["wait_avg_ms"] = round(stats["wait_total_ms"] / completed, 3) if completed else 0.0
+    stats["wait_total_ms"] = round(stats["wait_total_ms"], 3)
+    return stats
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -21,7 +70,85 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 async def get_employee_by_login(login: str):
-    conn = await get_db_connection()
-    row = await conn.fetchrow("SELECT * FROM employees WHERE login = $1", login)
-    await conn.close()
-    return row
\ No newline at end of file
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow("SELECT * FROM employees WHERE login = $1", login)
+    return row
+
+# Поля, которые попадают в JWT в режиме SESSION_MODE="stateless".
+# Их достаточно шаблонам и зависимостям, поэтому запрос к БД на каждый запрос не нужен.
+EMPLOYEE_SESSION_FIELDS = ("employee_id", "name", "email", "login")
+SUBSCRIBER_SESSION_FIELDS = ("subscriber_id", "full_name", "email", "avatar_url")
+
+_TOKEN_VERSION_TABLES = {
+    "subscriber": ("subscribers", "subscriber_id"),
+    "employee": ("employees", "employee_id"),
+}
+
+
+def create_session_token(user: dict) -> str:
+    """
+    Выпускает JWT для сотрудника или абонента.
+    В режиме "stateless" в токен кладутся данные пользователя и версия токена.
+    """
+    if 'subscriber_id' in user:
+        data = {"sub": str(user['subscriber_id']), "role": "subscriber"}
+        fields = SUBSCRIBER_SESSION_FIELDS
+    else:
+        data = {"sub": user['login'], "role": user['role']}
+        fields = EMPLOYEE_SESSION_FIELDS
+
+    if settings.SESSION_MODE == "stateless":
+        data["usr"] = {field: user.get(field) for field in fields}
+        data["ver"] = user['token_version']
+    return create_access_token(data)
+
+
+def set_session_cookie(response, user: dict):
+    response.set_cookie(key="access_token", value=create_session_token(user), httponly=True)
+    return response
+
+
+async def get_token_version(role: str, principal_id: int):
+    """
+    Возвращает текущую версию токенов пользователя (None, если учетная запись удалена).
+    Значение кэшируется на TOKEN_VERSION_CACHE_TTL_SECONDS и сбрасывается при изменениях.
+    """
+    version = principal_cache.get_cached_token_version(role, principal_id)
+    if version is not None:
+        return version
+
+    table, id_column = _TOKEN_VERSION_TABLES["subscriber" if role == "subscriber" else "employee"]
+    async with get_db_connection() as conn:
+        version = await conn.fetchval(f"SELECT token_version FROM {table} WHERE {id_column} = $1", principal_id)
+
+    if version is not None:
+        principal_cache.store_token_version(role, principal_id, version)
+    return version
+
+
+async def revoke_sessions(role: str, principal_id: int):
+    """
+    Увеличивает версию токенов пользователя: все выданные ему ранее токены перестают действовать.
+    """
+    table, id_column = _TOKEN_VERSION_TABLES["subscriber" if role == "subscriber" else "employee"]
+    async with get_db_connection() as conn:
+        version = await conn.fetchval(
+            f"UPDATE {table} SET token_version = token_version + 1 WHERE {id_column} = $1 RETURNING token_version",
+            principal_id
+        )
+
+    if version is not None:
+        principal_cache.store_token_version(role, principal_id, version)
+
+
+async def revoke_current_session(user):
+    """
+    При выходе из системы в режиме "stateless" отзывает токены пользователя,
+    чтобы сохраненная копия cookie больше не действовала.
+    """
+    if settings.SESSION_MODE != "stateless" or not user:
+        return
+    if user.get('role') == 'subscriber':
+        await revoke_sessions("subscriber", user['subscriber_id'])
+    else:
+        await revoke_sessions("employee", user['employee_id'])
@@ -1,6 +1,8 @@
 from datetime import date
-from typing import Optional, Dict, Any
-from src.db.connection import get_db_connection
+from typing import Optional, Dict, Any, List
+from src.db.connection import get_db_connection, db_transaction
+from src.db.loaders import get_loader, forget
+from src.db.pagination import Page, resolve_sort, fetch_keyset_page
 from src.services.log_service import log_action
 
 
@@ -9,7 +11,6 @@ async def fetch_contracts_by_subscriber_id(subscriber_id: int):
     """
     Получает все договоры для конкретного абонента.
     """
-    conn = await get_db_connection()
     query = """
     SELECT c.contract_id, c.start_date, c.status, s.name as service_name, s.price
     FROM contracts c
@@ -17,31 +18,70 @@ async def fetch_contracts_by_subscriber_id(subscriber_id: int):
     WHERE c.subscriber_id = $1
     ORDER BY c.start_date DESC
     """
-    contracts = await conn.fetch(query, subscriber_id)
-    await conn.close()
+
+    async with get_db_connection() as conn:
+        contracts = await conn.fetch(query, subscriber_id)
     return contracts
 
 
+def _build_contract_filters(
+    params: list,
+    status_filter: Optional[str] = None,
+    service_id_filter: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> List[str]:
+    """
+    Строит условия по фильтрам списка договоров, добавляя значения в params.
+    """
+    where_clauses = []
+
+    if status_filter:
+        params.append(status_filter)
+        where_clauses.append(f"c.status = ${len(params)}")
+
+    if service_id_filter:
+        params.append(service_id_filter)
+        where_clauses.append(f"c.service_id = ${len(params)}")
+
+    if date_from:
+        params.append(date_from)
+        where_clauses.append(f"c.start_date >= ${len(params)}")
+
+    if date_to:
+        params.append(date_to)
+        where_clauses.append(f"c.start_date <= ${len(params)}")
+
+    return where_clauses
+
+
 async def fetch_all_contracts(
     sort_by: Optional[str] = None,
     order: Optional[str] = 'asc',
     status_filter: Optional[str] = None,
-    service_id_filter: Optional[int] = None
-):
+    service_id_filter: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
     """
-    Получает все договоры в системе с информацией об абонентах и услугах.
+    Получает страницу списка договоров с информацией об абонентах и услугах.
     """
-    conn = await get_db_connection()
-
     allowed_sort_columns = {
         "contract_id": "c.contract_id",
-        "subscriber_name": "subscriber_name",
-        "service_name": "service_name",
+        "subscriber_name": "sub.full_name",
+        "service_name": "s.name",
         "start_date": "c.start_date",
         "status": "c.status"
     }
+    sort = resolve_sort(
+        allowed_sort_columns, sort_by, order,
+        default_sort="start_date", default_order="desc",
+        id_key="contract_id", id_sql="c.contract_id"
+    )
 
-    query_parts = ["""
+    select_query = """
         SELECT
             c.contract_id, c.start_date, c.status,
             s.name as service_name,
@@ -49,53 +89,29 @@ async def fetch_all_contracts(
         FROM contracts c
         JOIN services s ON c.service_id = s.service_id
         JOIN subscribers sub ON c.subscriber_id = sub.subscriber_id
-        """]
+        """
     params = []
-    where_clauses = []
+    where_clauses = _build_contract_filters(params, status_filter, service_id_filter, date_from, date_to)
 
-    if status_filter:
-        params.append(status_filter)
-        where_clauses.append(f"c.status = ${len(params)}")
-
-    if service_id_filter:
-        params.append(service_id_filter)
-        where_clauses.append(f"c.service_id = ${len(params)}")
-
-    if where_clauses:
-        query_parts.append("WHERE " + " AND ".join(where_clauses))
-    # --- КОНЕЦ НОВОГО БЛОКА ---
-
-    order_by_clause = "ORDER BY c.start_date DESC"
-    if sort_by in allowed_sort_columns:
-        order_direction = "DESC" if order == 'desc' else "ASC"
-        order_by_clause = f"ORDER BY {allowed_sort_columns[sort_by]} {order_direction}"
-
-    query_parts.append(order_by_clause)
-
-    final_query = " ".join(query_parts)
-
-    contracts = await conn.fetch(final_query, *params)
-    await conn.close()
-    return contracts
+    return await fetch_keyset_page(select_query, where_clauses, params, sort, page_size, cursor)
 
 
 async def create_contract(subscriber_id: int, service_id: int, start_date: date, user_login: str):
     """
     Создает новый договор со статусом "Ожидает активации".
     """
-    conn = await get_db_connection()
-    new_contract_id = await conn.fetchval(
-        """
-        INSERT INTO contracts (subscriber_id, service_id, start_date, status)
-        VALUES ($1, $2, $3, 'Ожидает активации')
-        RETURNING contract_id
-        """,
-        subscriber_id, service_id, start_date
-    )
-    await conn.close()
-    await log_action(
-        "INFO", f"Создан новый договор ID: {new_contract_id} для абонента ID: {subscriber_id}.", user_login
-    )
+    async with db_transaction() as conn:
+        new_contract_id = await conn.fetchval(
+            """
+            INSERT INTO contracts (subscriber_id, service_id, start_date, status)
+            VALUES ($1, $2, $3, 'Ожидает активации')
+            RETURNING contract_id
+            """,
+            subscriber_id, service_id, start_date
+        )
+        await log_action(
+            "INFO", f"Создан новый договор ID: {new_contract_id} для абонента ID: {subscriber_id}.", user_login
+        )
 
 
 async def update_contract_status(contract_id: int, new_status: str, user_login: str):
@@ -110,43 +126,27 @@ async def update_contract_status(contract_id: int, new_status: str, user_login:
         )
         return
 
-    conn = await get_db_connection()
-    await conn.execute(
-        "UPDATE contracts SET status = $1 WHERE contract_id = $2",
-        new_status, contract_id
-    )
-    await conn.close()
-    await log_action(
-        "INFO", f"Статус договора ID: {contract_id} изменен на '{new_status}'.", user_login
-    )
-
-
-async def fetch_all_subscribers_for_selection():
-    """
-    Получает ID и ФИО всех абонентов для использования в выпадающих списках.
-    """
-    conn = await get_db_connection()
-    rows = await conn.fetch("SELECT subscriber_id, full_name FROM subscribers ORDER BY full_name")
-    await conn.close()
-    return rows
+    async with db_transaction() as conn:
+        await conn.execute(
+            "UPDATE contracts SET status = $1 WHERE contract_id = $2",
+            new_status, contract_id
+        )
+        await log_action(
+            "INFO", f"Статус договора ID: {contract_id} изменен на '{new_status}'.", user_login
+        )
+    forget("contracts", contract_id)
 
 
 async def fetch_all_services_for_selection():
     """
     Получает ID и название всех услуг для использования в выпадающих списках.
     """
-    conn = await get_db_connection()
-    rows = await conn.fetch("SELECT service_id, name, price FROM services WHERE status = 'Активна' ORDER BY name")
-    await conn.close()
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT service_id, name, price FROM services WHERE status = 'Активна' ORDER BY name")
     return rows
 
 
-async def fetch_contract_details_for_pdf(contract_id: int) -> Optional[Dict[str, Any]]:
-    """
-    Получает все необходимые данные для генерации PDF-договора.
-    """
-    conn = await get_db_connection()
-    query = """
+CONTRACT_DETAILS_QUERY = """
     SELECT
         c.contract_id, c.start_date, c.status,
         s.name as service_name, s.description as service_description, s.price,
@@ -154,12 +154,42 @@ async def fetch_contract_details_for_pdf(contract_id: int) -> Optional[Dict[str,
     FROM contracts c
     JOIN services s ON c.service_id = s.service_id
     JOIN subscribers sub ON c.subscriber_id = sub.subscriber_id
-    WHERE c.contract_id = $1
+"""
+
+
+async def _load_contract_details(ids: list) -> dict:
+    query = CONTRACT_DETAILS_QUERY + " WHERE c.contract_id = ANY($1::int[])"
+
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, ids)
+    return {row['contract_id']: row for row in rows}
+
+
+async def fetch_contract_details_for_pdf(contract_id: int) -> Optional[Dict[str, Any]]:
     """
-    contract_data = await conn.fetchrow(query, contract_id)
-    await conn.close()
+    Получает все необходимые данные для генерации PDF-договора.
+    """
+    contract_data = await get_loader("contracts", _load_contract_details).load(contract_id)
 
     if not contract_data:
         return None
 
-    return dict(contract_data)
\ No newline at end of file
+    return dict(contract_data)
+
+async def fetch_contract_details_for_export(
+    status_filter: Optional[str] = None,
+    service_id_filter: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Получает данные для PDF всех договоров, подходящих под фильтры списка, одним запросом.
+    """
+    params = []
+    where_clauses = _build_contract_filters(params, status_filter, service_id_filter, date_from, date_to)
+    where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    query = f"{CONTRACT_DETAILS_QUERY} {where_clause} ORDER BY c.contract_id"
+
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, *params)
+    return [dict(row) for row in rows]
@@ -1,71 +1,112 @@
 from typing import Optional
-from src.db.connection import get_db_connection
+from src.db.connection import get_db_connection, db_transaction
+from src.auth.principal_cache import invalidate_employee
+from src.db.loaders import get_loader, forget
+from src.db.pagination import Page, resolve_sort, fetch_keyset_page
 from src.services.auth_service import hash_password
 from src.services.log_service import log_action
 
 
-async def fetch_all_employees(sort_by: Optional[str] = None, order: Optional[str] = 'asc'):
-    conn = await get_db_connection()
-
-    allowed_sort_columns = ["employee_id", "name", "email", "login", "role"]
+async def fetch_all_employees(
+    sort_by: Optional[str] = None,
+    order: Optional[str] = 'asc',
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
+    """
+    Получает страницу списка сотрудников.
+    """
+    allowed_sort_columns = {
+        "employee_id": "employee_id",
+        "name": "name",
+        "email": "email",
+        "login": "login",
+        "role": "role"
+    }
+    sort = resolve_sort(
+        allowed_sort_columns, sort_by, order,
+        default_sort="name", default_order="asc",
+        id_key="employee_id", id_sql="employee_id"
+    )
+    return await fetch_keyset_page(
+        "SELECT employee_id, name, email, login, role FROM employees", [], [], sort, page_size, cursor
+    )
 
-    query = "SELECT employee_id, name, email, login, role FROM employees"
 
-    if sort_by in allowed_sort_columns:
-        order_direction = "DESC" if order == 'desc' else "ASC"
-        query += f" ORDER BY {sort_by} {order_direction}"
-    else:
-        query += " ORDER BY name"  # Сортировка по умолчанию
+async def fetch_all_employees_for_selection():
+    """
+    Получает всех сотрудников для выпадающих списков (например, выбор исполнителя заявки).
+    """
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT employee_id, name, email, login, role FROM employees ORDER BY name")
 
-    rows = await conn.fetch(query)
-    await conn.close()
+    # Список уже содержит всех сотрудников: последующие выборки по ID обойдутся без запросов
+    loader = get_loader("employees", _load_employees)
+    for row in rows:
+        loader.prime(row['employee_id'], row)
     return rows
 
 
+async def _load_employees(ids: list) -> dict:
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(
+            "SELECT employee_id, name, email, login, role FROM employees WHERE employee_id = ANY($1::int[])", ids
+        )
+    return {row['employee_id']: row for row in rows}
+
+
 async def fetch_employee_by_id(emp_id: int):
-    conn = await get_db_connection()
-    row = await conn.fetchrow("SELECT employee_id, name, email, login, role FROM employees WHERE employee_id = $1",
-                              emp_id)
-    await conn.close()
-    return row
+    return await get_loader("employees", _load_employees).load(emp_id)
 
 
 async def create_employee(name: str, email: str, login: str, password: str, role: str, user_login: str):
-    hashed_pass = hash_password(password)
-    conn = await get_db_connection()
-    await conn.execute(
-        "INSERT INTO employees (name, email, login, password_hash, role) VALUES ($1, $2, $3, $4, $5)",
-        name, email, login, hashed_pass, role
-    )
-    await conn.close()
-    await log_action("INFO", f"Создан новый сотрудник '{name}' (логин: '{login}') с ролью '{role}'.", user_login)
+    hashed_pass = await hash_password(password)
+    async with db_transaction() as conn:
+        await conn.execute(
+            "INSERT INTO employees (name, email, login, password_hash, role) VALUES ($1, $2, $3, $4, $5)",
+            name, email, login, hashed_pass, role
+        )
+        await log_action("INFO", f"Создан новый сотрудник '{name}' (логин: '{login}') с ролью '{role}'.", user_login)
 
 
 async def update_employee(emp_id: int, name: str, email: str, login: str, role: str, password: Optional[str],
                           user_login: str):
-    conn = await get_db_connection()
-    if password:
-        hashed_pass = hash_password(password)
-        await conn.execute(
-            "UPDATE employees SET name = $1, email = $2, login = $3, role = $4, password_hash = $5 WHERE employee_id = $6",
-            name, email, login, role, hashed_pass, emp_id
-        )
-        log_message = f"Обновлены данные и пароль сотрудника '{name}' (ID: {emp_id})."
-    else:
-        await conn.execute(
-            "UPDATE employees SET name = $1, email = $2, login = $3, role = $4 WHERE employee_id = $5",
-            name, email, login, role, emp_id
-        )
-        log_message = f"Обновлены данные сотрудника '{name}' (ID: {emp_id})."
+    hashed_pass = await hash_password(password) if password else None
+
+    async with db_transaction() as conn:
+        # Смена пароля, логина или роли отзывает ранее выданные токены (увеличивается token_version)
+        if hashed_pass:
+            await conn.execute(
+                """
+                UPDATE employees
+                SET name = $1, email = $2, login = $3, role = $4, password_hash = $5, token_version = token_version + 1
+                WHERE employee_id = $6
+                """,
+                name, email, login, role, hashed_pass, emp_id
+            )
+            log_message = f"Обновлены данные и пароль сотрудника '{name}' (ID: {emp_id})."
+        else:
+            await conn.execute(
+                """
+                UPDATE employees
+                SET name = $1, email = $2, login = $3, role = $4,
+                    token_version = token_version + CASE WHEN login <> $3 OR role <> $4 THEN 1 ELSE 0 END
+                WHERE employee_id = $5
+                """,
+                name, email, login, role, emp_id
+            )
+            log_message = f"Обновлены данные сотрудника '{name}' (ID: {emp_id})."
 
-    await conn.close()
-    await log_action("INFO", log_message, user_login)
+        await log_action("INFO", log_message, user_login)
+    forget("employees", emp_id)
+    invalidate_employee(emp_id)
 
 
 async def delete_employee(emp_id: int, user_login: str):
-    conn = await get_db_connection()
-    emp_info = await conn.fetchrow("SELECT login, name FROM employees WHERE employee_id = $1", emp_id)
-    await conn.execute("DELETE FROM employees WHERE employee_id = $1", emp_id)
-    await conn.close()
-    await log_action("WARNING", f"Удален сотрудник '{emp_info['name']}' (логин: '{emp_info['login']}', ID: {emp_id}).",
-                     user_login)
\ No newline at end of file
+    async with db_transaction() as conn:
+        emp_info = await conn.fetchrow("SELECT login, name FROM employees WHERE employee_id = $1", emp_id)
+        await conn.execute("DELETE FROM employees WHERE employee_id = $1", emp_id)
+        await log_action("WARNING", f"Удален сотрудник '{emp_info['name']}' (логин: '{emp_info['login']}', ID: {emp_id}).",
+                         user_login)
+    forget("employees", emp_id)
+    invalidate_employee(emp_id)
\ No newline at end of file
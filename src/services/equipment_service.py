@@ -1,36 +1,47 @@
+import re
 from typing import Optional
 from src.db.connection import get_db_connection
+from src.db.pagination import Page, resolve_sort, fetch_keyset_page
+from src.services.subscriber_service import (
+    TYPEAHEAD_LIMIT, TRIGRAM_MIN_LENGTH, PHONE_DIGITS_SQL, escape_like
+)
 
 
 async def fetch_all_equipment(
     sort_by: Optional[str] = None,
     order: Optional[str] = 'asc',
     status_filter: Optional[str] = None,
-    type_filter: Optional[str] = None
-):
+    type_filter: Optional[str] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
     """
-    Получает список всего оборудования в системе.
+    Получает страницу списка оборудования.
     Если оборудование привязано к договору, также возвращает имя абонента.
     """
-    conn = await get_db_connection()
-
     allowed_sort_columns = {
         "equipment_id": "e.equipment_id",
         "type": "e.type",
         "serial_number": "e.serial_number",
         "mac_address": "e.mac_address",
         "status": "e.status",
-        "subscriber_name": "subscriber_name"
+        "subscriber_name": "s.full_name"
     }
+    sort = resolve_sort(
+        allowed_sort_columns, sort_by, order,
+        default_sort="equipment_id", default_order="asc",
+        id_key="equipment_id", id_sql="e.equipment_id",
+        nullable_columns=["mac_address", "subscriber_name"]
+    )
 
-    query_parts = ["""
+    select_query = """
         SELECT
             e.equipment_id, e.type, e.serial_number, e.status, e.contract_id,  e.mac_address,
             s.subscriber_id, s.full_name as subscriber_name
         FROM equipment e
         LEFT JOIN contracts c ON e.contract_id = c.contract_id
         LEFT JOIN subscribers s ON c.subscriber_id = s.subscriber_id
-        """]
+        """
     params = []
     where_clauses = []
 
@@ -42,29 +53,15 @@ async def fetch_all_equipment(
         params.append(type_filter)
         where_clauses.append(f"e.type = ${len(params)}")
 
-    if where_clauses:
-        query_parts.append("WHERE " + " AND ".join(where_clauses))
-
-    order_by_clause = "ORDER BY e.equipment_id"
-    if sort_by in allowed_sort_columns:
-        order_direction = "DESC" if order == 'desc' else "ASC"
-        order_by_clause = f"ORDER BY {allowed_sort_columns[sort_by]} {order_direction}"
-
-    query_parts.append(f" {order_by_clause}")
-
-    final_query = " ".join(query_parts)
-    rows = await conn.fetch(final_query, *params)
-    await conn.close()
-    return rows
+    return await fetch_keyset_page(select_query, where_clauses, params, sort, page_size, cursor)
 
 
 async def fetch_equipment_by_id(equipment_id: int):
     """
     Получает одно устройство по его ID.
     """
-    conn = await get_db_connection()
-    row = await conn.fetchrow("SELECT * FROM equipment WHERE equipment_id = $1", equipment_id)
-    await conn.close()
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow("SELECT * FROM equipment WHERE equipment_id = $1", equipment_id)
     return row
 
 
@@ -72,70 +69,117 @@ async def create_equipment(type: str, serial_number: str, mac_address: str, stat
     """
     Добавляет новое оборудование в базу данных.
     """
-    conn = await get_db_connection()
-    await conn.execute(
-        """
-        INSERT INTO equipment (type, serial_number, mac_address, status, contract_id)
-        VALUES ($1, $2, $3, $4, $5)
-        """,
-        type, serial_number, mac_address, status, contract_id
-    )
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute(
+            """
+            INSERT INTO equipment (type, serial_number, mac_address, status, contract_id)
+            VALUES ($1, $2, $3, $4, $5)
+            """,
+            type, serial_number, mac_address, status, contract_id
+        )
 
 
 async def update_equipment(equipment_id: int, type: str, serial_number: str, mac_address: str, status: str, contract_id: Optional[int]):
     """
     Обновляет информацию об оборудовании.
     """
-    conn = await get_db_connection()
-    await conn.execute(
-        """
-        UPDATE equipment
-        SET type = $1, serial_number = $2, mac_address = $3, status = $4, contract_id = $5
-        WHERE equipment_id = $6
-        """,
-        type, serial_number, mac_address, status, contract_id, equipment_id
-    )
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute(
+            """
+            UPDATE equipment
+            SET type = $1, serial_number = $2, mac_address = $3, status = $4, contract_id = $5
+            WHERE equipment_id = $6
+            """,
+            type, serial_number, mac_address, status, contract_id, equipment_id
+        )
 
 
 async def delete_equipment(equipment_id: int):
     """
     Удаляет оборудование из системы.
     """
-    conn = await get_db_connection()
-    await conn.execute("DELETE FROM equipment WHERE equipment_id = $1", equipment_id)
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute("DELETE FROM equipment WHERE equipment_id = $1", equipment_id)
 
 
-async def fetch_available_contracts_for_linking(current_contract_id: Optional[int] = None):
-    """
-    Получает список договоров, к которым еще не привязано оборудование.
-    Позволяет включить в список текущий договор, если он редактируется.
+# Договор свободен, если к нему не привязано ни одно устройство (анти-соединение по индексу idx_equipment_contract_id)
+FREE_CONTRACT_SQL = "NOT EXISTS (SELECT 1 FROM equipment e WHERE e.contract_id = c.contract_id)"
+
+
+async def search_contracts_for_linking(
+    query: str,
+    current_contract_id: Optional[int] = None,
+    limit: int = TYPEAHEAD_LIMIT
+):
     """
-    conn = await get_db_connection()
-    # Запрос выбирает все договоры, ID которых нет в списке 'занятых' ID в таблице equipment.
-    # Если передан current_contract_id, он также будет включен в список,
-    # чтобы можно было оставить текущую привязку.
-    query = """
-    SELECT c.contract_id, c.status, s.full_name
-    FROM contracts c
-    JOIN subscribers s ON c.subscriber_id = s.subscriber_id
-    WHERE c.contract_id NOT IN (
-        SELECT contract_id FROM equipment WHERE contract_id IS NOT NULL
-    )
+    Подбирает договоры для привязки оборудования: только договоры без оборудования.
+    Запрос ищется по номеру договора, ФИО или телефону абонента; пустой запрос
+    возвращает последние договоры. Текущий договор редактируемого устройства
+    всегда идет первым, чтобы его выбор не сбрасывался.
     """
-    if current_contract_id:
-        query += " OR c.contract_id = $1"
-        rows = await conn.fetch(query, current_contract_id)
+    query = query.strip()
+    params = []
+
+    digits = re.sub(r"[^0-9]", "", query)
+    if not query:
+        match, rank = "TRUE", "c.contract_id DESC"
+    elif digits and re.fullmatch(r"[0-9+\s()-]+", query):
+        # Номер договора целиком или (от TRIGRAM_MIN_LENGTH цифр) часть номера телефона абонента
+        params.append(int(digits) if len(digits) <= 9 else None)
+        contract_param = f"${len(params)}"
+        match = f"c.contract_id = {contract_param}"
+        if len(digits) >= TRIGRAM_MIN_LENGTH:
+            params.append(f"%{digits}%")
+            match = f"({match} OR {PHONE_DIGITS_SQL} LIKE ${len(params)})"
+        rank = f"(c.contract_id = {contract_param}) DESC, c.contract_id DESC"
+    elif len(query) < TRIGRAM_MIN_LENGTH:
+        params.append(escape_like(query.lower()) + "%")
+        # Фильтр и сортировка совпадают с индексом idx_subscribers_full_name_sort (как в search_subscribers):
+        # абоненты читаются по индексу уже упорядоченными, договоры досортировываются внутри абонента
+        match = f"lower(s.full_name) COLLATE \"C\" LIKE ${len(params)}"
+        rank = 'lower(s.full_name) COLLATE "C", s.subscriber_id, c.contract_id DESC'
     else:
-        rows = await conn.fetch(query)
+        params.extend([query, f"%{escape_like(query)}%"])
+        match = f"(s.full_name ILIKE ${len(params)} OR s.full_name % ${len(params) - 1})"
+        rank = f"word_similarity(${len(params) - 1}, s.full_name) DESC, c.contract_id DESC"
 
-    await conn.close()
+    condition = f"{FREE_CONTRACT_SQL} AND {match}"
+    if current_contract_id:
+        params.append(current_contract_id)
+        condition = f"(c.contract_id = ${len(params)} OR ({condition}))"
+        rank = f"(c.contract_id = ${len(params)}) DESC, {rank}"
+
+    params.append(limit)
+    sql = f"""
+        SELECT c.contract_id, c.status, s.full_name, s.phone_number
+        FROM contracts c
+        JOIN subscribers s ON c.subscriber_id = s.subscriber_id
+        WHERE {condition}
+        ORDER BY {rank}
+        LIMIT ${len(params)}
+    """
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(sql, *params)
     return rows
 
+
+async def fetch_contract_for_linking(contract_id: int):
+    """
+    Получает договор, к которому привязано устройство, для отображения в форме.
+    """
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT c.contract_id, c.status, s.full_name, s.phone_number
+            FROM contracts c
+            JOIN subscribers s ON c.subscriber_id = s.subscriber_id
+            WHERE c.contract_id = $1
+            """,
+            contract_id
+        )
+    return row
+
 async def fetch_unique_equipment_types():
-    conn = await get_db_connection()
-    rows = await conn.fetch("SELECT DISTINCT type FROM equipment ORDER BY type")
-    await conn.close()
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT DISTINCT type FROM equipment ORDER BY type")
     return [row['type'] for row in rows]
\ No newline at end of file
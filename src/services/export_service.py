@@ -0,0 +1,197 @@
+import csv
+import io
+from datetime import date, datetime
+from typing import Optional, AsyncIterator, List
+
+from src.db.connection import db_transaction
+
+# Сколько строк курсор получает с сервера за одно обращение
+EXPORT_CURSOR_PREFETCH = 1000
+# Сколько строк накапливается перед отдачей очередной части ответа
+ROWS_PER_CHUNK = 500
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+}
+
+# Описание выгружаемых сущностей. Хеши паролей и токены подтверждения в выгрузку не попадают.
+# date_column - столбец, по которому применяется фильтр по периоду (если он поддерживается).
+EXPORT_ENTITIES = {
+    "subscribers": {
+        "select": """
+            subscriber_id, full_name, address, phone_number, balance,
+            email, is_confirmed, avatar_url
+        """,
+        "from": "subscribers",
+        "order_by": "subscriber_id",
+        "date_column": None,
+    },
+    "contracts": {
+        "select": """
+            c.contract_id, c.subscriber_id, sub.full_name as subscriber_name,
+            c.service_id, s.name as service_name, s.price, c.start_date, c.status
+        """,
+        "from": """
+            contracts c
+            JOIN services s ON c.service_id = s.service_id
+            JOIN subscribers sub ON c.subscriber_id = sub.subscriber_id
+        """,
+        "order_by": "c.contract_id",
+        "date_column": "c.start_date",
+    },
+    "equipment": {
+        "select": "e.equipment_id, e.contract_id, e.type, e.serial_number, e.mac_address, e.status",
+        "from": "equipment e",
+        "order_by": "e.equipment_id",
+        "date_column": None,
+    },
+    "tickets": {
+        "select": """
+            t.ticket_id, t.subscriber_id, sub.full_name as subscriber_name,
+            t.assigned_to_id, e.name as assigned_to_name,
+            t.title, t.description, t.status, t.created_at, t.updated_at
+        """,
+        "from": """
+            tickets t
+            JOIN subscribers sub ON t.subscriber_id = sub.subscriber_id
+            LEFT JOIN employees e ON t.assigned_to_id = e.employee_id
+        """,
+        "order_by": "t.ticket_id",
+        "date_column": "t.created_at",
+    },
+    "payments": {
+        "select": """
+            p.payment_id, p.amount, p.payment_date, p.payment_method,
+            s.subscriber_id, s.full_name as subscriber_name
+        """,
+        "from": "payments p LEFT JOIN subscribers s ON p.subscriber_id = s.subscriber_id",
+        "order_by": "p.payment_date DESC",
+        "date_column": "p.payment_date",
+    },
+    # Дневные итоги платежей по способам оплаты (см. payment_daily_rollups)
+    "payment_daily": {
+        "select": "day, payment_method, payments_count, total_amount",
+        "from": "payment_daily_rollups",
+        "order_by": "day, payment_method",
+        "date_column": "day",
+    },
+    "logs": {
+        "select": "log_id, timestamp, level, message, user_login",
+        "from": "system_logs",
+        "order_by": "log_id DESC",
+        "date_column": "timestamp",
+    },
+}
+
+
+def build_export_query(entity: str, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Возвращает текст запроса выгрузки сущности и его параметры.
+    """
+    spec = EXPORT_ENTITIES[entity]
+    params = []
+    where_clauses = []
+
+    if spec["date_column"]:
+        if start_date:
+            params.append(start_date)
+            where_clauses.append(f"{spec['date_column']} >= ${len(params)}")
+        if end_date:
+            params.append(end_date)
+            where_clauses.append(f"{spec['date_column']} < ${len(params)}::date + interval '1 day'")
+
+    where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    query = f"SELECT {spec['select']} FROM {spec['from']} {where_clause} ORDER BY {spec['order_by']}"
+    return query, params
+
+
+async def _iter_json_rows(query: str, params: list) -> AsyncIterator[str]:
+    # Строки кодируются в JSON на стороне PostgreSQL: приложение только склеивает готовый текст
+    json_query = f"SELECT row_to_json(t)::text FROM ({query}) t"
+    async with db_transaction() as conn:
+        async for row in conn.cursor(json_query, *params, prefetch=EXPORT_CURSOR_PREFETCH):
+            yield row[0]
+
+
+async def _stream_ndjson(query: str, params: list) -> AsyncIterator[bytes]:
+    pending: List[str] = []
+    async for row_json in _iter_json_rows(query, params):
+        pending.append(row_json)
+        if len(pending) >= ROWS_PER_CHUNK:
+            yield ("\n".join(pending) + "\n").encode("utf-8")
+            pending.clear()
+    if pending:
+        yield ("\n".join(pending) + "\n").encode("utf-8")
+
+
+async def stream_json_array(query: str, params: list) -> AsyncIterator[bytes]:
+    """
+    Отдает результат запроса как JSON-массив объектов по частям.
+    """
+    yield b"["
+    separator = "\n"
+    pending: List[str] = []
+    async for row_json in _iter_json_rows(query, params):
+        pending.append(separator + row_json)
+        separator = ",\n"
+        if len(pending) >= ROWS_PER_CHUNK:
+            yield "".join(pending).encode("utf-8")
+            pending.clear()
+    pending.append("\n]")
+    yield "".join(pending).encode("utf-8")
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def _stream_csv(query: str, params: list) -> AsyncIterator[bytes]:
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    async with db_transaction() as conn:
+        statement = await conn.prepare(query)
+        # BOM нужен, чтобы Excel правильно распознал кириллицу
+        output.write("\ufeff")
+        writer.writerow([attribute.name for attribute in statement.get_attributes()])
+
+        rows_in_chunk = 0
+        async for row in statement.cursor(*params, prefetch=EXPORT_CURSOR_PREFETCH):
+            writer.writerow([_csv_value(value) for value in row])
+            rows_in_chunk += 1
+            if rows_in_chunk >= ROWS_PER_CHUNK:
+                yield output.getvalue().encode("utf-8")
+                output.seek(0)
+                output.truncate()
+                rows_in_chunk = 0
+
+    yield output.getvalue().encode("utf-8")
+
+
+def build_export_stream(
+    entity: str,
+    export_format: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> AsyncIterator[bytes]:
+    """
+    Возвращает поток выгрузки сущности в формате ndjson, csv или json.
+    Строки читаются серверным курсором, поэтому память не зависит от объема таблицы.
+    Фильтр по периоду применяется только к сущностям со столбцом даты.
+    """
+    if entity not in EXPORT_ENTITIES:
+        raise ValueError(f"Неизвестная сущность для выгрузки: {entity}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат выгрузки: {export_format}")
+
+    query, params = build_export_query(entity, start_date, end_date)
+    if export_format == "ndjson":
+        return _stream_ndjson(query, params)
+    if export_format == "csv":
+        return _stream_csv(query, params)
+    return stream_json_array(query, params)
+
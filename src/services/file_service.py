@@ -1,6 +1,7 @@
 import aiofiles
 import secrets
 from pathlib import Path
+from typing import List
 from fastapi import UploadFile
 
 # Определяем базовую директорию для загрузок
@@ -33,4 +34,27 @@ async def save_avatar(file: UploadFile, subscriber_id: int) -> str:
         await out_file.write(content)
 
     # Возвращаем только имя файла для сохранения в БД
-    return file_name
\ No newline at end of file
+    return file_name
+
+
+class ZipChunkBuffer:
+    """
+    Поток только для записи: zipfile пишет в него, а генератор забирает накопленные байты.
+    Без методов seek/tell zipfile использует дескрипторы данных и не возвращается назад по архиву,
+    поэтому архив можно отдавать клиенту по частям.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
@@ -0,0 +1,142 @@
+import codecs
+import csv
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Размер блока, читаемого из загруженного файла за раз
+READ_CHUNK_SIZE = 64 * 1024
+# Максимальный размер одного элемента JSON-массива (защита от разбора всего файла целиком)
+MAX_JSON_ELEMENT_SIZE = 1024 * 1024
+# Сколько строк разбирается и проверяется за один проход
+IMPORT_BATCH_SIZE = 5000
+
+IMPORT_FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+# Элемент разбора: (номер строки или элемента, данные, причина отказа)
+ParsedRow = Tuple[int, Optional[Any], Optional[str]]
+
+
+def detect_import_format(filename: str) -> Optional[str]:
+    """
+    Определяет формат файла импорта по расширению.
+    """
+    for extension, import_format in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return import_format
+    return None
+
+
+def _iter_json_array(stream) -> Iterator[ParsedRow]:
+    """
+    Разбирает JSON-массив по одному элементу, не читая файл целиком.
+    Нарушение структуры массива считается ошибкой всего файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    started = False
+    expect_value = True
+    element_number = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if not eof and len(buffer) - pos < READ_CHUNK_SIZE:
+            # Держим в буфере запас, чтобы элемент не оказался обрезан на границе блока
+            chunk = stream.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if pos >= len(buffer):
+            raise ValueError("Файл оборвался: JSON-массив не закрыт.")
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Ожидается JSON-массив (список) абонентов.")
+            started, pos = True, pos + 1
+            continue
+        if char == "]":
+            return
+        if not expect_value:
+            if char != ",":
+                raise ValueError(f"Ожидается ',' после элемента {element_number}.")
+            expect_value, pos = True, pos + 1
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - pos > MAX_JSON_ELEMENT_SIZE:
+                raise ValueError(f"Некорректный JSON в элементе {element_number + 1}.")
+            chunk = stream.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        element_number += 1
+        expect_value, pos = False, end
+        yield element_number, value, None
+
+
+def _iter_ndjson(stream) -> Iterator[ParsedRow]:
+    """
+    Разбирает файл, в котором каждая строка - отдельный JSON-объект.
+    Некорректная строка отклоняется, остальные продолжают обрабатываться.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Некорректный JSON: {e.msg}"
+
+
+def _iter_csv(stream) -> Iterator[ParsedRow]:
+    """
+    Разбирает CSV с заголовком. Номер строки считается по файлу (с учетом заголовка).
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None, "Лишние значения в строке"
+            continue
+        yield reader.line_num, row, None
+
+
+PARSERS = {
+    "json": _iter_json_array,
+    "ndjson": _iter_ndjson,
+    "csv": _iter_csv,
+}
+
+
+async def iter_import_batches(
+    file: UploadFile,
+    import_format: str,
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> AsyncIterator[List[ParsedRow]]:
+    """
+    Читает загруженный файл пачками разобранных строк.
+    Разбор идет в пуле потоков, чтобы не блокировать цикл событий на больших файлах.
+    """
+    await file.seek(0)
+    stream = codecs.getreader("utf-8-sig")(file.file)
+    rows = PARSERS[import_format](stream)
+
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(rows, batch_size)))
+        if not batch:
+            break
+        yield batch
@@ -1,39 +1,246 @@
-from typing import Optional
-from src.db.connection import get_db_connection
+import asyncio
+from datetime import date, datetime, timezone
+from typing import Optional, Tuple
+
+from src.config import settings
+from src.db.connection import get_db_connection, call_after_commit
+
+LOG_COLUMNS = ["timestamp", "level", "message", "user_login"]
+# Попыток записи одной пачки, прежде чем она будет отброшена
+FLUSH_ATTEMPTS = 3
+# Сколько stop() ждет, пока фоновая задача допишет очередь, прежде чем отменить ее
+STOP_TIMEOUT_SECONDS = 60.0
+# Сигнал остановки в очереди: все записи перед ним будут записаны
+_STOP = object()
+
+
+class AuditLogWriter:
+    """
+    Фоновая запись журнала действий. log_action кладет записи в очередь,
+    фоновая задача записывает их пачками через COPY: когда набралось
+    AUDIT_LOG_BATCH_SIZE записей или прошло AUDIT_LOG_FLUSH_INTERVAL_SECONDS.
+    Если очередь заполнена, log_action ждет освобождения места.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Пачка, которая собирается или записывается в данный момент
+        self._batch: list = []
+        self.stats = {
+            "enqueued_total": 0,
+            "written_total": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "dropped_total": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=settings.AUDIT_LOG_BUFFER_SIZE)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Останавливает фоновую задачу, предварительно записав все накопленные записи.
+        Задача сама дописывает очередь и текущую пачку; отменяется она только
+        если не успела за STOP_TIMEOUT_SECONDS.
+        """
+        if self._task is None:
+            return
+        # С этого момента log_action пишет напрямую, минуя очередь
+        task, self._task = self._task, None
+        if not task.done():
+            await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Запись журнала не завершилась за {STOP_TIMEOUT_SECONDS} с., "
+                  f"в очереди осталось записей: {self._queue.qsize() + len(self._batch)}")
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def enqueue(self, record: tuple):
+        await self._queue.put(record)
+        self.stats["enqueued_total"] += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is _STOP:
+                break
+            self._batch = [record]
+            deadline = loop.time() + settings.AUDIT_LOG_FLUSH_INTERVAL_SECONDS
+            while len(self._batch) < settings.AUDIT_LOG_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                self._batch.append(record)
+            await self._flush(self._batch)
+            self._batch = []
+
+        # Записи, поставленные в очередь уже после сигнала остановки
+        while not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not _STOP:
+                self._batch.append(record)
+            if len(self._batch) >= settings.AUDIT_LOG_BATCH_SIZE:
+                await self._flush(self._batch)
+                self._batch = []
+        if self._batch:
+            await self._flush(self._batch)
+            self._batch = []
+
+    async def _flush(self, batch: list):
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                async with get_db_connection() as conn:
+                    await conn.copy_records_to_table("system_logs", records=batch, columns=LOG_COLUMNS)
+                self.stats["flushes"] += 1
+                self.stats["written_total"] += len(batch)
+                return
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                print(f"Ошибка записи журнала ({len(batch)} записей, попытка {attempt}): {e}")
+                if attempt < FLUSH_ATTEMPTS:
+                    await asyncio.sleep(attempt)
+
+        self.stats["dropped_total"] += len(batch)
+        print(f"Записи журнала отброшены после {FLUSH_ATTEMPTS} попыток: {len(batch)}")
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["running"] = self.running
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+
+_audit_log_writer = AuditLogWriter()
+
+
+def start_audit_log_writer():
+    """
+    Запускает фоновую запись журнала. Вызывается при старте приложения.
+    """
+    if not settings.AUDIT_LOG_SYNC:
+        _audit_log_writer.start()
+
+
+async def stop_audit_log_writer():
+    """
+    Записывает оставшиеся записи и останавливает фоновую запись журнала.
+    """
+    await _audit_log_writer.stop()
+
+
+def get_audit_log_stats() -> dict:
+    return _audit_log_writer.get_stats()
 
 
 async def log_action(level: str, message: str, user_login: str):
     """
     Записывает действие в системный журнал.
+    Внутри транзакции запись ставится в очередь только после ее фиксации,
+    поэтому действия, откатившиеся вместе с транзакцией, в журнал не попадают.
+    Без фоновой записи (синхронный режим, консольные команды) выполняется обычный INSERT.
     """
-    conn = await get_db_connection()
+    if not _audit_log_writer.running:
+        async with get_db_connection() as conn:
+            await conn.execute(
+                "INSERT INTO system_logs (level, message, user_login) VALUES ($1, $2, $3)",
+                level, message, user_login
+            )
+        return
+
+    # Время фиксируется в момент действия, а не в момент записи пачки
+    record = (datetime.now(timezone.utc), level, message, user_login)
+    if not call_after_commit(lambda: _audit_log_writer.enqueue(record)):
+        await _audit_log_writer.enqueue(record)
+
+
+def encode_log_cursor(log) -> str:
+    """
+    Курсор следующей страницы журнала: время и ID последней показанной записи.
+    """
+    return f"{log['timestamp'].isoformat()}|{log['log_id']}"
+
+
+def decode_log_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
     try:
-        await conn.execute(
-            "INSERT INTO system_logs (level, message, user_login) VALUES ($1, $2, $3)",
-            level, message, user_login
-        )
-    finally:
-        await conn.close()
+        timestamp, log_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        return None
 
 
-async def fetch_logs(limit: int = 100, sort_by: Optional[str] = None, order: Optional[str] = 'desc'):
+async def fetch_logs(
+    limit: int = 100,
+    level: Optional[str] = None,
+    user_login: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None
+):
     """
-    Получает последние записи из системного журнала.
+    Получает записи системного журнала от новых к старым с фильтрами.
+    Страницы выбираются по курсору (время и ID последней записи предыдущей страницы),
+    поэтому запрос читает только нужный участок индекса, а фильтр по времени
+    отсекает лишние помесячные секции.
+    Возвращает записи и курсор следующей страницы (None, если записей больше нет).
     """
-    conn = await get_db_connection()
+    params = []
+    where_clauses = []
+
+    if level:
+        params.append(level)
+        where_clauses.append(f"level = ${len(params)}")
+
+    if user_login:
+        params.append(user_login)
+        where_clauses.append(f"user_login = ${len(params)}")
+
+    if date_from:
+        params.append(date_from)
+        where_clauses.append(f"timestamp >= ${len(params)}")
+
+    if date_to:
+        params.append(date_to)
+        where_clauses.append(f"timestamp < ${len(params)}::date + interval '1 day'")
 
-    allowed_sort_columns = ["timestamp", "level", "user_login"]
+    position = decode_log_cursor(cursor)
+    if position:
+        params.extend(position)
+        # Отдельное условие на timestamp позволяет отбросить более новые секции
+        where_clauses.append(f"timestamp <= ${len(params) - 1}")
+        where_clauses.append(f"(timestamp, log_id) < (${len(params) - 1}, ${len(params)})")
 
-    query = f"SELECT * FROM system_logs"
+    query = "SELECT log_id, timestamp, level, message, user_login FROM system_logs"
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
 
-    if sort_by in allowed_sort_columns:
-        order_direction = "DESC" if order == 'desc' else "ASC"
-        query += f" ORDER BY {sort_by} {order_direction}"
-    else:
-        query += " ORDER BY timestamp DESC"  # Сортировка по умолчанию
+    params.append(limit + 1)
+    query += f" ORDER BY timestamp DESC, log_id DESC LIMIT ${len(params)}"
 
-    query += " LIMIT $1"
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, *params)
 
-    rows = await conn.fetch(query, limit)
-    await conn.close()
-    return rows
\ No newline at end of file
+    next_cursor = encode_log_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
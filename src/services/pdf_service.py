@@ -1,6 +1,19 @@
-from typing import Dict, Any
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List, AsyncIterator
+
+import aiofiles
 from weasyprint import HTML
+from src.config import settings
 from src.templating import templates
+from src.services.file_service import ZipChunkBuffer
+from src.single_flight import SingleFlight
 
 # Данные о провайдере (в реальном приложении лучше вынести в конфиг)
 PROVIDER_DETAILS = {
@@ -18,6 +31,29 @@ MONTHS_RU = {
     7: "июля", 8: "августа", 9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"
 }
 
+CONTRACT_TEMPLATE = "pdf/contract_pdf.html"
+PDF_CACHE_DIR = Path(settings.PDF_CACHE_DIR)
+
+# Шаблон, разобранный один раз в рабочем процессе
+_worker_template = None
+
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+# Рендеринг, который уже выполняется для данного ключа (чтобы не рендерить один договор дважды)
+_renders = SingleFlight()
+
+# Размер блока при переписывании готовых PDF в ZIP-архив
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def _init_pdf_worker():
+    """
+    Инициализация рабочего процесса: разбирает шаблон договора и прогревает WeasyPrint
+    (загрузка шрифтов и стилей), чтобы первый договор не платил за это.
+    """
+    global _worker_template
+    _worker_template = templates.get_template(CONTRACT_TEMPLATE)
+    HTML(string="<p></p>").write_pdf()
+
 
 def generate_contract_pdf(contract_data: Dict[str, Any]) -> bytes:
     """
@@ -30,7 +66,148 @@ def generate_contract_pdf(contract_data: Dict[str, Any]) -> bytes:
         "months": MONTHS_RU
     }
 
-    rendered_html = templates.get_template("pdf/contract_pdf.html").render(context)
+    template = _worker_template or templates.get_template(CONTRACT_TEMPLATE)
+    rendered_html = template.render(context)
     pdf_bytes = HTML(string=rendered_html).write_pdf()
 
-    return pdf_bytes
\ No newline at end of file
+    return pdf_bytes
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pdf_worker
+        )
+    return _pdf_executor
+
+
+def shutdown_pdf_executor():
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
+
+
+async def render_contract_pdf(contract_data: Dict[str, Any]) -> bytes:
+    """
+    Рендерит договор в отдельном процессе, не блокируя цикл событий.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pdf_executor(), generate_contract_pdf, contract_data)
+
+
+def _template_fingerprint() -> str:
+    # Изменение шаблона должно делать недействительными ранее сохраненные PDF
+    template_path = Path(templates.env.loader.searchpath[0]) / CONTRACT_TEMPLATE
+    stat = template_path.stat()
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def contract_pdf_key(contract_data: Dict[str, Any]) -> str:
+    """
+    Ключ кэша: хеш данных договора, реквизитов провайдера и версии шаблона.
+    """
+    payload = json.dumps(
+        {"contract": contract_data, "provider": PROVIDER_DETAILS, "template": _template_fingerprint()},
+        sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cached_pdf_path(contract_data: Dict[str, Any], key: str) -> Path:
+    # ID договора в имени файла позволяет найти его прежние версии
+    return PDF_CACHE_DIR / f"contract_{contract_data['contract_id']}_{key}.pdf"
+
+
+def _remove_stale_pdfs(contract_data: Dict[str, Any], current: Path):
+    """
+    Удаляет PDF прежних версий договора (до изменения данных или шаблона),
+    так что в кэше хранится не больше одного файла на договор.
+    """
+    for stale_path in PDF_CACHE_DIR.glob(f"contract_{contract_data['contract_id']}_*.pdf"):
+        if stale_path != current:
+            stale_path.unlink(missing_ok=True)
+
+
+async def _render_to_cache(contract_data: Dict[str, Any], path: Path):
+    pdf_bytes = await render_contract_pdf(contract_data)
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Пишем во временный файл и переименовываем, чтобы не отдать недописанный PDF
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    async with aiofiles.open(tmp_path, "wb") as out_file:
+        await out_file.write(pdf_bytes)
+    os.replace(tmp_path, path)
+    _remove_stale_pdfs(contract_data, path)
+
+
+async def get_contract_pdf(contract_data: Dict[str, Any], key: Optional[str] = None) -> Tuple[Path, str]:
+    """
+    Возвращает путь к PDF-файлу договора и его ключ (используется как ETag).
+    Повторные запросы с теми же данными отдаются из дискового кэша без рендеринга.
+    Ключ, уже вычисленный через contract_pdf_key, можно передать в key.
+    """
+    key = key or contract_pdf_key(contract_data)
+    path = _cached_pdf_path(contract_data, key)
+    if path.exists():
+        return path, key
+
+    await _renders.run(key, lambda: _render_to_cache(contract_data, path))
+    return path, key
+
+
+def contract_pdf_filename(contract_data: Dict[str, Any]) -> str:
+    return f"contract_{contract_data['contract_id']}_{contract_data['start_date']}.pdf"
+
+
+async def iter_contract_pdfs(contracts: List[Dict[str, Any]]) -> AsyncIterator[Tuple[Dict[str, Any], Path]]:
+    """
+    Рендерит договоры параллельно во всех процессах пула и выдает пары
+    (договор, путь к PDF) по мере готовности. Одновременно в работе держится
+    ограниченное число договоров, чтобы не ставить в очередь пула весь список сразу.
+    """
+    window = (settings.PDF_RENDER_WORKERS or os.cpu_count() or 1) * 2
+    remaining = iter(contracts)
+
+    async def render(contract):
+        path, _ = await get_contract_pdf(contract)
+        return contract, path
+
+    pending = set()
+    for contract in remaining:
+        pending.add(asyncio.ensure_future(render(contract)))
+        if len(pending) >= window:
+            break
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                next_contract = next(remaining, None)
+                if next_contract is not None:
+                    pending.add(asyncio.ensure_future(render(next_contract)))
+                yield task.result()
+    finally:
+        # Клиент мог прервать скачивание - незавершенные рендеры больше не нужны
+        for task in pending:
+            task.cancel()
+
+
+async def stream_contracts_zip(contracts: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Отдает ZIP-архив с PDF договоров по частям: каждый договор дописывается
+    в архив сразу после рендеринга, архив целиком в памяти не хранится.
+    """
+    buffer = ZipChunkBuffer()
+    # PDF уже сжат внутри, поэтому файлы кладутся в архив без повторного сжатия
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for contract, pdf_path in iter_contract_pdfs(contracts):
+            with archive.open(contract_pdf_filename(contract), mode="w") as entry:
+                async with aiofiles.open(pdf_path, "rb") as pdf_file:
+                    while chunk := await pdf_file.read(ZIP_CHUNK_SIZE):
+                        entry.write(chunk)
+                        yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
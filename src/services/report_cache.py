@@ -0,0 +1,64 @@
+from datetime import date
+from typing import Any, Awaitable, Callable
+
+from src.cache import TTLCache
+from src.config import settings
+from src.single_flight import SingleFlight
+
+# Кэш результатов отчетов по платежам. Ключ - (имя отчета, начало периода, конец периода).
+# Новый платеж сбрасывает только отчеты, в период которых попадает день платежа.
+
+_reports = TTLCache(
+    maxsize=settings.REPORT_CACHE_MAX_SIZE,
+    ttl=settings.REPORT_CACHE_TTL_SECONDS
+)
+# Одинаковые отчеты, которые уже считаются, не запускаются повторно
+_computations = SingleFlight()
+# Увеличивается при каждом сбросе: отчет, начатый до сброса, не сохраняется в кэш
+_generation = 0
+_invalidated = 0
+
+_MISSING = object()
+
+
+async def get_or_compute(name: str, start_date: date, end_date: date, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Возвращает отчет из кэша или вычисляет его через compute().
+    Одновременные запросы одного и того же отчета ждут одно вычисление.
+    """
+    key = (name, start_date, end_date)
+    cached = _reports.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    async def compute_and_store():
+        generation = _generation
+        result = await compute()
+        if generation == _generation and settings.REPORT_CACHE_TTL_SECONDS > 0:
+            _reports.set(key, result)
+        return result
+
+    return await _computations.run(key, compute_and_store)
+
+
+def invalidate_payment_day(day: date):
+    """
+    Сбрасывает отчеты, в период которых попадает день day (после нового платежа).
+    """
+    global _generation, _invalidated
+    _generation += 1
+
+    def covers_day(key) -> bool:
+        return key[1] <= day <= key[2]
+
+    _invalidated += _reports.invalidate(lambda key, value: covers_day(key))
+    _computations.forget(covers_day)
+
+
+def get_report_cache_stats() -> dict:
+    return {
+        **_reports.stats(),
+        "coalesced": _computations.coalesced,
+        "in_flight": len(_computations),
+        "invalidated": _invalidated,
+    }
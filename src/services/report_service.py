@@ -1,32 +1,12 @@
-from datetime import date, timedelta
-from src.db.connection import get_db_connection
-
-async def get_payment_summary(start_date: date, end_date: date):
-    """
-    Формирует СВОДНЫЙ отчет по платежам за указанный период.
-    Возвращает общее количество платежей и их суммарный объем.
-    """
-    conn = await get_db_connection()
-    query = """
-    SELECT
-        COUNT(payment_id) as total_payments,
-        SUM(amount) as total_amount
-    FROM payments
-    WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
-    """
-    summary = await conn.fetchrow(query, start_date, end_date)
-    await conn.close()
-    if summary and summary['total_payments'] > 0:
-        return summary
-    return {"total_payments": 0, "total_amount": 0}
+import json
+from datetime import date
+from src.db.connection import get_db_connection, db_transaction
+from src.services import export_service, report_cache
 
+# Сколько строк курсор получает с сервера за одно обращение
+EXPORT_CURSOR_PREFETCH = 1000
 
-async def get_all_payments_for_period(start_date: date, end_date: date):
-    """
-    Формирует ДЕТАЛЬНЫЙ список всех платежей за указанный период.
-    """
-    conn = await get_db_connection()
-    query = """
+PAYMENTS_FOR_PERIOD_QUERY = """
     SELECT
         p.payment_id,
         p.amount,
@@ -38,61 +18,189 @@ async def get_all_payments_for_period(start_date: date, end_date: date):
     LEFT JOIN subscribers s ON p.subscriber_id = s.subscriber_id
     WHERE p.payment_date >= $1 AND p.payment_date < $2::date + interval '1 day'
     ORDER BY p.payment_date DESC
-    """
-    rows = await conn.fetch(query, start_date, end_date)
-    await conn.close()
-    return rows
+"""
 
-
-async def get_daily_payment_dynamics(start_date: date, end_date: date):
+async def get_payment_summary(start_date: date, end_date: date):
     """
-    Агрегирует сумму платежей по каждому дню в заданном периоде.
-    Возвращает словарь с датами (labels) и суммами (data).
+    Формирует СВОДНЫЙ отчет по платежам за указанный период.
+    Возвращает общее количество платежей и их суммарный объем.
+    Считается по дневным итогам, а не по самим платежам.
     """
-    conn = await get_db_connection()
+    return await report_cache.get_or_compute(
+        "payment_summary", start_date, end_date, lambda: _compute_payment_summary(start_date, end_date)
+    )
+
+
+async def _compute_payment_summary(start_date: date, end_date: date):
     query = """
     SELECT
-        date_trunc('day', payment_date)::date as day,
-        SUM(amount) as daily_total
-    FROM payments
-    WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
-    GROUP BY day
-    ORDER BY day;
+        COALESCE(SUM(payments_count), 0)::bigint as total_payments,
+        COALESCE(SUM(total_amount), 0) as total_amount
+    FROM payment_daily_rollups
+    WHERE day BETWEEN $1 AND $2
+    """
+
+    async with get_db_connection() as conn:
+        summary = await conn.fetchrow(query, start_date, end_date)
+    return dict(summary)
+
+
+async def stream_payments_report_json(start_date: date, end_date: date):
+    """
+    Формирует ДЕТАЛЬНЫЙ отчет по платежам за период в JSON по частям:
+    заголовок отчета, затем массив платежей из потоковой выгрузки.
+    """
+    summary = await get_payment_summary(start_date, end_date)
+    header = {
+        "report_type": "Detailed Payments Report",
+        "period": {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+        "summary": {
+            "total_payments": summary["total_payments"],
+            "total_amount": str(summary["total_amount"])
+        }
+    }
+    yield (json.dumps(header, ensure_ascii=False)[:-1] + ', "payments": ').encode("utf-8")
+
+    query, params = export_service.build_export_query("payments", start_date, end_date)
+    async for chunk in export_service.stream_json_array(query, params):
+        yield chunk
+    yield b"}"
+
+
+async def iter_payments_for_period(start_date: date, end_date: date):
+    """
+    Отдает платежи за период по одной записи через серверный курсор,
+    не загружая весь результат в память. Курсор asyncpg работает только
+    внутри транзакции, поэтому чтение идет в транзакции.
     """
-    rows = await conn.fetch(query, start_date, end_date)
-    await conn.close()
+    async with db_transaction() as conn:
+        async for row in conn.cursor(PAYMENTS_FOR_PERIOD_QUERY, start_date, end_date, prefetch=EXPORT_CURSOR_PREFETCH):
+            yield row
 
-    labels = []
-    data = []
 
-    date_map = {row['day']: float(row['daily_total']) for row in rows}
-    current_date = start_date
-    while current_date <= end_date:
-        labels.append(current_date.strftime('%d.%m.%Y'))
-        data.append(date_map.get(current_date, 0))
-        current_date += timedelta(days=1)
+# Все данные страницы отчетов одним запросом по дневным итогам.
+# GROUPING SETS считает за один проход итоги по дням (grouping_level = 1), по способам оплаты (2)
+# и общий итог (3); пропущенные дни добавляются generate_series.
+PAYMENTS_REPORT_QUERY = """
+    WITH totals AS (
+        SELECT
+            day,
+            payment_method,
+            SUM(payments_count)::bigint AS payments_count,
+            SUM(total_amount) AS total_amount,
+            GROUPING(day, payment_method) AS grouping_level
+        FROM payment_daily_rollups
+        WHERE day BETWEEN $1 AND $2
+        GROUP BY GROUPING SETS ((day), (payment_method), ())
+    )
+    SELECT 'day' AS kind, days.day::date AS day, NULL AS payment_method,
+           COALESCE(totals.payments_count, 0) AS payments_count,
+           COALESCE(totals.total_amount, 0) AS total_amount
+    FROM generate_series($1::date, $2::date, interval '1 day') AS days(day)
+    LEFT JOIN totals ON totals.grouping_level = 1 AND totals.day = days.day::date
+    UNION ALL
+    SELECT CASE grouping_level WHEN 2 THEN 'method' ELSE 'total' END, NULL, payment_method,
+           COALESCE(payments_count, 0), COALESCE(total_amount, 0)
+    FROM totals
+    WHERE grouping_level IN (2, 3)
+    ORDER BY kind, day, payments_count DESC
+"""
 
-    return {"labels": labels, "data": data}
 
-async def get_payment_methods_distribution(start_date: date, end_date: date):
+async def get_payments_report(start_date: date, end_date: date):
     """
-    Считает количество платежей по каждому способу оплаты.
+    Собирает данные страницы отчетов за период одним запросом:
+    сводку (payment_summary), суммы по дням (daily_dynamics) и количество
+    платежей по способам оплаты (payment_methods) в формате для Chart.js.
+    Результат кэшируется (см. report_cache).
     """
-    conn = await get_db_connection()
-    query = """
-    SELECT
-        payment_method,
-        COUNT(payment_id) as count
+    return await report_cache.get_or_compute(
+        "payments_report", start_date, end_date, lambda: _compute_payments_report(start_date, end_date)
+    )
+
+
+async def _compute_payments_report(start_date: date, end_date: date):
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(PAYMENTS_REPORT_QUERY, start_date, end_date)
+
+    payment_summary = {"total_payments": 0, "total_amount": 0}
+    daily_dynamics = {"labels": [], "data": []}
+    payment_methods = {"labels": [], "data": []}
+
+    for row in rows:
+        if row['kind'] == 'day':
+            daily_dynamics["labels"].append(row['day'].strftime('%d.%m.%Y'))
+            daily_dynamics["data"].append(float(row['total_amount']))
+        elif row['kind'] == 'method':
+            payment_methods["labels"].append(row['payment_method'])
+            payment_methods["data"].append(row['payments_count'])
+        else:
+            payment_summary = {"total_payments": row['payments_count'], "total_amount": row['total_amount']}
+
+    return {
+        "payment_summary": payment_summary,
+        "daily_dynamics": daily_dynamics,
+        "payment_methods": payment_methods,
+    }
+
+ACTUAL_DAILY_TOTALS_QUERY = """
+    SELECT payment_date::date AS day, payment_method, COUNT(*) AS payments_count, SUM(amount) AS total_amount
     FROM payments
     WHERE payment_date >= $1 AND payment_date < $2::date + interval '1 day'
-    GROUP BY payment_method
-    ORDER BY count DESC;
+    GROUP BY payment_date::date, payment_method
+"""
+
+
+async def rebuild_payment_rollups(start_date: date, end_date: date) -> int:
+    """
+    Пересчитывает дневные итоги платежей за период (включительно) по самим платежам.
+    На время пересчета запись в payments блокируется, чтобы новые платежи
+    не разошлись с пересчитанными итогами. Возвращает число записанных строк итогов.
     """
-    rows = await conn.fetch(query, start_date, end_date)
-    await conn.close()
+    async with db_transaction() as conn:
+        await conn.execute("LOCK TABLE payments IN SHARE MODE")
+        await conn.execute("DELETE FROM payment_daily_rollups WHERE day BETWEEN $1 AND $2", start_date, end_date)
+        result = await conn.execute(
+            f"""
+            INSERT INTO payment_daily_rollups (day, payment_method, payments_count, total_amount)
+            SELECT day, payment_method, payments_count, total_amount
+            FROM ({ACTUAL_DAILY_TOTALS_QUERY}) actual
+            """,
+            start_date, end_date
+        )
+    return int(result.split()[-1])
 
-    # Готовим данные для Chart.js
-    labels = [row['payment_method'] for row in rows]
-    data = [row['count'] for row in rows]
 
-    return {"labels": labels, "data": data}
\ No newline at end of file
+async def find_payment_rollup_mismatches(start_date: date, end_date: date):
+    """
+    Сверяет дневные итоги с платежами за период и возвращает расхождения:
+    день, способ оплаты, количество и сумма по платежам и по итогам.
+    """
+    query = f"""
+    SELECT
+        COALESCE(actual.day, rollup.day) AS day,
+        COALESCE(actual.payment_method, rollup.payment_method) AS payment_method,
+        COALESCE(actual.payments_count, 0) AS actual_count,
+        COALESCE(rollup.payments_count, 0) AS rollup_count,
+        COALESCE(actual.total_amount, 0) AS actual_amount,
+        COALESCE(rollup.total_amount, 0) AS rollup_amount
+    FROM ({ACTUAL_DAILY_TOTALS_QUERY}) actual
+    FULL JOIN (
+        SELECT * FROM payment_daily_rollups WHERE day BETWEEN $1 AND $2
+    ) rollup ON actual.day = rollup.day AND actual.payment_method = rollup.payment_method
+    WHERE actual.payments_count IS DISTINCT FROM rollup.payments_count
+       OR actual.total_amount IS DISTINCT FROM rollup.total_amount
+    ORDER BY day, payment_method
+    """
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, start_date, end_date)
+    return rows
+
+
+async def get_payments_date_range():
+    """
+    Возвращает первый и последний день, за которые есть платежи, или (None, None).
+    """
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow("SELECT MIN(payment_date)::date AS first_day, MAX(payment_date)::date AS last_day FROM payments")
+    return row["first_day"], row["last_day"]
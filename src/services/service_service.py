@@ -1,5 +1,6 @@
 from typing import Optional
-from src.db.connection import get_db_connection
+from src.db.connection import get_db_connection, db_transaction
+from src.db.loaders import get_loader, forget
 from src.services.log_service import log_action
 
 
@@ -12,8 +13,6 @@ async def fetch_all_services(
     Получает список всех услуг, предоставляемых провайдером.
     Добавлена возможность фильтрации по статусу.
     """
-    conn = await get_db_connection()
-
     allowed_sort_columns = ["service_id", "name", "price", "status"]
 
     query = "SELECT * FROM services"
@@ -31,41 +30,43 @@ async def fetch_all_services(
     else:
         query += " ORDER BY name"  # Сортировка по умолчанию
 
-    rows = await conn.fetch(query, *params) # <-- ПЕРЕДАЕМ ПАРАМЕТРЫ
-    await conn.close()
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, *params) # <-- ПЕРЕДАЕМ ПАРАМЕТРЫ
     return rows
 
 
+async def _load_services(ids: list) -> dict:
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT * FROM services WHERE service_id = ANY($1::int[])", ids)
+    return {row['service_id']: row for row in rows}
+
+
 async def fetch_service_by_id(service_id: int):
-    conn = await get_db_connection()
-    row = await conn.fetchrow("SELECT * FROM services WHERE service_id = $1", service_id)
-    await conn.close()
-    return row
+    return await get_loader("services", _load_services).load(service_id)
 
 
 async def create_service(name: str, description: str, price: float, status: str):
-    conn = await get_db_connection()
-    await conn.execute(
-        "INSERT INTO services (name, description, price, status) VALUES ($1, $2, $3, $4)",
-        name, description, price, status
-    )
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute(
+            "INSERT INTO services (name, description, price, status) VALUES ($1, $2, $3, $4)",
+            name, description, price, status
+        )
     # Логирование для создания пока опустим, т.к. нет user_login
 
 
 async def update_service(service_id: int, name: str, description: str, price: float, status: str):
-    conn = await get_db_connection()
-    await conn.execute(
-        "UPDATE services SET name = $1, description = $2, price = $3, status = $4 WHERE service_id = $5",
-        name, description, price, status, service_id
-    )
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute(
+            "UPDATE services SET name = $1, description = $2, price = $3, status = $4 WHERE service_id = $5",
+            name, description, price, status, service_id
+        )
+    forget("services", service_id)
     # Логирование для обновления пока опустим
 
 
 async def delete_service(service_id: int, user_login: str):
-    conn = await get_db_connection()
-    service_name = await conn.fetchval("SELECT name FROM services WHERE service_id = $1", service_id)
-    await conn.execute("DELETE FROM services WHERE service_id = $1", service_id)
-    await conn.close()
-    await log_action("WARNING", f"Удалена услуга '{service_name}' (ID: {service_id}).", user_login)
\ No newline at end of file
+    async with db_transaction() as conn:
+        service_name = await conn.fetchval("SELECT name FROM services WHERE service_id = $1", service_id)
+        await conn.execute("DELETE FROM services WHERE service_id = $1", service_id)
+        await log_action("WARNING", f"Удалена услуга '{service_name}' (ID: {service_id}).", user_login)
+    forget("services", service_id)
\ No newline at end of file
@@ -1,9 +1,13 @@
 import secrets
+from datetime import date
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from src.config import settings
-from src.db.connection import get_db_connection
+from src.db.connection import get_db_connection, db_transaction
+from src.auth.principal_cache import invalidate_subscriber
+from src.db.loaders import forget
 from src.services.auth_service import verify_password, hash_password
 from src.services.file_service import save_avatar
+from src.services import report_cache
 from fastapi import UploadFile
 
 conf = ConnectionConfig(
@@ -45,10 +49,9 @@ async def send_confirmation_email(email_to: str, token: str):
 
 async def get_subscriber_by_phone(phone: str):
     """Находит абонента по номеру телефона."""
-    conn = await get_db_connection()
     query = "SELECT * FROM subscribers WHERE phone_number = $1"
-    subscriber = await conn.fetchrow(query, phone)
-    await conn.close()
+    async with get_db_connection() as conn:
+        subscriber = await conn.fetchrow(query, phone)
     return subscriber
 
 
@@ -57,11 +60,10 @@ async def verify_subscriber_credentials(email: str, password: str):
     Проверяет, существует ли абонент с таким email, верен ли пароль и подтвержден ли аккаунт.
     Возвращает словарь с ошибкой или запись пользователя.
     """
-    conn = await get_db_connection()
-    subscriber = await conn.fetchrow("SELECT * FROM subscribers WHERE email = $1", email)
-    await conn.close()
+    async with get_db_connection() as conn:
+        subscriber = await conn.fetchrow("SELECT * FROM subscribers WHERE email = $1", email)
 
-    if not subscriber or not verify_password(password, subscriber['password_hash']):
+    if not subscriber or not await verify_password(password, subscriber['password_hash']):
         return {"error": "Неверный email или пароль."}
 
     if not subscriber['is_confirmed']:
@@ -72,24 +74,28 @@ async def verify_subscriber_credentials(email: str, password: str):
     return dict(subscriber)
 
 
-async def get_subscriber_payments(subscriber_id: int):
+async def get_subscriber_payments(subscriber_id: int, year: int):
     """
-    Получает историю платежей для конкретного абонента.
+    Получает историю платежей абонента за календарный год.
+    Условие по дате ограничивает запрос секциями payments этого года.
     """
-    conn = await get_db_connection()
-    query = "SELECT amount, payment_date, payment_method FROM payments WHERE subscriber_id = $1 ORDER BY payment_date DESC"
-    payments = await conn.fetch(query, subscriber_id)
-    await conn.close()
+    query = """
+    SELECT amount, payment_date, payment_method
+    FROM payments
+    WHERE subscriber_id = $1 AND payment_date >= $2 AND payment_date < $3
+    ORDER BY payment_date DESC
+    """
+    async with get_db_connection() as conn:
+        payments = await conn.fetch(query, subscriber_id, date(year, 1, 1), date(year + 1, 1, 1))
     return payments
 
 async def get_subscriber_notifications(subscriber_id: int):
     """
     Получает историю уведомлений для конкретного абонента.
     """
-    conn = await get_db_connection()
     query = "SELECT message, type, sent_date FROM notifications WHERE subscriber_id = $1 ORDER BY sent_date DESC"
-    notifications = await conn.fetch(query, subscriber_id)
-    await conn.close()
+    async with get_db_connection() as conn:
+        notifications = await conn.fetch(query, subscriber_id)
     return notifications
 
 async def top_up_subscriber_balance(subscriber_id: int, amount: float):
@@ -97,11 +103,11 @@ async def top_up_subscriber_balance(subscriber_id: int, amount: float):
     Пополняет баланс абонента и создает запись о платеже.
     Выполняется в транзакции для обеспечения целостности данных.
     """
-    conn = await get_db_connection()
-    async with conn.transaction():
+    async with db_transaction() as conn:
         # 1. Добавляем запись в историю платежей
-        await conn.execute(
-            "INSERT INTO payments (subscriber_id, amount, payment_method) VALUES ($1, $2, $3)",
+        payment_day = await conn.fetchval(
+            "INSERT INTO payments (subscriber_id, amount, payment_method) VALUES ($1, $2, $3) "
+            "RETURNING payment_date::date",
             subscriber_id, amount, 'Пополнение через ЛК'
         )
         # 2. Обновляем баланс абонента
@@ -109,29 +115,31 @@ async def top_up_subscriber_balance(subscriber_id: int, amount: float):
             "UPDATE subscribers SET balance = balance + $1 WHERE subscriber_id = $2",
             amount, subscriber_id
         )
-    await conn.close()
+    forget("subscribers", subscriber_id)
+    invalidate_subscriber(subscriber_id)
+    report_cache.invalidate_payment_day(payment_day)
 
 
 async def update_subscriber_contact_info(subscriber_id: int, full_name: str, address: str, phone: str):
     """
     Обновляет контактные данные абонента.
     """
-    conn = await get_db_connection()
-    # Проверяем, не занят ли новый номер телефона кем-то другим
-    if phone:
-        existing = await conn.fetchrow(
-            "SELECT subscriber_id FROM subscribers WHERE phone_number = $1 AND subscriber_id != $2",
-            phone, subscriber_id
-        )
-        if existing:
-            await conn.close()
-            return {"error": "Этот номер телефона уже используется другим абонентом."}
+    async with get_db_connection() as conn:
+        # Проверяем, не занят ли новый номер телефона кем-то другим
+        if phone:
+            existing = await conn.fetchrow(
+                "SELECT subscriber_id FROM subscribers WHERE phone_number = $1 AND subscriber_id != $2",
+                phone, subscriber_id
+            )
+            if existing:
+                return {"error": "Этот номер телефона уже используется другим абонентом."}
 
-    await conn.execute(
-        "UPDATE subscribers SET full_name = $1, address = $2, phone_number = $3 WHERE subscriber_id = $4",
-        full_name, address, phone, subscriber_id
-    )
-    await conn.close()
+        await conn.execute(
+            "UPDATE subscribers SET full_name = $1, address = $2, phone_number = $3 WHERE subscriber_id = $4",
+            full_name, address, phone, subscriber_id
+        )
+    forget("subscribers", subscriber_id)
+    invalidate_subscriber(subscriber_id)
     return {"success": True}
 
 
@@ -139,20 +147,18 @@ async def create_new_subscriber(full_name: str, address: str, phone: str, passwo
     """
     Регистрирует нового абонента, но не активирует его до подтверждения email.
     """
-    conn = await get_db_connection()
-    # Проверяем, не занят ли уже email
-    existing_by_email = await conn.fetchrow("SELECT subscriber_id FROM subscribers WHERE email = $1", email)
-    if existing_by_email:
-        await conn.close()
-        return {"error": "Этот email уже зарегистрирован."}
+    async with get_db_connection() as conn:
+        # Проверяем, не занят ли уже email
+        existing_by_email = await conn.fetchrow("SELECT subscriber_id FROM subscribers WHERE email = $1", email)
+        if existing_by_email:
+            return {"error": "Этот email уже зарегистрирован."}
 
-    # Проверяем, не занят ли уже номер телефона
-    existing_by_phone = await conn.fetchrow("SELECT subscriber_id FROM subscribers WHERE phone_number = $1", phone)
-    if existing_by_phone:
-        await conn.close()
-        return {"error": "Этот номер телефона уже зарегистрирован."}
+        # Проверяем, не занят ли уже номер телефона
+        existing_by_phone = await conn.fetchrow("SELECT subscriber_id FROM subscribers WHERE phone_number = $1", phone)
+        if existing_by_phone:
+            return {"error": "Этот номер телефона уже зарегистрирован."}
 
-    hashed_pass = hash_password(password)
+    hashed_pass = await hash_password(password)
     confirmation_token = secrets.token_urlsafe(32)
 
     query = """
@@ -160,8 +166,8 @@ async def create_new_subscriber(full_name: str, address: str, phone: str, passwo
     VALUES ($1, $2, $3, $4, 0.00, $5, FALSE, $6)
     RETURNING *
     """
-    new_subscriber = await conn.fetchrow(query, full_name, address, phone, hashed_pass, email, confirmation_token)
-    await conn.close()
+    async with get_db_connection() as conn:
+        new_subscriber = await conn.fetchrow(query, full_name, address, phone, hashed_pass, email, confirmation_token)
 
     if new_subscriber:
         # Отправляем письмо только если пользователь успешно создан
@@ -179,11 +185,12 @@ async def update_subscriber_avatar(subscriber_id: int, file: UploadFile):
     avatar_filename = await save_avatar(file, subscriber_id)
 
     # 2. Обновляем запись в базе данных
-    conn = await get_db_connection()
-    await conn.execute(
-        "UPDATE subscribers SET avatar_url = $1 WHERE subscriber_id = $2",
-        avatar_filename, subscriber_id
-    )
-    await conn.close()
+    async with get_db_connection() as conn:
+        await conn.execute(
+            "UPDATE subscribers SET avatar_url = $1 WHERE subscriber_id = $2",
+            avatar_filename, subscriber_id
+        )
+    forget("subscribers", subscriber_id)
+    invalidate_subscriber(subscriber_id)
 
     return {"success": True, "avatar_url": avatar_filename}
\ No newline at end of file
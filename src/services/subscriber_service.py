@@ -1,75 +1,150 @@
-from typing import Optional
-from src.db.connection import get_db_connection
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Tuple
+from src.db.connection import get_db_connection, db_transaction
+from src.auth.principal_cache import invalidate_subscriber, invalidate_all_subscribers
+from src.db.loaders import get_loader, forget
+from src.db.pagination import Page, resolve_sort, fetch_keyset_page
 from src.services.log_service import log_action
 
+# Столбцы для списка и результатов поиска (см. partials/subscriber_rows.html)
+SUBSCRIBER_LIST_COLUMNS = "subscriber_id, full_name, address, phone_number, balance, avatar_url"
+
 
 async def fetch_all_subscribers(
     sort_by: Optional[str] = None,
     order: Optional[str] = 'asc',
-    balance_filter: Optional[str] = None
-):
+    balance_filter: Optional[str] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
     """
-    Получает список всех абонентов с возможностью сортировки и фильтрации.
+    Получает страницу списка абонентов с возможностью сортировки и фильтрации.
     """
-    conn = await get_db_connection()
-    allowed_sort_columns = ["subscriber_id", "full_name", "address", "phone_number", "balance"]
+    allowed_sort_columns = {
+        "subscriber_id": "subscriber_id",
+        "full_name": "full_name",
+        "address": "address",
+        "phone_number": "phone_number",
+        "balance": "balance"
+    }
+    sort = resolve_sort(
+        allowed_sort_columns, sort_by, order,
+        default_sort="subscriber_id", default_order="asc",
+        id_key="subscriber_id", id_sql="subscriber_id", nullable_columns=["address"]
+    )
 
-    # Используем список для безопасного построения запроса
-    query_parts = ["SELECT * FROM subscribers"]
     where_clauses = []
-
-    # --- БЛОК ИЗМЕНЕНИЙ ---
     if balance_filter == 'debtors':
         where_clauses.append("balance < 0")
     elif balance_filter == 'positive':
         where_clauses.append("balance >= 0")
 
-    if where_clauses:
-        # Добавляем WHERE и объединяем условия (хотя здесь оно одно)
-        query_parts.append("WHERE " + " AND ".join(where_clauses))
-    # --- КОНЕЦ БЛОКА ИЗМЕНЕНИЙ ---
-
-    # Логика сортировки
-    if sort_by in allowed_sort_columns:
-        order_direction = "DESC" if order == 'desc' else "ASC"
-        query_parts.append(f"ORDER BY {sort_by} {order_direction}")
-    else:
-        query_parts.append("ORDER BY subscriber_id ASC")
+    return await fetch_keyset_page(
+        f"SELECT {SUBSCRIBER_LIST_COLUMNS} FROM subscribers", where_clauses, [], sort, page_size, cursor
+    )
 
-    # Объединяем все части через пробел
-    final_query = " ".join(query_parts)
 
-    # В этой конкретной функции параметры не используются, но так безопаснее
-    rows = await conn.fetch(final_query)
-    await conn.close()
-    return rows
+async def _load_subscribers(ids: list) -> dict:
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT * FROM subscribers WHERE subscriber_id = ANY($1::int[])", ids)
+    return {row['subscriber_id']: row for row in rows}
 
 
 async def fetch_subscriber_by_id(sub_id: int):
     """
     Получает одного абонента по его ID.
+    В рамках запроса результат запоминается, параллельные вызовы объединяются в один запрос.
     """
-    conn = await get_db_connection()
-    row = await conn.fetchrow("SELECT * FROM subscribers WHERE subscriber_id = $1", sub_id)
-    await conn.close()
-    return row
+    return await get_loader("subscribers", _load_subscribers).load(sub_id)
+
+
+# Сколько лучших совпадений возвращает поиск
+SEARCH_RESULTS_LIMIT = 50
+# Не более стольких вариантов возвращает подсказка при выборе абонента в формах
+TYPEAHEAD_LIMIT = 20
+# Минимальная длина для поиска по триграммам; более короткие запросы ищут по началу ФИО
+TRIGRAM_MIN_LENGTH = 3
+# Сколько ближайших кандидатов каждого вида отбирается по индексам перед ранжированием
+SEARCH_CANDIDATES_LIMIT = 200
+# Номер телефона без оформления: совпадает с выражением индексов idx_subscribers_phone_digits_trgm(_gist)
+PHONE_DIGITS_SQL = "regexp_replace(phone_number, '[^0-9]', '', 'g')"
 
 
-async def search_subscribers(query: str):
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search_subscribers(query: str, limit: int = SEARCH_RESULTS_LIMIT):
     """
-    Ищет абонентов по ФИО, адресу или номеру телефона.
+    Ищет абонентов по ФИО, адресу или номеру телефона и возвращает
+    не более limit лучших совпадений.
+    Текстовый запрос ищется по триграммным индексам и ранжируется по сходству,
+    запрос из цифр (с пробелами, скобками, дефисами) сравнивается с номером без оформления.
     """
-    conn = await get_db_connection()
-    search_pattern = f"%{query}%"
-    rows = await conn.fetch(
+    query = query.strip()
+    if not query:
+        return []
+
+    digits = re.sub(r"[^0-9]", "", query)
+    is_phone_query = len(digits) >= TRIGRAM_MIN_LENGTH and re.fullmatch(r"[0-9+\s()-]+", query)
+
+    if is_phone_query:
+        # Кандидаты берутся из GiST-индекса idx_subscribers_phone_digits_trgm_gist в порядке близости
+        # и ограничены LIMIT; среди них точное совпадение номера выше, затем совпадение по окончанию
+        sql = f"""
+            WITH candidates AS (
+                SELECT subscriber_id FROM subscribers
+                WHERE {PHONE_DIGITS_SQL} LIKE $1
+                ORDER BY $2 <<-> {PHONE_DIGITS_SQL}
+                LIMIT $5
+            )
+            SELECT {SUBSCRIBER_LIST_COLUMNS}
+            FROM subscribers
+            WHERE subscriber_id IN (SELECT subscriber_id FROM candidates)
+            ORDER BY ({PHONE_DIGITS_SQL} = $2) DESC, ({PHONE_DIGITS_SQL} LIKE $3) DESC, subscriber_id
+            LIMIT $4
         """
-        SELECT * FROM subscribers
-        WHERE full_name ILIKE $1 OR address ILIKE $1 OR phone_number ILIKE $1
-        ORDER BY subscriber_id
-        """,
-        search_pattern
-    )
-    await conn.close()
+        params = [f"%{digits}%", digits, f"%{digits}", limit, max(limit, SEARCH_CANDIDATES_LIMIT)]
+    elif len(query) < TRIGRAM_MIN_LENGTH:
+        # Фильтр и сортировка совпадают с выражением индекса idx_subscribers_full_name_sort
+        sql = f"""
+            SELECT {SUBSCRIBER_LIST_COLUMNS}
+            FROM subscribers
+            WHERE lower(full_name) COLLATE "C" LIKE $1
+            ORDER BY lower(full_name) COLLATE "C", subscriber_id
+            LIMIT $2
+        """
+        params = [escape_like(query.lower()) + "%", limit]
+    else:
+        # Подстрока в ФИО или адресе либо похожее ФИО (опечатки). Кандидаты каждого вида
+        # берутся из GiST-индексов в порядке близости (<<->) и ограничены LIMIT,
+        # поэтому ранжируется не все множество совпадений, а не более нескольких сотен строк
+        sql = f"""
+            WITH candidates AS (
+                (SELECT subscriber_id FROM subscribers
+                 WHERE full_name ILIKE $2 ORDER BY $1 <<-> full_name LIMIT $4)
+                UNION
+                (SELECT subscriber_id FROM subscribers
+                 WHERE $1 <% full_name ORDER BY $1 <<-> full_name LIMIT $4)
+                UNION
+                (SELECT subscriber_id FROM subscribers
+                 WHERE address ILIKE $2 ORDER BY $1 <<-> address LIMIT $4)
+            )
+            SELECT {SUBSCRIBER_LIST_COLUMNS}
+            FROM subscribers
+            WHERE subscriber_id IN (SELECT subscriber_id FROM candidates)
+            ORDER BY GREATEST(
+                word_similarity($1, full_name) + CASE WHEN full_name ILIKE $2 THEN 1 ELSE 0 END,
+                word_similarity($1, coalesce(address, ''))
+            ) DESC, subscriber_id
+            LIMIT $3
+        """
+        params = [query, f"%{escape_like(query)}%", limit, max(limit, SEARCH_CANDIDATES_LIMIT)]
+
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(sql, *params)
     return rows
 
 
@@ -77,13 +152,12 @@ async def create_subscriber(full_name: str, address: str, phone: str, balance: f
     """
     Создает нового абонента.
     """
-    conn = await get_db_connection()
-    new_id = await conn.fetchval(
-        "INSERT INTO subscribers (full_name, address, phone_number, balance) VALUES ($1, $2, $3, $4) RETURNING subscriber_id",
-        full_name, address, phone, balance
-    )
-    await conn.close()
-    await log_action("INFO", f"Создан новый абонент '{full_name}' (ID: {new_id}).", user_login)
+    async with db_transaction() as conn:
+        new_id = await conn.fetchval(
+            "INSERT INTO subscribers (full_name, address, phone_number, balance) VALUES ($1, $2, $3, $4) RETURNING subscriber_id",
+            full_name, address, phone, balance
+        )
+        await log_action("INFO", f"Создан новый абонент '{full_name}' (ID: {new_id}).", user_login)
 
 
 async def update_subscriber(sub_id: int, full_name: str, address: str, phone_number: str, balance: float,
@@ -91,25 +165,25 @@ async def update_subscriber(sub_id: int, full_name: str, address: str, phone_num
     """
     Обновляет данные существующего абонента.
     """
-    conn = await get_db_connection()
-    await conn.execute(
-        """
-        UPDATE subscribers
-        SET full_name = $1, address = $2, phone_number = $3, balance = $4
-        WHERE subscriber_id = $5
-        """,
-        full_name, address, phone_number, balance, sub_id
-    )
-    await conn.close()
-    await log_action("INFO", f"Обновлены данные абонента '{full_name}' (ID: {sub_id}).", user_login)
+    async with db_transaction() as conn:
+        await conn.execute(
+            """
+            UPDATE subscribers
+            SET full_name = $1, address = $2, phone_number = $3, balance = $4
+            WHERE subscriber_id = $5
+            """,
+            full_name, address, phone_number, balance, sub_id
+        )
+        await log_action("INFO", f"Обновлены данные абонента '{full_name}' (ID: {sub_id}).", user_login)
+    forget("subscribers", sub_id)
+    invalidate_subscriber(sub_id)
 
 
 async def delete_subscriber(sub_id: int, user_login: str):
     """
     Удаляет абонента, если у него нет связанных договоров.
     """
-    conn = await get_db_connection()
-    try:
+    async with db_transaction() as conn:
         contract_count = await conn.fetchval("SELECT COUNT(*) FROM contracts WHERE subscriber_id = $1", sub_id)
         if contract_count > 0:
             return {
@@ -121,32 +195,176 @@ async def delete_subscriber(sub_id: int, user_login: str):
 
         await conn.execute("DELETE FROM subscribers WHERE subscriber_id = $1", sub_id)
         await log_action("WARNING", f"Удален абонент '{sub_name}' (ID: {sub_id}).", user_login)
-        return {"success": True}
-    finally:
-        await conn.close()
-
-
-async def import_subscribers_from_list(subscribers: list, user_login: str) -> int:
-    """
-    Импортирует список абонентов в базу данных.
-    """
-    conn = await get_db_connection()
-    count = 0
-    async with conn.transaction():
-        for sub in subscribers:
-            if 'full_name' in sub and isinstance(sub['full_name'], str):
-                await conn.execute(
-                    """
-                    INSERT INTO subscribers (full_name, address, phone_number, balance)
-                    VALUES ($1, $2, $3, $4)
-                    """,
-                    sub.get('full_name'),
-                    sub.get('address', ''),
-                    sub.get('phone_number', ''),
-                    sub.get('balance', 0.0)
+    forget("subscribers", sub_id)
+    invalidate_subscriber(sub_id)
+    return {"success": True}
+
+
+# Не более стольких отказов сохраняется в отчете об импорте (счетчик ведется по всем)
+MAX_REPORTED_REJECTIONS = 1000
+
+PHONE_NUMBER_PATTERN = re.compile(r"^\+?[0-9]+$")
+
+IMPORT_STAGING_COLUMNS = ["row_number", "full_name", "address", "phone_number", "balance"]
+
+
+def _validate_import_row(row_number: int, row) -> Tuple[Optional[tuple], Optional[str]]:
+    """
+    Проверяет одну запись импорта. Возвращает кортеж для промежуточной таблицы
+    или причину отказа.
+    """
+    if not isinstance(row, dict):
+        return None, "Запись должна быть объектом"
+
+    full_name = row.get("full_name")
+    if not isinstance(full_name, str) or not full_name.strip():
+        return None, "Не указано ФИО (full_name)"
+    full_name = full_name.strip()
+    if len(full_name) > 255:
+        return None, "ФИО длиннее 255 символов"
+
+    phone_number = row.get("phone_number")
+    if isinstance(phone_number, int) and not isinstance(phone_number, bool):
+        phone_number = str(phone_number)
+    if not isinstance(phone_number, str):
+        return None, "Не указан номер телефона (phone_number)"
+    phone_number = re.sub(r"[\s()-]", "", phone_number)
+    if not PHONE_NUMBER_PATTERN.match(phone_number) or len(phone_number) > 20:
+        return None, f"Некорректный номер телефона: {row.get('phone_number')}"
+
+    # Не указанные адрес и баланс остаются NULL: у существующего абонента они не меняются
+    address = row.get("address") or None
+    if address is not None and not isinstance(address, str):
+        return None, "Адрес должен быть строкой"
+
+    raw_balance = row.get("balance")
+    if raw_balance is None or raw_balance == "":
+        balance = None
+    elif isinstance(raw_balance, bool):
+        return None, "Некорректный баланс"
+    else:
+        try:
+            balance = Decimal(str(raw_balance).replace(",", "."))
+        except InvalidOperation:
+            return None, f"Некорректный баланс: {raw_balance}"
+        if not balance.is_finite() or balance < Decimal("-1000.00") or abs(balance) >= Decimal("100000000"):
+            return None, f"Баланс вне допустимого диапазона: {raw_balance}"
+        balance = balance.quantize(Decimal("0.01"))
+
+    return (row_number, full_name, address, phone_number, balance), None
+
+
+async def import_subscribers(batches, user_login: str) -> dict:
+    """
+    Импортирует абонентов из потока пачек разобранных строк (см. import_service).
+    Корректные строки загружаются через COPY в промежуточную таблицу и затем
+    объединяются с таблицей абонентов одним запросом: новые номера телефонов
+    добавляются, у существующих абонентов обновляются поля, указанные в файле
+    (пустые адрес и баланс не затирают текущие значения). Импорт выполняется в одной транзакции.
+    Возвращает отчет: количество добавленных, обновленных и отклоненных строк,
+    отказы по строкам и скорость обработки.
+    """
+    started = time.perf_counter()
+    total = 0
+    rejected = 0
+    rejections = []
+
+    def reject(row_number: int, reason: str):
+        nonlocal rejected
+        rejected += 1
+        if len(rejections) < MAX_REPORTED_REJECTIONS:
+            rejections.append({"row": row_number, "reason": reason})
+
+    async with db_transaction() as conn:
+        await conn.execute("""
+            CREATE TEMP TABLE subscriber_import_staging (
+                row_number   INTEGER NOT NULL,
+                full_name    VARCHAR(255) NOT NULL,
+                address      TEXT,
+                phone_number VARCHAR(20) NOT NULL,
+                balance      NUMERIC(10, 2)
+            ) ON COMMIT DROP
+        """)
+
+        async for batch in batches:
+            records = []
+            for row_number, row, error in batch:
+                total += 1
+                if error is None:
+                    record, error = _validate_import_row(row_number, row)
+                if error is not None:
+                    reject(row_number, error)
+                    continue
+                records.append(record)
+
+            if records:
+                await conn.copy_records_to_table(
+                    "subscriber_import_staging", records=records, columns=IMPORT_STAGING_COLUMNS
                 )
-                count += 1
-    await conn.close()
-    if count > 0:
-        await log_action("INFO", f"Выполнен импорт {count} абонентов из JSON.", user_login)
-    return count
\ No newline at end of file
+
+        # При повторе номера телефона в файле применяется последняя строка, остальные отклоняются
+        duplicates = await conn.fetch("""
+            SELECT row_number, phone_number
+            FROM (
+                SELECT row_number, phone_number,
+                       row_number() OVER (PARTITION BY phone_number ORDER BY row_number DESC) AS position
+                FROM subscriber_import_staging
+            ) ranked
+            WHERE position > 1
+            ORDER BY row_number
+        """)
+        for duplicate in duplicates:
+            reject(duplicate["row_number"], f"Номер {duplicate['phone_number']} повторяется ниже в файле")
+
+        # Существующие абоненты обновляются только указанными в файле полями,
+        # новые добавляются с нулевым балансом, если он не указан
+        merged = await conn.fetchrow("""
+            WITH latest AS (
+                SELECT DISTINCT ON (phone_number) full_name, address, phone_number, balance
+                FROM subscriber_import_staging
+                ORDER BY phone_number, row_number DESC
+            ),
+            updated AS (
+                UPDATE subscribers s
+                SET full_name = l.full_name,
+                    address = COALESCE(l.address, s.address),
+                    balance = COALESCE(l.balance, s.balance)
+                FROM latest l
+                WHERE s.phone_number = l.phone_number
+                RETURNING s.subscriber_id
+            ),
+            inserted AS (
+                INSERT INTO subscribers (full_name, address, phone_number, balance)
+                SELECT l.full_name, l.address, l.phone_number, COALESCE(l.balance, 0.00)
+                FROM latest l
+                WHERE NOT EXISTS (SELECT 1 FROM subscribers s WHERE s.phone_number = l.phone_number)
+                ON CONFLICT (phone_number) DO NOTHING
+                RETURNING subscriber_id
+            )
+            SELECT
+                (SELECT COUNT(*) FROM inserted) AS inserted,
+                (SELECT COUNT(*) FROM updated) AS updated
+        """)
+        inserted, updated = merged["inserted"], merged["updated"]
+
+        if inserted or updated:
+            await log_action(
+                "INFO",
+                f"Выполнен импорт абонентов: добавлено {inserted}, обновлено {updated}, отклонено {rejected}.",
+                user_login
+            )
+
+    if updated:
+        # Обновленные абоненты могут быть в кэше пользователей - сбрасываем кэш абонентов целиком
+        invalidate_all_subscribers()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "total": total,
+        "inserted": inserted,
+        "updated": updated,
+        "rejected": rejected,
+        "rejections": rejections,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed) if elapsed > 0 else total,
+    }
@@ -1,5 +1,7 @@
 from typing import Optional
-from src.db.connection import get_db_connection
+from src.db.connection import get_db_connection, db_transaction
+from src.db.loaders import get_loader, forget
+from src.db.pagination import Page, resolve_sort, fetch_keyset_page
 from src.services.log_service import log_action
 from src.services.notification_service import notification_service
 
@@ -8,36 +10,38 @@ async def create_ticket(subscriber_id: int, title: str, description: str):
     """
     Создание новой заявки от абонента.
     """
-    conn = await get_db_connection()
-    new_ticket_id = await conn.fetchval(
-        """
-        INSERT INTO tickets (subscriber_id, title, description, status)
-        VALUES ($1, $2, $3, 'Новая') RETURNING ticket_id
-        """,
-        subscriber_id, title, description
-    )
-    await conn.close()
-    await log_action(
-        "INFO", f"Абонент (ID: {subscriber_id}) создал новую заявку ID: {new_ticket_id}.", f"subscriber_{subscriber_id}"
-    )
+    async with db_transaction() as conn:
+        new_ticket_id = await conn.fetchval(
+            """
+            INSERT INTO tickets (subscriber_id, title, description, status)
+            VALUES ($1, $2, $3, 'Новая') RETURNING ticket_id
+            """,
+            subscriber_id, title, description
+        )
+        await log_action(
+            "INFO", f"Абонент (ID: {subscriber_id}) создал новую заявку ID: {new_ticket_id}.", f"subscriber_{subscriber_id}"
+        )
 
 
 async def fetch_tickets_by_subscriber_id(subscriber_id: int):
     """
     Получение всех заявок для конкретного абонента.
     """
-    conn = await get_db_connection()
-    tickets = await conn.fetch("SELECT * FROM tickets WHERE subscriber_id = $1 ORDER BY created_at DESC", subscriber_id)
-    await conn.close()
+    async with get_db_connection() as conn:
+        tickets = await conn.fetch("SELECT * FROM tickets WHERE subscriber_id = $1 ORDER BY created_at DESC", subscriber_id)
     return tickets
 
 
-async def fetch_all_tickets(status_filter: Optional[str] = None, sort_by: str = 'created_at', order: str = 'desc'):
+async def fetch_all_tickets(
+    status_filter: Optional[str] = None,
+    sort_by: str = 'created_at',
+    order: str = 'desc',
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Page:
     """
-    Получение всех заявок для сотрудников с возможностью фильтрации и сортировки.
+    Получение страницы списка заявок для сотрудников с возможностью фильтрации и сортировки.
     """
-    conn = await get_db_connection()
-
     allowed_sort_columns = {
         "ticket_id": "t.ticket_id",
         "created_at": "t.created_at",
@@ -56,26 +60,22 @@ async def fetch_all_tickets(status_filter: Optional[str] = None, sort_by: str =
     JOIN subscribers s ON t.subscriber_id = s.subscriber_id
     LEFT JOIN employees e ON t.assigned_to_id = e.employee_id
     """
+    sort = resolve_sort(
+        allowed_sort_columns, sort_by, order,
+        default_sort="created_at", default_order=order,
+        id_key="ticket_id", id_sql="t.ticket_id", nullable_columns=["assignee_name"]
+    )
 
     params = []
+    where_clauses = []
     if status_filter:
-        query += " WHERE t.status = $1"
         params.append(status_filter)
+        where_clauses.append(f"t.status = ${len(params)}")
 
-    order_direction = "DESC" if order == 'desc' else "ASC"
-    order_by_clause = f"ORDER BY {allowed_sort_columns.get(sort_by, 't.created_at')} {order_direction}"
-    query += f" {order_by_clause}"
-
-    tickets = await conn.fetch(query, *params)
-    await conn.close()
-    return tickets
+    return await fetch_keyset_page(query, where_clauses, params, sort, page_size, cursor)
 
 
-async def fetch_ticket_by_id(ticket_id: int):
-    """
-    Получение одной заявки по ID, включая имена абонента и исполнителя.
-    """
-    conn = await get_db_connection()
+async def _load_tickets(ids: list) -> dict:
     query = """
     SELECT
         t.*,
@@ -84,46 +84,53 @@ async def fetch_ticket_by_id(ticket_id: int):
     FROM tickets t
     JOIN subscribers s ON t.subscriber_id = s.subscriber_id
     LEFT JOIN employees e ON t.assigned_to_id = e.employee_id
-    WHERE t.ticket_id = $1
+    WHERE t.ticket_id = ANY($1::int[])
     """
-    ticket = await conn.fetchrow(query, ticket_id)
-    await conn.close()
-    return ticket
+
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(query, ids)
+    return {row['ticket_id']: row for row in rows}
+
+
+async def fetch_ticket_by_id(ticket_id: int):
+    """
+    Получение одной заявки по ID, включая имена абонента и исполнителя.
+    """
+    return await get_loader("tickets", _load_tickets).load(ticket_id)
 
 
 async def update_ticket(ticket_id: int, status: str, assigned_to_id: Optional[int], user_login: str):
     """
     Обновление статуса и/или назначенного сотрудника для заявки.
     """
-    conn = await get_db_connection()
-    old_ticket = await conn.fetchrow("SELECT status, subscriber_id FROM tickets WHERE ticket_id = $1", ticket_id)
+    async with db_transaction() as conn:
+        old_ticket = await conn.fetchrow("SELECT status, subscriber_id FROM tickets WHERE ticket_id = $1", ticket_id)
 
-    await conn.execute(
-        "UPDATE tickets SET status = $1, assigned_to_id = $2 WHERE ticket_id = $3",
-        status, assigned_to_id, ticket_id
-    )
-    await conn.close()
-
-    if old_ticket and old_ticket['status'] != status:
-        message = f"Статус вашей заявки #{ticket_id} изменен на «{status}»."
-        await notification_service.create_notification(
-            subscriber_id=old_ticket['subscriber_id'],
-            message=message,
-            type="Обновление заявки",
-            related_url=f"/subscriber/tickets/{ticket_id}"
+        await conn.execute(
+            "UPDATE tickets SET status = $1, assigned_to_id = $2 WHERE ticket_id = $3",
+            status, assigned_to_id, ticket_id
         )
 
-    await log_action(
-        "INFO",
-        f"Статус заявки ID: {ticket_id} изменен на '{status}'. Назначен сотрудник ID: {assigned_to_id or 'не назначен'}.",
-        user_login
-    )
+        if old_ticket and old_ticket['status'] != status:
+            message = f"Статус вашей заявки #{ticket_id} изменен на «{status}»."
+            await notification_service.create_notification(
+                subscriber_id=old_ticket['subscriber_id'],
+                message=message,
+                type="Обновление заявки",
+                related_url=f"/subscriber/tickets/{ticket_id}"
+            )
+
+        await log_action(
+            "INFO",
+            f"Статус заявки ID: {ticket_id} изменен на '{status}'. Назначен сотрудник ID: {assigned_to_id or 'не назначен'}.",
+            user_login
+        )
+    forget("tickets", ticket_id)
 
 async def fetch_messages_for_ticket(ticket_id: int):
     """
     Получает всю переписку по конкретной заявке.
     """
-    conn = await get_db_connection()
     query = """
     SELECT
         m.message_id,
@@ -139,8 +146,9 @@ async def fetch_messages_for_ticket(ticket_id: int):
     WHERE m.ticket_id = $1
     ORDER BY m.created_at ASC
     """
-    messages = await conn.fetch(query, ticket_id)
-    await conn.close()
+
+    async with get_db_connection() as conn:
+        messages = await conn.fetch(query, ticket_id)
     return messages
 
 
@@ -148,9 +156,8 @@ async def add_message_to_ticket(ticket_id: int, message_text: str, user_login: s
     """
     Добавляет новое сообщение в заявку.
     """
-    conn = await get_db_connection()
     # Обновляем поле updated_at у самой заявки, чтобы она "поднялась" в списке
-    async with conn.transaction():
+    async with db_transaction() as conn:
         await conn.execute(
             """
             INSERT INTO ticket_messages (ticket_id, subscriber_id, employee_id, message_text)
@@ -173,10 +180,10 @@ async def add_message_to_ticket(ticket_id: int, message_text: str, user_login: s
                     type="Новый ответ в заявке",
                     related_url=f"/subscriber/tickets/{ticket_id}"
                 )
-    await conn.close()
-    author_type = "Абонент" if subscriber_id else "Сотрудник"
-    await log_action(
-        "INFO",
-        f"{author_type} (ID: {subscriber_id or employee_id}) добавил сообщение в заявку ID: {ticket_id}.",
-        user_login
-    )
\ No newline at end of file
+        author_type = "Абонент" if subscriber_id else "Сотрудник"
+        await log_action(
+            "INFO",
+            f"{author_type} (ID: {subscriber_id or employee_id}) добавил сообщение в заявку ID: {ticket_id}.",
+            user_login
+        )
+    forget("tickets", ticket_id)
\ No newline at end of file
@@ -0,0 +1,132 @@
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Iterable, List, Tuple
+from xml.sax.saxutils import escape
+
+from src.services.file_service import ZipChunkBuffer
+
+# Сколько строк листа накапливается перед записью в архив и отдачей клиенту
+ROWS_PER_CHUNK = 500
+
+# Точка отсчета дат Excel (с учетом ошибки 1900 года)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Символы, недопустимые в XML 1.0
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Индексы стилей из STYLES_XML: 0 - обычная ячейка, 1 - дата и время, 2 - дата, 3 - заголовок
+STYLE_DATETIME = 1
+STYLE_DATE = 2
+STYLE_HEADER = 3
+
+CONTENT_TYPES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+ROOT_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+WORKBOOK_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+STYLES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="dd.mm.yyyy hh:mm:ss"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+</styleSheet>"""
+
+SHEET_HEADER_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData>"""
+
+SHEET_FOOTER_XML = "</sheetData></worksheet>"
+
+
+def _string_cell(value: Any, style: int = 0) -> str:
+    text = _INVALID_XML_CHARS.sub("", str(value))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, datetime):
+        # Excel не хранит часовой пояс - записываем время так, как его вернула БД
+        serial = (value.replace(tzinfo=None) - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="{STYLE_DATETIME}"><v>{serial}</v></c>'
+    if isinstance(value, date):
+        serial = (value - EXCEL_EPOCH.date()).days
+        return f'<c s="{STYLE_DATE}"><v>{serial}</v></c>'
+    return _string_cell(value)
+
+
+def _row(cells: Iterable[str]) -> str:
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def stream_xlsx(
+    columns: List[Tuple[str, str]],
+    rows: AsyncIterator[Any],
+    sheet_name: str = "Sheet1"
+) -> AsyncIterator[bytes]:
+    """
+    Формирует .xlsx-файл по частям из асинхронного потока строк.
+    columns - список пар (ключ в строке, заголовок столбца).
+    Строки записываются как inline-строки без общей таблицы строк,
+    поэтому объем памяти не зависит от количества строк.
+    """
+    buffer = ZipChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES_XML)
+        archive.writestr("_rels/.rels", ROOT_RELS_XML)
+        archive.writestr("xl/workbook.xml", WORKBOOK_XML.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        archive.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS_XML)
+        archive.writestr("xl/styles.xml", STYLES_XML)
+        yield buffer.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write(SHEET_HEADER_XML.encode("utf-8"))
+            sheet.write(_row(_string_cell(title, STYLE_HEADER) for _, title in columns).encode("utf-8"))
+
+            pending: List[str] = []
+            async for record in rows:
+                pending.append(_row(_cell(record[key]) for key, _ in columns))
+                if len(pending) >= ROWS_PER_CHUNK:
+                    sheet.write("".join(pending).encode("utf-8"))
+                    pending.clear()
+                    yield buffer.drain()
+
+            pending.append(SHEET_FOOTER_XML)
+            sheet.write("".join(pending).encode("utf-8"))
+    yield buffer.drain()
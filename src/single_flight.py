@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные вызовы с одинаковым ключом: работу выполняет первый вызов,
+    остальные ждут и получают его результат (или исключение).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                # shield: отмена ожидающего запроса не должна отменять общую работу
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Отменен запрос, выполнявший работу, - выполняем ее заново
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Помечаем исключение полученным, чтобы asyncio не предупреждал, если ожидающих не было
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+        future.set_result(result)
+        return result
+
+    def forget(self, predicate: Callable[[Hashable], bool]):
+        """
+        Новые вызовы с ключами, для которых predicate(key) истинен, не будут присоединяться
+        к уже выполняющейся работе (ее результат устарел), а запустят ее заново.
+        """
+        for key in [key for key in self._in_flight if predicate(key)]:
+            del self._in_flight[key]
+
+    def __len__(self):
+        return len(self._in_flight)
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, Set
+
+# Текущая задача для каждого ключа (например, пользователь + вид поиска)
+_latest_tasks: Dict[Hashable, asyncio.Task] = {}
+# Задачи, отмененные из-за более нового вызова (в отличие от отмены самого запроса)
+_superseded_tasks: Set[asyncio.Task] = set()
+
+
+class Superseded(Exception):
+    """
+    Задача отменена, потому что по тому же ключу запущена более новая.
+    """
+
+
+async def run_superseding(key: Hashable, awaitable: Awaitable[Any]) -> Any:
+    """
+    Выполняет awaitable, отменяя ранее запущенную и еще не завершившуюся задачу
+    с тем же ключом. Используется для поиска по мере ввода: устаревший запрос
+    к БД прерывается, а не дорабатывает впустую.
+    Отмененный вызов завершается исключением Superseded.
+    """
+    previous = _latest_tasks.get(key)
+    if previous is not None and not previous.done():
+        _superseded_tasks.add(previous)
+        previous.cancel()
+
+    task = asyncio.ensure_future(awaitable)
+    _latest_tasks[key] = task
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task in _superseded_tasks:
+            raise Superseded()
+        raise
+    finally:
+        _superseded_tasks.discard(task)
+        if _latest_tasks.get(key) is task:
+            del _latest_tasks[key]
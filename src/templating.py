@@ -1,6 +1,8 @@
 from fastapi.templating import Jinja2Templates
 from markupsafe import escape
 
+from src.timing import TimedTemplate
+
 def nl2br(value: str) -> str:
     """
     Преобразует переносы строк в HTML-тег <br>.
@@ -9,8 +11,20 @@ def nl2br(value: str) -> str:
         return value
     return escape(value).replace('\n', '<br>\n')
 
+def next_page_url(request, next_cursor):
+    """
+    Адрес следующей страницы списка: текущий адрес с теми же фильтрами и сортировкой
+    и курсором следующей страницы. None, если страница последняя.
+    """
+    if not next_cursor:
+        return None
+    return str(request.url.include_query_params(cursor=next_cursor))
+
 templates = Jinja2Templates(directory="templates")
 
+# Время отрисовки шаблонов попадает в заголовок Server-Timing
+templates.env.template_class = TimedTemplate
+
 templates.env.add_extension('jinja2.ext.do')
 
 templates.env.filters['nl2br'] = nl2br
\ No newline at end of file
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from fastapi.responses import JSONResponse
+from jinja2 import Template
+
+from src.config import settings
+from src.db.instrumentation import get_query_stats
+
+# Разбивка времени HTTP-запроса по этапам: определение пользователя (auth), работа с БД (db),
+# отрисовка шаблонов (template) и сериализация JSON (serialize). Этапы выводятся в заголовке
+# Server-Timing (видно во вкладке Network инструментов разработчика), медленные запросы
+# записываются в отдельный журнал. Время auth включает и его собственные запросы к БД.
+# Этап db - время внутри блоков get_db_connection() без журнала запросов asyncpg;
+# точное время и число запросов (db-queries) добавляются только при DB_QUERY_STATS=true.
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        # Этапы, замер которых идет сейчас: вложенные блоки одного этапа не считаются дважды
+        self.active: Set[str] = set()
+
+    def add(self, phase: str, elapsed_ms: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed_ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+@contextmanager
+def measure(phase: str):
+    """
+    Добавляет время блока к этапу текущего HTTP-запроса. Вне запроса ничего не делает.
+    Блок, вложенный в замер того же этапа, отдельно не учитывается.
+    """
+    timing = _request_timing.get()
+    if timing is None or phase in timing.active:
+        yield
+        return
+    timing.active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.active.discard(phase)
+        timing.add(phase, (time.perf_counter() - started) * 1000)
+
+
+class TimedTemplate(Template):
+    """
+    Шаблон Jinja2, время отрисовки которого учитывается как этап template.
+    Вложенные шаблоны ({% include %}, {% extends %}) отрисовываются внутри render и не считаются дважды.
+    """
+
+    def render(self, *args, **kwargs):
+        with measure("template"):
+            return super().render(*args, **kwargs)
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSON-ответ, время сериализации которого учитывается как этап serialize.
+    """
+
+    def render(self, content) -> bytes:
+        with measure("serialize"):
+            return super().render(content)
+
+
+def server_timing_header(timing: RequestTiming, stats) -> str:
+    parts = [f"{phase};dur={elapsed_ms:.1f}" for phase, elapsed_ms in timing.phases.items()]
+    if stats is not None and stats.query_count:
+        parts.append(f'db-queries;dur={stats.db_time_ms:.1f};desc="{stats.query_count} queries"')
+    parts.append(f"total;dur={timing.elapsed_ms():.1f}")
+    return ", ".join(parts)
+
+
+def _append_line(path: Path, line: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as log_file:
+        log_file.write(line + "\n")
+
+
+async def log_slow_request(scope, status: int, timing: RequestTiming, stats, total_ms: float):
+    """
+    Записывает медленный запрос с разбивкой по этапам в SLOW_REQUEST_LOG_PATH (одна JSON-строка на запрос).
+    """
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "method": scope["method"],
+        "path": scope["path"],
+        "query": scope.get("query_string", b"").decode("latin-1"),
+        "status": status,
+        "user": scope.get("state", {}).get("user_login"),
+        "total_ms": round(total_ms, 1),
+        "phases_ms": {phase: round(elapsed_ms, 1) for phase, elapsed_ms in timing.phases.items()},
+    }
+    if stats is not None:
+        record["db_ms"] = round(stats.db_time_ms, 1)
+        record["db_queries"] = stats.query_count
+        record["db_connections"] = stats.connections
+    try:
+        # Запись в файл не должна занимать цикл событий
+        await asyncio.to_thread(
+            _append_line, Path(settings.SLOW_REQUEST_LOG_PATH), json.dumps(record, ensure_ascii=False)
+        )
+    except OSError as e:
+        print(f"Не удалось записать медленный запрос в журнал: {e}")
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI-middleware: замеряет этапы каждого запроса, добавляет заголовок Server-Timing
+    и записывает запросы дольше SLOW_REQUEST_THRESHOLD_MS в журнал медленных запросов.
+    Время в журнале считается до отправки всего ответа, включая потоковые.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SERVER_TIMING:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        timing_token = _request_timing.set(timing)
+        # Счетчики запросов заводит DatabaseSessionMiddleware, только при DB_QUERY_STATS=true
+        stats = None
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status, stats
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stats = get_query_stats()
+                header = server_timing_header(timing, stats).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timing.reset(timing_token)
+
+        total_ms = timing.elapsed_ms()
+        if total_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            await log_slow_request(scope, status, timing, stats, total_ms)